@@ -48,6 +48,76 @@ class Config:
     # Encryption (for storing OAuth tokens)
     ENCRYPTION_KEY: Optional[str] = os.getenv('ENCRYPTION_KEY')
     
+    # Local mock LLM server (app/infrastructure/mock_llm); when set, Groq/Gemini clients point at it
+    LLM_MOCK_URL: Optional[str] = os.getenv('LLM_MOCK_URL')
+    
+    # LLM Parser micro-batching (packs several short documents into one API call)
+    PARSER_BATCH_MODE: bool = os.getenv('PARSER_BATCH_MODE', 'false').lower() == 'true'
+    PARSER_BATCH_SIZE: int = int(os.getenv('PARSER_BATCH_SIZE', '5'))
+    PARSER_BATCH_MAX_WAIT: float = float(os.getenv('PARSER_BATCH_MAX_WAIT', '2.0'))
+    PARSER_BATCH_MAX_CHARS: int = int(os.getenv('PARSER_BATCH_MAX_CHARS', '3000'))
+    
+    # Stream parser output and hand completed fields/rows downstream early
+    PARSER_STREAM_MODE: bool = os.getenv('PARSER_STREAM_MODE', 'false').lower() == 'true'
+    
+    # Rate limiter backend: "memory" (per process) or "sqlite" (shared by all uvicorn workers)
+    RATE_LIMITER_BACKEND: str = os.getenv('RATE_LIMITER_BACKEND', 'memory').lower()
+    RATE_LIMITER_DB_PATH: str = os.getenv('RATE_LIMITER_DB_PATH', 'data/rate_limiter.db')
+    # Learn refill rate / concurrency from 429 feedback (AIMD), persisted across restarts
+    RATE_LIMITER_ADAPTIVE: bool = os.getenv('RATE_LIMITER_ADAPTIVE', 'false').lower() == 'true'
+    RATE_LIMITER_STATE_PATH: str = os.getenv('RATE_LIMITER_STATE_PATH', 'data/rate_limits.json')
+    # Fair-queuing weights per tenant (company id), e.g. "companyA:2,companyB:0.5"; default weight 1
+    RATE_LIMITER_TENANT_WEIGHTS: dict = {
+        tenant.strip(): float(weight)
+        for tenant, weight in (
+            item.split(':', 1) for item in os.getenv('RATE_LIMITER_TENANT_WEIGHTS', '').split(',') if ':' in item
+        )
+    }
+    
+    # Document numbers reserved per Firebase counter transaction (1 = one transaction per document)
+    DOCUMENT_KEY_BLOCK_SIZE: int = int(os.getenv('DOCUMENT_KEY_BLOCK_SIZE', '50'))
+    
+    # Document store backend: "firebase" (Realtime Database), "memory" (per process, offline) or "sqlite" (local file)
+    DOCUMENT_STORE: str = os.getenv('DOCUMENT_STORE', 'firebase').lower()
+    DOCUMENT_STORE_PATH: str = os.getenv('DOCUMENT_STORE_PATH', 'data/documents.db')
+    # Async RTDB REST client (httpx, pooled keep-alive) for FirebaseService calls on the server loop
+    FIREBASE_ASYNC_CLIENT: bool = os.getenv('FIREBASE_ASYNC_CLIENT', 'true').lower() == 'true'
+    FIREBASE_REST_TIMEOUT: float = float(os.getenv('FIREBASE_REST_TIMEOUT', '10'))
+    FIREBASE_REST_CONNECT_TIMEOUT: float = float(os.getenv('FIREBASE_REST_CONNECT_TIMEOUT', '5'))
+    FIREBASE_REST_MAX_CONNECTIONS: int = int(os.getenv('FIREBASE_REST_MAX_CONNECTIONS', '100'))
+    FIREBASE_REST_MAX_KEEPALIVE: int = int(os.getenv('FIREBASE_REST_MAX_KEEPALIVE', '20'))
+
+    # Store large top-level arrays (bank statement transactions) as one compressed blob: "off", "gzip" or "zstd"
+    DOCUMENT_COMPRESSION: str = os.getenv('DOCUMENT_COMPRESSION', 'off').lower()
+    DOCUMENT_COMPRESS_MIN_BYTES: int = int(os.getenv('DOCUMENT_COMPRESS_MIN_BYTES', '8192'))
+
+    # Document read cache: entries younger than the TTL skip the version check
+    DOCUMENT_CACHE_TTL: float = float(os.getenv('DOCUMENT_CACHE_TTL', '5'))
+    DOCUMENT_CACHE_MAX_ENTRIES: int = int(os.getenv('DOCUMENT_CACHE_MAX_ENTRIES', '1000'))
+    
+    # Vector index: one FAISS shard per (user, company), loaded on first use; at most this many kept in memory (LRU)
+    VECTOR_SHARD_CACHE_SIZE: int = int(os.getenv('VECTOR_SHARD_CACHE_SIZE', '64'))
+    # Compact a shard (drop vectors of updated/deleted documents) once this share of it is stale; check every N seconds (0 = off)
+    VECTOR_COMPACTION_RATIO: float = float(os.getenv('VECTOR_COMPACTION_RATIO', '0.2'))
+    VECTOR_COMPACTION_INTERVAL: float = float(os.getenv('VECTOR_COMPACTION_INTERVAL', '300'))
+    # FAISS shard persistence: write-ahead log, folded into a snapshot after N records / MB, or when older than N seconds
+    VECTOR_SNAPSHOT_EVERY: int = int(os.getenv('VECTOR_SNAPSHOT_EVERY', '1000'))
+    VECTOR_SNAPSHOT_WAL_MB: float = float(os.getenv('VECTOR_SNAPSHOT_WAL_MB', '16'))
+    VECTOR_SNAPSHOT_INTERVAL: float = float(os.getenv('VECTOR_SNAPSHOT_INTERVAL', '600'))
+    VECTOR_WAL_FSYNC: bool = os.getenv('VECTOR_WAL_FSYNC', 'true').lower() == 'true'
+    
+    # /search-documents paging: page size when only ?cursor= is sent, and the upper bound for ?limit=
+    SEARCH_PAGE_SIZE: int = int(os.getenv('SEARCH_PAGE_SIZE', '50'))
+    SEARCH_MAX_PAGE_SIZE: int = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '200'))
+    
+    # Token for /admin/metrics (X-Admin-Token header); unset = open in development, disabled in production
+    ADMIN_METRICS_TOKEN: Optional[str] = os.getenv('ADMIN_METRICS_TOKEN')
+    # Tenants exported with their own /admin/metrics series (busiest first, the rest as tenant="other"); 0 = none
+    RATE_LIMITER_METRICS_TOP_TENANTS: int = int(os.getenv('RATE_LIMITER_METRICS_TOP_TENANTS', '20'))
+    
+    # Seconds a chat request may wait for the LLM rate limiter before it is shed
+    CHAT_LLM_TIMEOUT: float = float(os.getenv('CHAT_LLM_TIMEOUT', '60'))
+    
     # Server
     HOST: str = os.getenv('HOST', '0.0.0.0')
     PORT: int = int(os.getenv('PORT', '8000'))
@@ -87,6 +157,8 @@ class Config:
         print(f"Tesseract Data: {cls.TESSDATA_PREFIX or 'Auto-detect'}")
         print(f"Google Sheets ID: {cls.GOOGLE_SHEETS_ID}")
         print(f"OAuth Configured: {bool(cls.GOOGLE_OAUTH_CLIENT_ID)}")
+        if cls.LLM_MOCK_URL:
+            print(f"⚠️  LLM calls go to MOCK server: {cls.LLM_MOCK_URL}")
         print("=" * 60)
 
 # Create a singleton instance
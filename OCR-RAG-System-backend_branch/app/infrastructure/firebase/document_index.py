@@ -0,0 +1,113 @@
+"""
+Summary projection and sort keys for indexed document queries
+Every saved document gets a compact summary at document_summaries/{key}
+carrying string sort keys that RTDB can order and range over:
+
+    sort_created       "{created_at_ms:015d}|{doc_key}"
+    sort_type_created  "{document_type}|{created_at_ms:015d}|{doc_key}"
+
+The document key makes every value unique, so a page cursor identifies
+exactly one position even when several documents share a millisecond.
+
+Without an index RTDB sorts these queries on the server after downloading
+the whole node (and logs a warning). Merge this into the project's existing
+database rules, next to its .read / .write rules, rather than deploying it
+on its own (a rules deploy replaces every rule):
+
+    "users": {
+      "$uid": {
+        "companies": {
+          "$companyId": {
+            "document_summaries": {
+              ".indexOn": ["sort_created", "sort_type_created", "created_at_ms"]
+            }
+          }
+        }
+      }
+    }
+"""
+
+import base64
+import binascii
+from typing import Optional
+
+SORT_CREATED = "sort_created"
+SORT_TYPE_CREATED = "sort_type_created"
+
+# Sorts after every "|{doc_key}" suffix (RTDB compares strings by UTF-16 code unit)
+HIGH_SUFFIX = "\uf8ff"
+
+
+def normalize_document_type(document_type: Optional[str]) -> str:
+    """'Bank Statement' / 'bank_statement' -> 'bank_statement'; missing -> 'others'"""
+    normalized = (document_type or "").strip().lower().replace(" ", "_")
+    return normalized or "others"
+
+
+def _ms(created_at_ms: int) -> str:
+    return f"{int(created_at_ms):015d}"
+
+
+def created_sort_value(created_at_ms: int, doc_key: str) -> str:
+    return f"{_ms(created_at_ms)}|{doc_key}"
+
+
+def type_sort_value(document_type: Optional[str], created_at_ms: int, doc_key: str) -> str:
+    return f"{normalize_document_type(document_type)}|{_ms(created_at_ms)}|{doc_key}"
+
+
+def range_bounds(
+    document_type: Optional[str],
+    start_ms: Optional[int],
+    end_ms: Optional[int],
+) -> tuple:
+    """
+    (start_at, end_at) for a date range, on sort_type_created if a type is given
+
+    Returns:
+        Tuple of bounds; without a lower limit start_at is "" (which still
+        skips children that have no sort key: RTDB orders null before strings)
+    """
+    prefix = f"{normalize_document_type(document_type)}|" if document_type else ""
+    start = f"{prefix}{_ms(start_ms)}" if start_ms is not None else prefix
+    end = f"{prefix}{_ms(end_ms)}|{HIGH_SUFFIX}" if end_ms is not None else f"{prefix}{HIGH_SUFFIX}"
+    return start, end
+
+
+def encode_cursor(sort_value: str) -> str:
+    return base64.urlsafe_b64encode(sort_value.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+# Display name candidates for the summary's "vendor" (first present wins)
+_PARTY_FIELDS = ("vendor_name", "customer_name", "bank_name", "account_holder", "account_name")
+
+
+def build_document_summary(document: dict, doc_key: str, created_at_ms: int) -> dict:
+    """
+    Compact projection stored at document_summaries/{doc_key}
+
+    Holds what list views need (type, date, total, vendor, timestamps,
+    thumbnail) plus the sort keys, so listing never reads line items or
+    transactions.
+    """
+    vendor = next((document[field] for field in _PARTY_FIELDS if document.get(field)), None)
+    return {
+        "document_type": document.get("document_type"),
+        "date": document.get("date"),
+        "total_amount": document.get("total_amount"),
+        "vendor_name": vendor,
+        "created_at": document.get("created_at"),
+        "created_at_ms": created_at_ms,
+        "thumbnail_url": document.get("image_url"),
+        SORT_CREATED: created_sort_value(created_at_ms, doc_key),
+        SORT_TYPE_CREATED: type_sort_value(document.get("document_type"), created_at_ms, doc_key),
+    }
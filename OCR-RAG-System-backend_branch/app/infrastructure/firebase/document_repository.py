@@ -0,0 +1,609 @@
+"""
+Document repository with a read-through cache over FirebaseService
+Routes and background tasks read documents through here instead of calling
+db.reference(...).get() themselves. Reads are served from an in-process
+TTL/LRU cache; writes go through FirebaseService and invalidate the cache.
+Compressed arrays (see payload_codec) are expanded once per fetch, so cached
+values and callers only ever see plain documents.
+
+Other workers' writes are caught with a version stamp: every document write
+bumps users/{uid}/companies/{cid}/meta/documents_version in the same update.
+Entries younger than the TTL are served as is; older entries are revalidated
+by reading that single integer and only refetched if it changed.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generator, List, Optional, Tuple
+
+from app.config.config import config
+from app.infrastructure.firebase.firebase_service import FirebaseService
+from app.infrastructure.firebase.payload_codec import decode_document, decode_documents
+from app.utils.timestamps import parse_created_at
+from app.infrastructure.firebase.document_index import (
+    SORT_CREATED,
+    SORT_TYPE_CREATED,
+    created_sort_value,
+    decode_cursor,
+    encode_cursor,
+    normalize_document_type,
+    range_bounds,
+)
+
+# Types with their own filter value; doc_type="others" means none of these
+KNOWN_DOCUMENT_TYPES = ("receipt", "invoice", "bank_statement")
+
+SearchPage = Tuple[List[Tuple[str, dict]], Optional[str]]
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    version: int
+    fetched_at: float
+
+
+@dataclass
+class _SearchPlan:
+    """How one search request maps onto the summary indexes"""
+    path: str
+    accept: Callable[[dict], bool]  # Type filter for the legacy full scan
+    cursor_value: Optional[str]  # sort_created value of the last row of the previous page
+    index_accept: Callable[[dict], bool]  # Post-filter on index rows (none for the type index)
+    index_cursor: Optional[str]  # cursor_value re-keyed for the chosen index
+    field: str = SORT_CREATED
+    start: str = ""
+    end: str = ""
+
+
+class TTLLRUCache:
+    """
+    Thread-safe LRU cache whose entries carry a version and fetch time
+
+    Used from the event loop, the threadpool (sync routes) and background
+    tasks that run their own loop, hence a threading.Lock.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, max_entries)
+        self.entries: "OrderedDict[Tuple, _CacheEntry]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[_CacheEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple, value: Any, version: int, fetched_at: float) -> None:
+        with self.lock:
+            self.entries[key] = _CacheEntry(value, version, fetched_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def touch(self, key: Tuple, fetched_at: float) -> None:
+        """Mark an entry fresh again after its version was confirmed"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.fetched_at = fetched_at
+
+    def discard_scope(self, user_id: str, company_id: str, doc_key: Optional[str] = None) -> int:
+        """Drop the document list and one document (or every document) of a user+company"""
+        with self.lock:
+            doomed = [
+                key for key in self.entries
+                if key[1:3] == (user_id, company_id)
+                and (doc_key is None or key[0] == "all" or key[3:] == (doc_key,))
+            ]
+            for key in doomed:
+                del self.entries[key]
+            return len(doomed)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class DocumentRepository:
+    """Cached document reads and cache-invalidating writes for one process"""
+
+    def __init__(
+        self,
+        firebase_service: Optional[FirebaseService] = None,
+        ttl: float = 5.0,
+        max_entries: int = 1000,
+    ):
+        """
+        Args:
+            firebase_service: Underlying service (creates one if omitted)
+            ttl: Seconds an entry is served without checking the version stamp
+            max_entries: LRU bound on cached nodes (document lists count as one)
+        """
+        self.firebase_service = firebase_service or FirebaseService()
+        self.db = self.firebase_service.db
+        self.ttl = ttl
+        self.cache = TTLLRUCache(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        # user+company pairs whose documents all had summaries at a documents_version
+        self.indexed_scopes: Dict[Tuple[str, str], _CacheEntry] = {}
+
+    @staticmethod
+    def _scope_path(user_id: str, company_id: str) -> str:
+        return f"users/{user_id}/companies/{company_id}"
+
+    def _read_version(self, user_id: str, company_id: str) -> int:
+        return self.db.reference(self._version_path(user_id, company_id)).get() or 0
+
+    async def _read_version_async(self, user_id: str, company_id: str) -> int:
+        return await self.rest.get(self._version_path(user_id, company_id)) or 0
+
+    def _version_path(self, user_id: str, company_id: str) -> str:
+        return f"{self._scope_path(user_id, company_id)}/meta/documents_version"
+
+    @property
+    def rest(self):
+        """FirebaseService's async REST client when usable from this loop, else None"""
+        return self.firebase_service.rest
+
+    def _cached(self, key: Tuple, now: float) -> Tuple[bool, Optional[_CacheEntry]]:
+        """(fresh, entry): fresh entries are served without touching the database"""
+        entry = self.cache.get(key)
+        if entry is not None and now - entry.fetched_at < self.ttl:
+            self.hits += 1
+            return True, entry
+        if entry is not None:
+            # Stale: one tiny read tells us whether another worker wrote since
+            self.revalidations += 1
+        return False, entry
+
+    def _confirmed(self, key: Tuple, entry: Optional[_CacheEntry], version: int, now: float) -> bool:
+        """True if a stale entry's version still matches (it is marked fresh again)"""
+        if entry is not None and version == entry.version:
+            self.hits += 1
+            self.cache.touch(key, now)
+            return True
+        # Version is read before the data, so a write landing in between only
+        # makes the new entry look older than it is (refetched next time)
+        self.misses += 1
+        return False
+
+    def _read_through(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        fresh, entry = self._cached(key, now)
+        if fresh:
+            return entry.value
+        version = self._read_version(key[1], key[2])
+        if self._confirmed(key, entry, version, now):
+            return entry.value
+        value = loader()
+        self.cache.put(key, value, version, now)
+        return value
+
+    async def _read_through_async(self, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+        fresh, entry = self._cached(key, now)
+        if fresh:
+            return entry.value
+        version = await self._read_version_async(key[1], key[2])
+        if self._confirmed(key, entry, version, now):
+            return entry.value
+        value = await loader()
+        self.cache.put(key, value, version, now)
+        return value
+
+    def _fresh_listing(self, user_id: str, company_id: str) -> Optional[Dict[str, dict]]:
+        listing = self.cache.get(("all", user_id, company_id))
+        if listing is not None and time.monotonic() - listing.fetched_at < self.ttl:
+            self.hits += 1
+            return listing.value
+        return None
+
+    # ==============================
+    #  READS (sync, for threadpool routes and background tasks)
+    # ==============================
+
+    def get_all_documents(self, user_id: str, company_id: str) -> Dict[str, dict]:
+        """All documents of a user+company keyed by document key (treat as read-only)"""
+        path = f"{self._scope_path(user_id, company_id)}/documents"
+        return self._read_through(
+            ("all", user_id, company_id),
+            lambda: decode_documents(self.db.reference(path).get()) or {},
+        )
+
+    def get_document(self, user_id: str, company_id: str, doc_key: str) -> Optional[dict]:
+        """One document, or None if it doesn't exist (treat as read-only)"""
+        listing = self._fresh_listing(user_id, company_id)
+        if listing is not None:
+            return listing.get(doc_key)
+
+        path = f"{self._scope_path(user_id, company_id)}/documents/{doc_key}"
+        return self._read_through(
+            ("doc", user_id, company_id, doc_key),
+            lambda: decode_document(self.db.reference(path).get()),
+        )
+
+    # ==============================
+    #  READS (async: native over REST on the server loop, executor elsewhere)
+    # ==============================
+
+    async def get_all_documents_async(self, user_id: str, company_id: str) -> Dict[str, dict]:
+        rest = self.rest
+        if rest is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.get_all_documents, user_id, company_id)
+
+        path = f"{self._scope_path(user_id, company_id)}/documents"
+
+        async def load() -> Dict[str, dict]:
+            return decode_documents(await rest.get(path)) or {}
+
+        return await self._read_through_async(("all", user_id, company_id), load)
+
+    async def get_document_async(self, user_id: str, company_id: str, doc_key: str) -> Optional[dict]:
+        rest = self.rest
+        if rest is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.get_document, user_id, company_id, doc_key)
+
+        listing = self._fresh_listing(user_id, company_id)
+        if listing is not None:
+            return listing.get(doc_key)
+
+        path = f"{self._scope_path(user_id, company_id)}/documents/{doc_key}"
+        async def load() -> Optional[dict]:
+            return decode_document(await rest.get(path))
+
+        return await self._read_through_async(("doc", user_id, company_id, doc_key), load)
+
+    # ==============================
+    #  SEARCH (indexed, paginated)
+    # ==============================
+    # The search logic is written once; _is_indexed_keys / _indexed_walk /
+    # _legacy_page take the database results as input, and the sync and async
+    # entry points only differ in how they fetch them.
+
+    def _indexed_cached(self, scope: Tuple[str, str], now: float) -> Tuple[bool, Optional[_CacheEntry]]:
+        """(fresh, entry) for the indexed check, cached like document reads"""
+        entry = self.indexed_scopes.get(scope)
+        return entry is not None and now - entry.fetched_at < self.ttl, entry
+
+    def _is_indexed_keys(
+        self, scope: Tuple[str, str], version: int, now: float, document_keys: Any, summary_keys: Any
+    ) -> bool:
+        """
+        True if every document has a summary. Compares shallow key lists
+        (keys only, no document bodies). The answer is kept until
+        documents_version changes: a write that skipped the summary (older
+        worker, manual import) sends the scope back to the full scan.
+        """
+        if set(document_keys or {}) <= set(summary_keys or {}):
+            self.indexed_scopes[scope] = _CacheEntry(True, version, now)
+            return True
+        self.indexed_scopes.pop(scope, None)
+        return False
+
+    def _is_indexed(self, user_id: str, company_id: str) -> bool:
+        scope = (user_id, company_id)
+        now = time.monotonic()
+        fresh, entry = self._indexed_cached(scope, now)
+        if fresh:
+            return True
+        version = self._read_version(user_id, company_id)
+        if entry is not None and entry.version == version:
+            entry.fetched_at = now
+            return True
+        base = self._scope_path(user_id, company_id)
+        return self._is_indexed_keys(
+            scope, version, now,
+            self.db.reference(f"{base}/documents").get(shallow=True),
+            self.db.reference(f"{base}/document_summaries").get(shallow=True),
+        )
+
+    async def _is_indexed_async(self, user_id: str, company_id: str) -> bool:
+        scope = (user_id, company_id)
+        now = time.monotonic()
+        fresh, entry = self._indexed_cached(scope, now)
+        if fresh:
+            return True
+        version = await self._read_version_async(user_id, company_id)
+        if entry is not None and entry.version == version:
+            entry.fetched_at = now
+            return True
+        base = self._scope_path(user_id, company_id)
+        document_keys, summary_keys = await asyncio.gather(
+            self.rest.get(f"{base}/documents", shallow=True),
+            self.rest.get(f"{base}/document_summaries", shallow=True),
+        )
+        return self._is_indexed_keys(scope, version, now, document_keys, summary_keys)
+
+    @staticmethod
+    def _indexed_walk(
+        field: str,
+        end: str,
+        cursor_value: Optional[str],
+        limit: int,
+        accept: Callable[[dict], bool],
+    ) -> Generator[Tuple[str, int], Dict[str, dict], List[Tuple[str, dict, str]]]:
+        """
+        Walk an ordered child index newest-first from the cursor
+
+        A generator: yields (end_at, count) for each query it needs and is
+        sent the resulting children. Returns up to limit + 1 accepted
+        (key, doc, sort_value) rows; the extra row only signals that another
+        page exists. Without a post-filter this is a single query for
+        limit + 2 children.
+        """
+        rows: List[Tuple[str, dict, str]] = []
+        upper = cursor_value or end
+        skip = cursor_value  # end_at is inclusive: the cursor row was on the previous page
+
+        while True:
+            batch = limit - len(rows) + 2
+            chunk = (yield upper, batch) or {}
+            ordered = sorted(chunk.items(), key=lambda item: item[1].get(field) or "", reverse=True)
+
+            for key, doc in ordered:
+                value = doc.get(field)
+                if not value or value == skip:
+                    continue
+                upper = skip = value
+                if accept(doc):
+                    rows.append((key, doc, value))
+                    if len(rows) > limit:
+                        return rows
+
+            if len(chunk) < batch:
+                return rows  # Reached the start of the range
+
+    @staticmethod
+    def _legacy_page(
+        company_id: str,
+        documents: Dict[str, dict],
+        start_ms: Optional[int],
+        end_ms: Optional[int],
+        accept: Callable[[dict], bool],
+        cursor_value: Optional[str],
+        limit: int,
+    ) -> List[Tuple[str, dict, str]]:
+        """Full scan for companies that still have documents without summaries"""
+        print(f"⚠️ Unindexed documents for company {company_id}: falling back to a full scan")
+        rows: List[Tuple[str, dict, str]] = []
+        for key, doc in documents.items():
+            if not isinstance(doc, dict) or not accept(doc):
+                continue
+            created_ms = doc.get("created_at_ms") or parse_created_at(doc.get("created_at"))
+            if start_ms is not None or end_ms is not None:
+                if created_ms is None:
+                    continue
+                if start_ms is not None and created_ms < start_ms:
+                    continue
+                if end_ms is not None and created_ms > end_ms:
+                    continue
+            value = doc.get(SORT_CREATED) or created_sort_value(created_ms or 0, key)
+            if cursor_value is None or value < cursor_value:
+                rows.append((key, doc, value))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:limit + 1]
+
+    def _search_plan(
+        self,
+        user_id: str,
+        company_id: str,
+        start_ms: Optional[int],
+        end_ms: Optional[int],
+        doc_type: Optional[str],
+        cursor: Optional[str],
+    ) -> _SearchPlan:
+        cursor_value = decode_cursor(cursor) if cursor else None
+        wanted = normalize_document_type(doc_type) if doc_type and doc_type.lower() != "all" else None
+
+        if wanted == "others":
+            def accept(doc: dict) -> bool:
+                return normalize_document_type(doc.get("document_type")) not in KNOWN_DOCUMENT_TYPES
+        elif wanted:
+            def accept(doc: dict) -> bool:
+                return normalize_document_type(doc.get("document_type")) == wanted
+        else:
+            def accept(doc: dict) -> bool:
+                return True
+
+        plan = _SearchPlan(
+            path=f"{self._scope_path(user_id, company_id)}/document_summaries",
+            accept=accept,
+            cursor_value=cursor_value,
+            index_accept=accept,
+            index_cursor=cursor_value,
+        )
+        if wanted and wanted != "others":
+            # Type prefix + date range on one index: only matching children are read
+            plan.field = SORT_TYPE_CREATED
+            plan.start, plan.end = range_bounds(wanted, start_ms, end_ms)
+            plan.index_accept = lambda doc: True
+            if cursor_value is not None:
+                # Cursors hold the sort_created value; re-key it for the type index
+                plan.index_cursor = f"{wanted}|{cursor_value}"
+        else:
+            plan.field = SORT_CREATED
+            plan.start, plan.end = range_bounds(None, start_ms, end_ms)
+        return plan
+
+    @staticmethod
+    def _finish_page(rows: List[Tuple[str, dict, str]], limit: int) -> SearchPage:
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit and page:
+            next_cursor = encode_cursor(page[-1][1].get(SORT_CREATED) or page[-1][2])
+        return [(key, doc) for key, doc, _ in page], next_cursor
+
+    def search_documents(
+        self,
+        user_id: str,
+        company_id: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        doc_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> SearchPage:
+        """
+        One page of document summaries, newest first
+
+        Reads document_summaries only; companies with documents saved before
+        summaries existed fall back to scanning full documents.
+
+        Args:
+            start_ms / end_ms: Inclusive created_at_ms range
+            doc_type: receipt, invoice, bank_statement, others, all/None, or any stored type
+            cursor: next_cursor from the previous page
+            limit: Page size
+
+        Returns:
+            ([(doc_id, summary), ...], next_cursor or None)
+
+        Raises:
+            ValueError: For a malformed cursor
+        """
+        plan = self._search_plan(user_id, company_id, start_ms, end_ms, doc_type, cursor)
+
+        if not self._is_indexed(user_id, company_id):
+            rows = self._legacy_page(
+                company_id, self.get_all_documents(user_id, company_id),
+                start_ms, end_ms, plan.accept, plan.cursor_value, limit,
+            )
+            return self._finish_page(rows, limit)
+
+        walk = self._indexed_walk(plan.field, plan.end, plan.index_cursor, limit, plan.index_accept)
+        try:
+            upper, count = next(walk)
+            while True:
+                query = self.db.reference(plan.path).order_by_child(plan.field).start_at(plan.start)
+                upper, count = walk.send(query.end_at(upper).limit_to_last(count).get())
+        except StopIteration as done:
+            return self._finish_page(done.value, limit)
+
+    async def search_documents_async(self, user_id: str, company_id: str, **filters) -> SearchPage:
+        rest = self.rest
+        if rest is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, lambda: self.search_documents(user_id, company_id, **filters))
+
+        limit = filters.get("limit", 50)
+        start_ms, end_ms = filters.get("start_ms"), filters.get("end_ms")
+        plan = self._search_plan(
+            user_id, company_id, start_ms, end_ms, filters.get("doc_type"), filters.get("cursor")
+        )
+
+        if not await self._is_indexed_async(user_id, company_id):
+            rows = self._legacy_page(
+                company_id, await self.get_all_documents_async(user_id, company_id),
+                start_ms, end_ms, plan.accept, plan.cursor_value, limit,
+            )
+            return self._finish_page(rows, limit)
+
+        walk = self._indexed_walk(plan.field, plan.end, plan.index_cursor, limit, plan.index_accept)
+        try:
+            upper, count = next(walk)
+            while True:
+                chunk = await rest.query(
+                    plan.path, plan.field, start_at=plan.start, end_at=upper, limit_to_last=count
+                )
+                upper, count = walk.send(chunk)
+        except StopIteration as done:
+            return self._finish_page(done.value, limit)
+
+    async def search_all_documents_async(
+        self, user_id: str, company_id: str, page_size: int = 200, **filters
+    ) -> List[Tuple[str, dict]]:
+        """
+        Every matching document summary, newest first
+
+        Follows the cursor through pages of page_size, for callers that want
+        the whole list in one response.
+
+        Returns:
+            [(doc_id, summary), ...]
+        """
+        documents: List[Tuple[str, dict]] = []
+        cursor = None
+        while True:
+            page, cursor = await self.search_documents_async(
+                user_id, company_id, cursor=cursor, limit=page_size, **filters
+            )
+            documents.extend(page)
+            if cursor is None:
+                return documents
+
+    # ==============================
+    #  WRITES
+    # ==============================
+
+    async def save_async(self, data: dict, user_id: str, company_id: str, batch=None) -> dict:
+        """Save through FirebaseService (which bumps the version stamp) and invalidate"""
+        result = await self.firebase_service.save_async(data, user_id, company_id, batch=batch)
+        self.invalidate(user_id, company_id, data["document_key"])
+        return result
+
+    def invalidate(self, user_id: str, company_id: str, doc_key: Optional[str] = None) -> None:
+        """Forget cached reads for a user+company (one document and the list, or everything)"""
+        self.cache.discard_scope(user_id, company_id, doc_key)
+        self.invalidations += 1
+
+    def get_status(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "max_entries": self.cache.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "revalidations": self.revalidations,
+            "invalidations": self.invalidations,
+            "evictions": self.cache.evictions,
+        }
+
+
+def render_cache_metrics(repository: "DocumentRepository") -> str:
+    """Prometheus text lines for the document cache (appended to /admin/metrics)"""
+    status = repository.get_status()
+    lines = []
+    for name, metric_type, key in (
+        ("document_cache_hits_total", "counter", "hits"),
+        ("document_cache_misses_total", "counter", "misses"),
+        ("document_cache_revalidations_total", "counter", "revalidations"),
+        ("document_cache_invalidations_total", "counter", "invalidations"),
+        ("document_cache_evictions_total", "counter", "evictions"),
+        ("document_cache_entries", "gauge", "entries"),
+    ):
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name} {float(status[key])!r}")
+    return "\n".join(lines) + "\n"
+
+
+_document_repository: Optional[DocumentRepository] = None
+
+
+def get_document_repository() -> DocumentRepository:
+    """Get or create the process-wide document repository"""
+    global _document_repository
+    if _document_repository is None:
+        _document_repository = DocumentRepository(
+            ttl=config.DOCUMENT_CACHE_TTL,
+            max_entries=config.DOCUMENT_CACHE_MAX_ENTRIES,
+        )
+    return _document_repository
+
+
+def peek_document_repository() -> Optional[DocumentRepository]:
+    """The repository if it was created in this process (metrics must not create it)"""
+    return _document_repository
@@ -1,15 +1,77 @@
-from datetime import datetime
-from zoneinfo import ZoneInfo
-from app.config.settings import init_firebase
-from firebase_admin import db
+from app.config.config import config
+from app.infrastructure.firebase.document_index import build_document_summary
+from app.infrastructure.firebase.payload_codec import decode_document, decode_documents, encode_document
+from app.infrastructure.firebase.rtdb_rest_client import RTDBRestClient, get_rtdb_rest_client
+from app.infrastructure.firebase.write_batch import WriteBatch
+from app.infrastructure.storage.document_store import DocumentStore, get_document_store
+from app.utils.timestamps import format_display, now_ms
+from typing import Callable, List, Optional
 import asyncio
 
 
+def _write_summary(batch: WriteBatch, doc_key: str, payload: dict) -> None:
+    """List-view projection read by /search-documents"""
+    batch.set(f"document_summaries/{doc_key}", build_document_summary(payload, doc_key, payload["created_at_ms"]))
+
+
 class FirebaseService:
 
-    def __init__(self):
-        # firebase_admin db instance
-        self.db = init_firebase()
+    def __init__(self, db: Optional[DocumentStore] = None, rest: Optional[RTDBRestClient] = None):
+        # Document store (Realtime Database unless DOCUMENT_STORE says otherwise)
+        self.db = db or get_document_store()
+        # Async REST client for the server loop; an injected store never uses the shared one
+        self._rest = rest
+        self._use_shared_rest = db is None and rest is None
+        # Derived writes (indexes, projections) added to every document's batch
+        self.index_writers: List[Callable[[WriteBatch, str, dict], None]] = [_write_summary]
+
+    def batch(self, user_id: str, company_id: str) -> WriteBatch:
+        """Write batch rooted at users/{user_id}/companies/{company_id}"""
+        return WriteBatch(self.db, f"users/{user_id}/companies/{company_id}", rest=self.rest)
+
+    def register_index_writer(self, writer: Callable[[WriteBatch, str, dict], None]) -> None:
+        """Add writer(batch, doc_key, payload) to the single update() of every saved document"""
+        self.index_writers.append(writer)
+
+    # ==============================
+    #  ASYNC PRIMITIVES
+    # ==============================
+    # Native async over REST on the server loop (no thread held per round
+    # trip); elsewhere the blocking store call runs in the executor.
+
+    @property
+    def rest(self) -> Optional[RTDBRestClient]:
+        if self._rest is not None:
+            return self._rest if self._rest.usable() else None
+        return get_rtdb_rest_client() if self._use_shared_rest else None
+
+    async def _in_executor(self, func: Callable, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _get(self, path: str, shallow: bool = False):
+        rest = self.rest
+        if rest is not None:
+            return await rest.get(path, shallow=shallow)
+        return await self._in_executor(lambda: self.db.reference(path).get(shallow=shallow))
+
+    async def _set(self, path: str, value) -> None:
+        rest = self.rest
+        if rest is not None:
+            return await rest.set(path, value)
+        await self._in_executor(self.db.reference(path).set, value)
+
+    async def _delete(self, path: str) -> None:
+        rest = self.rest
+        if rest is not None:
+            return await rest.delete(path)
+        await self._in_executor(self.db.reference(path).delete)
+
+    async def _transaction(self, path: str, transaction_func: Callable):
+        rest = self.rest
+        if rest is not None:
+            return await rest.transaction(path, transaction_func)
+        return await self._in_executor(self.db.reference(path).transaction, transaction_func)
 
     # ==============================
     #  CLEAN SERVER PAYLOAD FOR API
@@ -26,6 +88,9 @@ class FirebaseService:
             "server_path",
             "status",
             "user_id",
+            "created_at_ms",
+            "sort_created",
+            "sort_type_created",
         ]
 
         for key in remove_keys:
@@ -37,17 +102,23 @@ class FirebaseService:
     #  SAVE METHOD (User-Scoped)
     # ==============================
 
-    async def save_async(self, data: dict, user_id: str, company_id: str) -> dict:
+    async def save_async(
+        self, data: dict, user_id: str, company_id: str, batch: Optional[WriteBatch] = None
+    ) -> dict:
         """
-        Save document into user and company-specific paths (async version with parallel writes):
+        Save document into user and company-specific paths in one round trip:
 
         🔹 users/{user_id}/companies/{company_id}/documents/{document_key}
             → Full parsed JSON with metadata
+        🔹 .../document_summaries/{document_key} and any registered index writes
+        🔹 .../meta/documents_version (server-side increment)
 
         Args:
             data: Document data to save
             user_id: Firebase UID of the user
             company_id: Company identifier
+            batch: Batch from self.batch(user_id, company_id) holding extra writes
+                   to commit together with the document
         """
 
         # Validate document_key
@@ -56,29 +127,37 @@ class FirebaseService:
 
         doc_key = data["document_key"]
 
-        # Generate Nepal timestamp
-        now_nepal = datetime.now(ZoneInfo("Asia/Kathmandu"))
-        created_at = now_nepal.strftime("%d %B %Y at %I:%M:%S %p")
+        # Canonical epoch-ms timestamp; created_at is the Nepal-time display string derived from it
+        created_at_ms = now_ms()
+        created_at = format_display(created_at_ms)
 
         # Prepare complete payload
         complete_payload = data.copy()
         complete_payload["created_at"] = created_at
         complete_payload["user_id"] = user_id
         complete_payload["company_id"] = company_id
-
-        # Single reference path
-        doc_ref = self.db.reference(
-            f"users/{user_id}/companies/{company_id}/documents/{doc_key}"
+        complete_payload["created_at_ms"] = created_at_ms
+
+        # One multi-path update keeps the document, its indexes and the version
+        # stamp (other workers' DocumentRepository caches) consistent
+        if batch is None:
+            batch = self.batch(user_id, company_id)
+        batch.set(
+            f"documents/{doc_key}",
+            encode_document(complete_payload, config.DOCUMENT_COMPRESSION, config.DOCUMENT_COMPRESS_MIN_BYTES),
         )
+        for writer in self.index_writers:
+            writer(batch, doc_key, complete_payload)
+        batch.increment("meta/documents_version")
 
         # Write to Firebase
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, doc_ref.set, complete_payload)
+        await batch.commit_async()
 
         return {
             "status": "saved",
             "document_key": doc_key,
             "created_at": created_at,
+            "created_at_ms": created_at_ms,
             "document_path": f"users/{user_id}/companies/{company_id}/documents/{doc_key}",
             "full_data": self._clean_for_response(complete_payload),
         }
@@ -86,49 +165,39 @@ class FirebaseService:
     async def get_all_async(self, user_id: str, company_id: str):
         """Get all documents for a specific user and company from Firebase"""
 
-        loop = asyncio.get_event_loop()
-        ref = db.reference(f"users/{user_id}/companies/{company_id}/documents")
-        all_docs = await loop.run_in_executor(None, ref.get)
+        all_docs = await self._get(f"users/{user_id}/companies/{company_id}/documents")
 
         if not all_docs:
             return {}
 
-        return all_docs
+        return decode_documents(all_docs)
 
     async def get_document_async(
         self, user_id: str, company_id: str, document_key: str
     ):
         """Get a specific document for a user and company"""
 
-        loop = asyncio.get_event_loop()
-        ref = db.reference(
+        return decode_document(await self._get(
             f"users/{user_id}/companies/{company_id}/documents/{document_key}"
-        )
-        return await loop.run_in_executor(None, ref.get)
+        ))
 
     async def save_google_tokens_async(
         self, user_id: str, company_id: str, tokens: dict
     ):
         """Save encrypted Google OAuth tokens for a user and company"""
-        loop = asyncio.get_event_loop()
-        ref = self.db.reference(f"users/{user_id}/companies/{company_id}/google_tokens")
-        await loop.run_in_executor(None, ref.set, tokens)
+        await self._set(f"users/{user_id}/companies/{company_id}/google_tokens", tokens)
 
     async def get_google_tokens_async(self, user_id: str, company_id: str):
         """Get encrypted Google OAuth tokens for a user and company"""
-        loop = asyncio.get_event_loop()
-        ref = self.db.reference(f"users/{user_id}/companies/{company_id}/google_tokens")
-        return await loop.run_in_executor(None, ref.get)
+        return await self._get(f"users/{user_id}/companies/{company_id}/google_tokens")
 
     async def disconnect_google_tokens_async(self, user_id: str, company_id: str):
         """
         Disconnect Google Sheets by removing active tokens.
         Does NOT delete the sheet history or map.
         """
-        loop = asyncio.get_event_loop()
-        ref = self.db.reference(f"users/{user_id}/companies/{company_id}/google_tokens")
         # Removing the node effectively disconnects
-        await loop.run_in_executor(None, ref.delete)
+        await self._delete(f"users/{user_id}/companies/{company_id}/google_tokens")
 
     async def save_sheet_to_history_async(
         self, user_id: str, company_id: str, google_sub: str, sheet_info: dict
@@ -137,13 +206,12 @@ class FirebaseService:
         Save a sheet to the user's history for a specific Google Account.
         Path: users/{uid}/companies/{cid}/sheet_history/{google_sub}/{sheet_id}
         """
-        loop = asyncio.get_event_loop()
         sheet_id = sheet_info["spreadsheet_id"]
         # Use sheet_id as key to prevent duplicates
-        ref = self.db.reference(
-            f"users/{user_id}/companies/{company_id}/sheet_history/{google_sub}/{sheet_id}"
+        await self._set(
+            f"users/{user_id}/companies/{company_id}/sheet_history/{google_sub}/{sheet_id}",
+            sheet_info,
         )
-        await loop.run_in_executor(None, ref.set, sheet_info)
 
     async def get_sheet_history_async(
         self, user_id: str, company_id: str, google_sub: str = None
@@ -153,17 +221,14 @@ class FirebaseService:
         If google_sub is provided, gets history for that account.
         If google_sub is active in google_tokens, you can fetch it from there first.
         """
-        loop = asyncio.get_event_loop()
         # If we know the google_sub, we fetch that specific history
         if google_sub:
-            ref = self.db.reference(
+            return await self._get(
                 f"users/{user_id}/companies/{company_id}/sheet_history/{google_sub}"
             )
-            return await loop.run_in_executor(None, ref.get)
 
         # Otherwise possibly get all history (rarely used directly without knowing account)
-        ref = self.db.reference(f"users/{user_id}/companies/{company_id}/sheet_history")
-        return await loop.run_in_executor(None, ref.get)
+        return await self._get(f"users/{user_id}/companies/{company_id}/sheet_history")
 
     async def delete_sheet_from_history_async(
         self, user_id: str, company_id: str, spreadsheet_id: str, google_sub: str = None
@@ -172,28 +237,23 @@ class FirebaseService:
         Delete a specific sheet from user's history.
         If google_sub is not provided, it will try to remove from all accounts in sheet_history.
         """
-        loop = asyncio.get_event_loop()
-
         if google_sub:
             # Delete specific sheet under specific account
-            ref = self.db.reference(
+            await self._delete(
                 f"users/{user_id}/companies/{company_id}/sheet_history/{google_sub}/{spreadsheet_id}"
             )
-            await loop.run_in_executor(None, ref.delete)
         else:
             # Remove from all google_sub accounts
-            ref = self.db.reference(
+            all_history = await self._get(
                 f"users/{user_id}/companies/{company_id}/sheet_history"
             )
-            all_history = await loop.run_in_executor(None, ref.get)
 
             if all_history:
                 for sub_id, sheets in all_history.items():
                     if isinstance(sheets, dict) and spreadsheet_id in sheets:
-                        ref_to_delete = self.db.reference(
+                        await self._delete(
                             f"users/{user_id}/companies/{company_id}/sheet_history/{sub_id}/{spreadsheet_id}"
                         )
-                        await loop.run_in_executor(None, ref_to_delete.delete)
                         break
 
     async def get_next_sheet_number_async(self, user_id: str, company_id: str) -> int:
@@ -202,8 +262,6 @@ class FirebaseService:
         Increments the counter at: users/{user_id}/companies/{company_id}/sheet_counter
         Returns the new number.
         """
-        loop = asyncio.get_event_loop()
-        ref = self.db.reference(f"users/{user_id}/companies/{company_id}/sheet_counter")
 
         def transaction_func(current_value):
             if current_value is None:
@@ -211,10 +269,9 @@ class FirebaseService:
             return current_value + 1
 
         # Run transaction
-        new_val = await loop.run_in_executor(
-            None, lambda: ref.transaction(transaction_func)
+        return await self._transaction(
+            f"users/{user_id}/companies/{company_id}/sheet_counter", transaction_func
         )
-        return new_val
 
     async def get_next_document_number_async(
         self, user_id: str, company_id: str, doc_prefix: str
@@ -223,17 +280,41 @@ class FirebaseService:
         Get the next number for a specific document type (prefix).
         Increments: users/{user_id}/companies/{company_id}/counters/{doc_prefix}
         """
-        loop = asyncio.get_event_loop()
-        ref = self.db.reference(
-            f"users/{user_id}/companies/{company_id}/counters/{doc_prefix}"
+        first, _ = await self.reserve_document_numbers_async(user_id, company_id, doc_prefix, 1)
+        return first
+
+    async def reserve_document_numbers_async(
+        self, user_id: str, company_id: str, doc_prefix: str, count: int
+    ) -> tuple:
+        """
+        Reserve a block of `count` numbers for a document type in one transaction.
+        Advances: users/{user_id}/companies/{company_id}/counters/{doc_prefix}
+        Returns (first, last), both inclusive.
+        """
+
+        def transaction_func(current_value):
+            return (current_value or 0) + count
+
+        last = await self._transaction(
+            f"users/{user_id}/companies/{company_id}/counters/{doc_prefix}", transaction_func
         )
+        return last - count + 1, last
+
+    async def return_document_numbers_async(
+        self, user_id: str, company_id: str, doc_prefix: str, first_unused: int, last: int
+    ) -> bool:
+        """
+        Hand back the unused tail [first_unused, last] of a reserved block.
+        Only possible while nobody has reserved after us (counter still == last);
+        otherwise the numbers are skipped. Returns True if they were handed back.
+        """
 
         def transaction_func(current_value):
-            if current_value is None:
-                return 1
-            return current_value + 1
+            if current_value == last:
+                return first_unused - 1
+            return current_value  # Someone reserved after us: leave the gap
 
-        new_val = await loop.run_in_executor(
-            None, lambda: ref.transaction(transaction_func)
+        new_val = await self._transaction(
+            f"users/{user_id}/companies/{company_id}/counters/{doc_prefix}", transaction_func
         )
-        return new_val
\ No newline at end of file
+        return new_val == first_unused - 1
@@ -0,0 +1,117 @@
+"""
+Compressed storage for large document arrays
+A bank statement with hundreds of transactions is a deep RTDB tree: every
+read transfers and materializes each row as its own node. With
+DOCUMENT_COMPRESSION set, top-level arrays whose compact JSON exceeds
+DOCUMENT_COMPRESS_MIN_BYTES are stored as one small node instead:
+
+    "transactions": {
+        "_codec": "zstd",         # or "gzip"
+        "count": 412,             # readable without decompressing
+        "raw_bytes": 61234,
+        "data": "<base64 of compressed compact JSON>"
+    }
+
+FirebaseService encodes on save; the read paths (DocumentRepository and
+FirebaseService's getters) decode, so callers always see plain lists.
+Documents stored before this, or with compression off, pass through as is.
+"""
+
+import base64
+import gzip
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CODEC_KEY = "_codec"
+CODECS = ("gzip", "zstd")
+
+_warned_zstd_missing = False
+
+
+def _compress(codec: str, raw: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return gzip.compress(raw, compresslevel=6, mtime=0)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Document stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def resolve_codec(codec: Optional[str]) -> Optional[str]:
+    """Configured codec, or None when compression is off (zstd falls back to gzip if missing)"""
+    global _warned_zstd_missing
+    codec = (codec or "off").lower()
+    if codec not in CODECS:
+        return None
+    if codec == "zstd" and not ZSTD_AVAILABLE:
+        if not _warned_zstd_missing:
+            print("⚠️ zstandard not installed: compressing documents with gzip instead")
+            _warned_zstd_missing = True
+        return "gzip"
+    return codec
+
+
+def is_blob(value: Any) -> bool:
+    return isinstance(value, dict) and CODEC_KEY in value and "data" in value
+
+
+def encode_document(document: Dict[str, Any], codec: Optional[str], min_bytes: int) -> Dict[str, Any]:
+    """
+    Stored form of a document: large top-level arrays become compressed blobs
+
+    Args:
+        document: Plain document (not modified)
+        codec: "gzip" / "zstd" (see resolve_codec); None returns the document unchanged
+        min_bytes: Arrays smaller than this (compact JSON) stay as RTDB nodes
+
+    Returns:
+        The document to write
+    """
+    codec = resolve_codec(codec)
+    if codec is None:
+        return document
+
+    encoded = dict(document)
+    for key, value in document.items():
+        if not isinstance(value, list) or not value:
+            continue
+        raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        if len(raw) < min_bytes:
+            continue
+        encoded[key] = {
+            CODEC_KEY: codec,
+            "count": len(value),
+            "raw_bytes": len(raw),
+            "data": base64.b64encode(_compress(codec, raw)).decode("ascii"),
+        }
+    return encoded
+
+
+def decode_document(document: Any) -> Any:
+    """Plain form of a stored document (blobs expanded back into lists)"""
+    if not isinstance(document, dict) or not any(is_blob(value) for value in document.values()):
+        return document
+    decoded = dict(document)
+    for key, value in document.items():
+        if is_blob(value):
+            raw = _decompress(value[CODEC_KEY], base64.b64decode(value["data"]))
+            decoded[key] = json.loads(raw.decode("utf-8"))
+    return decoded
+
+
+def decode_documents(documents: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """decode_document over a documents/ listing"""
+    if not documents:
+        return documents
+    return {key: decode_document(document) for key, document in documents.items()}
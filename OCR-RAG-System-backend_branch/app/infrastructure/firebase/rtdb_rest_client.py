@@ -0,0 +1,295 @@
+"""
+Native async Realtime Database REST client
+firebase_admin is blocking, so every read wrapped in run_in_executor holds a
+thread for its whole round trip and concurrency is capped by the pool size.
+This client talks to the RTDB REST API with httpx instead:
+
+- one pooled AsyncClient with keep-alive connections (no TCP/TLS handshake per call)
+- HTTP/2 when the h2 package is installed: concurrent requests are multiplexed
+  over the same connection (httpx has no HTTP/1.1 pipelining; this is its
+  equivalent), and get_many() fans reads out concurrently
+- connect / read timeouts from config
+- OAuth tokens from the firebase_admin app's service account credential,
+  refreshed shortly before expiry
+
+It binds to the event loop it is started on (the server loop, see main.py).
+FirebaseService only uses it from that loop; background tasks that run their
+own loop keep using firebase_admin through the executor.
+"""
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from app.config.config import config
+from app.infrastructure.storage.document_store import order_children, split_path
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class RTDBRestError(Exception):
+    """Non-success response from the Realtime Database REST API"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"RTDB REST {status_code}: {message}")
+        self.status_code = status_code
+
+
+class RTDBRestClient:
+    """Async get / set / update / delete / transaction / ordered queries over REST"""
+
+    def __init__(
+        self,
+        database_url: str,
+        credentials: Any = None,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        transport: Any = None,
+    ):
+        """
+        Args:
+            database_url: https://<db>.firebaseio.com
+            credentials: google.auth credentials (None = unauthenticated, e.g. emulator)
+            timeout: Read/write/pool timeout per request (seconds)
+            connect_timeout: TCP/TLS connect timeout (seconds)
+            max_connections: Upper bound on open connections
+            max_keepalive: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept
+            http2: Multiplex over HTTP/2 when h2 is installed
+            transport: httpx transport override (tests)
+        """
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("httpx is required for the async RTDB client (pip install httpx)")
+        self.database_url = database_url.rstrip("/")
+        self.credentials = credentials
+        self.loop = asyncio.get_running_loop()
+        self.refresh_lock = asyncio.Lock()
+        self.http2 = http2 and HTTP2_AVAILABLE and transport is None
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def usable(self) -> bool:
+        """True when called from the loop this client was started on"""
+        try:
+            return asyncio.get_running_loop() is self.loop and not self.client.is_closed
+        except RuntimeError:
+            return False
+
+    def _url(self, path: str) -> str:
+        encoded = "/".join(quote(part, safe="") for part in split_path(path))
+        return f"{self.database_url}/{encoded}.json"
+
+    async def _headers(self) -> Dict[str, str]:
+        if self.credentials is None:
+            return {}
+        if not self.credentials.valid:
+            async with self.refresh_lock:
+                if not self.credentials.valid:
+                    from google.auth.transport.requests import Request
+                    # Token refresh is a blocking call, roughly once an hour
+                    await self.loop.run_in_executor(None, self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, str]] = None,
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        ok_statuses: tuple = (200, 204),
+    ) -> "httpx.Response":
+        request_headers = await self._headers()
+        if headers:
+            request_headers.update(headers)
+        content = None if body is None and method == "GET" else json.dumps(body)
+
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await self.client.request(
+                method, self._url(path), params=params, content=content, headers=request_headers
+            )
+        finally:
+            self.in_flight -= 1
+
+        if response.status_code not in ok_statuses:
+            try:
+                message = response.json().get("error", response.text)
+            except (ValueError, AttributeError):
+                message = response.text
+            raise RTDBRestError(response.status_code, message)
+        return response
+
+    @staticmethod
+    def _json(response: "httpx.Response") -> Any:
+        return response.json() if response.content else None
+
+    # ==============================
+    #  READS
+    # ==============================
+
+    async def get(self, path: str, shallow: bool = False) -> Any:
+        response = await self._request("GET", path, params={"shallow": "true"} if shallow else None)
+        return self._json(response)
+
+    async def get_many(self, paths: List[str], concurrency: int = 32) -> List[Any]:
+        """Read several paths concurrently (multiplexed on HTTP/2), results in input order"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(path: str) -> Any:
+            async with semaphore:
+                return await self.get(path)
+
+        return await asyncio.gather(*(one(path) for path in paths))
+
+    async def query(
+        self,
+        path: str,
+        order_by: str,
+        start_at: Any = None,
+        end_at: Any = None,
+        limit_to_first: Optional[int] = None,
+        limit_to_last: Optional[int] = None,
+    ) -> "Dict[str, Any]":
+        """Ordered child query; the REST API returns an object, so order is restored here"""
+        params = {"orderBy": json.dumps(order_by)}
+        if start_at is not None:
+            params["startAt"] = json.dumps(start_at)
+        if end_at is not None:
+            params["endAt"] = json.dumps(end_at)
+        if limit_to_first is not None:
+            params["limitToFirst"] = str(limit_to_first)
+        if limit_to_last is not None:
+            params["limitToLast"] = str(limit_to_last)
+        response = await self._request("GET", path, params=params)
+        return order_children(self._json(response), split_path(order_by))
+
+    # ==============================
+    #  WRITES
+    # ==============================
+
+    async def set(self, path: str, value: Any) -> None:
+        await self._request("PUT", path, params={"print": "silent"}, body=value)
+
+    async def update(self, path: str, values: Dict[str, Any]) -> None:
+        """Multi-location update (atomic on the server)"""
+        await self._request("PATCH", path, params={"print": "silent"}, body=values)
+
+    async def delete(self, path: str) -> None:
+        await self._request("DELETE", path, params={"print": "silent"})
+
+    async def transaction(
+        self, path: str, transaction_update: Callable[[Any], Any], max_retries: int = 25
+    ) -> Any:
+        """
+        Compare-and-set loop using ETags
+
+        Args:
+            path: Node to update
+            transaction_update: current value -> new value
+            max_retries: Conflicting writes tolerated before giving up
+
+        Returns:
+            The value written
+        """
+        response = await self._request("GET", path, headers={"X-Firebase-ETag": "true"})
+        etag, current = response.headers.get("ETag"), self._json(response)
+
+        for _ in range(max_retries):
+            new_value = transaction_update(current)
+            response = await self._request(
+                "PUT", path, body=new_value, headers={"if-match": etag}, ok_statuses=(200, 412)
+            )
+            if response.status_code == 200:
+                return new_value
+            # Someone wrote first: the 412 carries their value and its ETag
+            etag, current = response.headers.get("ETag"), self._json(response)
+
+        raise RTDBRestError(412, f"Transaction on '{path}' aborted after {max_retries} conflicts")
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+_rest_client: Optional[RTDBRestClient] = None
+
+
+def get_rtdb_rest_client() -> Optional[RTDBRestClient]:
+    """The client if it was started and may be used from the current loop, else None"""
+    if _rest_client is not None and _rest_client.usable():
+        return _rest_client
+    return None
+
+
+async def start_rtdb_rest_client() -> Optional[RTDBRestClient]:
+    """
+    Create the process-wide client on the running (server) loop
+
+    Only for DOCUMENT_STORE=firebase with FIREBASE_ASYNC_CLIENT on; reuses the
+    service account credential firebase_admin was initialized with.
+    """
+    global _rest_client
+    if _rest_client is not None or config.DOCUMENT_STORE != "firebase" or not config.FIREBASE_ASYNC_CLIENT:
+        return _rest_client
+    if not HTTPX_AVAILABLE:
+        print("⚠️ httpx not installed: Firebase reads stay on the thread pool")
+        return None
+
+    import firebase_admin
+    from app.config.settings import init_firebase
+
+    init_firebase()
+    app = firebase_admin.get_app()
+    _rest_client = RTDBRestClient(
+        app.options.get("databaseURL"),
+        credentials=app.credential.get_credential(),
+        timeout=config.FIREBASE_REST_TIMEOUT,
+        connect_timeout=config.FIREBASE_REST_CONNECT_TIMEOUT,
+        max_connections=config.FIREBASE_REST_MAX_CONNECTIONS,
+        max_keepalive=config.FIREBASE_REST_MAX_KEEPALIVE,
+    )
+    print(f"⚡ Async RTDB client ready (HTTP/2: {_rest_client.http2})")
+    return _rest_client
+
+
+async def stop_rtdb_rest_client() -> None:
+    global _rest_client
+    if _rest_client is not None:
+        await _rest_client.aclose()
+        _rest_client = None
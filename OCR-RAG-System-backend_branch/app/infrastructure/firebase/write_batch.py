@@ -0,0 +1,79 @@
+"""
+Multi-location write batching for the Realtime Database
+Collects every write for one ingested document (the document, its summary,
+version stamps, future indexes) under a common root and sends them as a
+single update() call: one round trip, and RTDB applies it atomically.
+"""
+
+import asyncio
+from typing import Any, Dict
+
+
+class WriteBatch:
+    """
+    Writes relative to one root, committed with a single multi-path update()
+
+    Paths are relative to the root ("documents/INV1", "meta/documents_version").
+    RTDB rejects an update where one path is an ancestor of another, so that
+    is checked when the write is added rather than failing the whole commit.
+    """
+
+    def __init__(self, db, root_path: str, rest=None):
+        self.db = db
+        self.rest = rest  # RTDBRestClient: commit_async without the executor
+        self.root_path = root_path.strip("/")
+        self.writes: Dict[str, Any] = {}
+        self.commits = 0
+
+    def set(self, path: str, value: Any) -> "WriteBatch":
+        """Replace the node at path (value None deletes it)"""
+        path = path.strip("/")
+        if not path:
+            raise ValueError("WriteBatch paths must be relative to the batch root")
+        for existing in self.writes:
+            if existing != path and (existing.startswith(path + "/") or path.startswith(existing + "/")):
+                raise ValueError(f"Overlapping paths in one batch: '{existing}' and '{path}'")
+        self.writes[path] = value
+        return self
+
+    def update(self, path: str, fields: Dict[str, Any]) -> "WriteBatch":
+        """Set individual children of path, leaving its other children untouched"""
+        for key, value in fields.items():
+            self.set(f"{path.strip('/')}/{key}", value)
+        return self
+
+    def increment(self, path: str, delta: int = 1) -> "WriteBatch":
+        """Server-side increment (no read needed)"""
+        return self.set(path, {".sv": {"increment": delta}})
+
+    def delete(self, path: str) -> "WriteBatch":
+        return self.set(path, None)
+
+    def __len__(self) -> int:
+        return len(self.writes)
+
+    def commit(self) -> int:
+        """
+        Send all writes in one update() call
+
+        Returns:
+            Number of paths written (0 if the batch was empty: no round trip)
+        """
+        if not self.writes:
+            return 0
+        self.db.reference(self.root_path).update(self.writes)
+        written = len(self.writes)
+        self.writes = {}
+        self.commits += 1
+        return written
+
+    async def commit_async(self) -> int:
+        if self.rest is None or not self.rest.usable():
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.commit)
+        if not self.writes:
+            return 0
+        writes, self.writes = self.writes, {}
+        await self.rest.update(self.root_path, writes)
+        self.commits += 1
+        return len(writes)
@@ -0,0 +1 @@
+# Local stand-in for the Gemini/Groq chat APIs (load and latency testing)
@@ -0,0 +1,32 @@
+"""
+Client settings that point the LangChain Groq/Gemini clients at the mock LLM server
+Both helpers return {} when LLM_MOCK_URL is not set, so callers can always
+splat them into the client constructor.
+"""
+
+from typing import Any, Dict
+
+from app.config.config import config
+
+MOCK_API_KEY = "mock-key"
+
+
+def is_mock_enabled() -> bool:
+    return bool(config.LLM_MOCK_URL)
+
+
+def groq_client_overrides() -> Dict[str, Any]:
+    """ChatGroq kwargs: the OpenAI-compatible routes live under {base_url}/openai/v1"""
+    if not is_mock_enabled():
+        return {}
+    return {"base_url": config.LLM_MOCK_URL.rstrip("/")}
+
+
+def gemini_client_overrides() -> Dict[str, Any]:
+    """ChatGoogleGenerativeAI kwargs: REST transport against the mock endpoint"""
+    if not is_mock_enabled():
+        return {}
+    return {
+        "transport": "rest",
+        "client_options": {"api_endpoint": config.LLM_MOCK_URL.rstrip("/")},
+    }
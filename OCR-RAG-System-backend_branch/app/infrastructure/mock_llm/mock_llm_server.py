@@ -0,0 +1,377 @@
+"""
+Mock LLM Server
+Speaks enough of the Groq (OpenAI-compatible) and Gemini REST chat APIs for
+the LangChain clients used by the parser and RAG services, so the pipeline
+and the rate limiter can be load-tested without spending real quota.
+
+Run:
+    uvicorn app.infrastructure.mock_llm.mock_llm_server:app --port 8090
+    LLM_MOCK_URL=http://127.0.0.1:8090 uvicorn main:app
+
+Behaviour is configured with environment variables (or POST /mock/config):
+    MOCK_LLM_LATENCY        fixed:<s> | uniform:<lo>,<hi> | normal:<mean>,<sd> | lognormal:<mu>,<sigma>
+    MOCK_LLM_429_RATE       probability of an injected 429 (0.0 - 1.0)
+    MOCK_LLM_RPM            requests per minute before 429s are returned (0 = unlimited)
+    MOCK_LLM_RETRY_AFTER    seconds reported in the "try again in Xs" message
+    MOCK_LLM_TIMEOUT_RATE   probability of a hanging request
+    MOCK_LLM_TIMEOUT_SECONDS how long a hanging request hangs before a 504
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockLLMSettings:
+    """Runtime-adjustable behaviour of the mock server"""
+    latency: str = os.getenv("MOCK_LLM_LATENCY", "uniform:0.3,1.2")
+    rate_429: float = float(os.getenv("MOCK_LLM_429_RATE", "0.0"))
+    rpm: int = int(os.getenv("MOCK_LLM_RPM", "0"))
+    retry_after: float = float(os.getenv("MOCK_LLM_RETRY_AFTER", "5"))
+    timeout_rate: float = float(os.getenv("MOCK_LLM_TIMEOUT_RATE", "0.0"))
+    timeout_seconds: float = float(os.getenv("MOCK_LLM_TIMEOUT_SECONDS", "300"))
+    stream_chunk_chars: int = int(os.getenv("MOCK_LLM_STREAM_CHUNK_CHARS", "24"))
+
+    def sample_latency(self) -> float:
+        """Draw one latency (seconds) from the configured distribution"""
+        kind, _, params = self.latency.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()] if params else []
+        if kind == "fixed":
+            return values[0] if values else 0.0
+        if kind == "uniform":
+            return random.uniform(values[0], values[1])
+        if kind == "normal":
+            return max(0.0, random.gauss(values[0], values[1]))
+        if kind == "lognormal":
+            return random.lognormvariate(values[0], values[1])
+        raise ValueError(f"Unknown latency distribution: {self.latency}")
+
+
+@dataclass
+class MockLLMStats:
+    requests: int = 0
+    responses: int = 0
+    injected_429: int = 0
+    rpm_429: int = 0
+    timeouts: int = 0
+    by_api: Dict[str, int] = field(default_factory=dict)
+
+
+settings = MockLLMSettings()
+stats = MockLLMStats()
+_recent_requests: Deque[float] = deque()
+
+app = FastAPI(title="Mock LLM Server")
+
+
+# ==============================
+#  CANNED RESPONSES
+# ==============================
+
+def _canned_document(text: str) -> Dict[str, Any]:
+    """Schema-valid parser output, typed after keywords in the OCR text"""
+    lowered = text.lower()
+    if "statement" in lowered or "account" in lowered:
+        return {
+            "document_type": "bank statement",
+            "account_number": "0012345678",
+            "total_amount": 0,
+            "date": "2025-11-27",
+            "transactions": [
+                {"date": "2025-11-01", "description": "Opening Balance", "debit": 0, "credit": 1000.00},
+                {"date": "2025-11-05", "description": "Payment to Vendor X", "debit": 500.00, "credit": 0},
+                {"date": "2025-11-09", "description": "Salary", "debit": 0, "credit": 2500.00},
+            ],
+        }
+    if "invoice" in lowered:
+        return {
+            "document_type": "invoice",
+            "customer_name": "John Doe",
+            "vendor_name": "ABC Company Ltd",
+            "total_amount": 1500.00,
+            "date": "2025-11-22",
+            "line_items": [
+                {"description": "Product A", "quantity": 2, "price": 500.00, "total": 1000.00},
+                {"description": "Product B", "quantity": 1, "price": 500.00, "total": 500.00},
+            ],
+        }
+    return {
+        "document_type": "receipt",
+        "vendor_name": "Mock Store",
+        "total_amount": 45.50,
+        "date": "2025-11-22",
+        "items": [
+            {"description": "Latte", "quantity": 2, "price": 15.00, "total": 30.00},
+            {"description": "Muffin", "quantity": 1, "price": 15.50, "total": 15.50},
+        ],
+    }
+
+
+_BATCH_DOC_PATTERN = re.compile(r"=== DOCUMENT (\S+) ===\n(.*?)\n=== END DOCUMENT \1 ===", re.DOTALL)
+
+
+def _canned_reply(prompt_text: str) -> str:
+    """Reply text for a prompt: parser JSON (single or batched) or a chat answer"""
+    if "document analysis assistant" in prompt_text:
+        batch = _BATCH_DOC_PATTERN.findall(prompt_text)
+        if batch:
+            return json.dumps([
+                {"doc_id": doc_id, "result": _canned_document(doc_text)}
+                for doc_id, doc_text in batch
+            ])
+        return json.dumps(_canned_document(prompt_text), indent=2)
+
+    return (
+        "This is a mock answer from the local LLM server. "
+        "According to **Document MOCK1**, the total is $45.50 (2025-11-22)."
+    )
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ==============================
+#  FAULT INJECTION
+# ==============================
+
+async def _simulate(api: str) -> Optional[str]:
+    """
+    Apply latency / faults for one request
+
+    Returns:
+        None to respond normally, "429" for a rate limit error,
+        "timeout" after hanging for timeout_seconds
+    """
+    stats.requests += 1
+    stats.by_api[api] = stats.by_api.get(api, 0) + 1
+
+    now = time.monotonic()
+    while _recent_requests and now - _recent_requests[0] > 60.0:
+        _recent_requests.popleft()
+
+    if settings.rpm and len(_recent_requests) >= settings.rpm:
+        stats.rpm_429 += 1
+        return "429"
+    _recent_requests.append(now)
+
+    if random.random() < settings.rate_429:
+        stats.injected_429 += 1
+        return "429"
+
+    if random.random() < settings.timeout_rate:
+        stats.timeouts += 1
+        await asyncio.sleep(settings.timeout_seconds)
+        return "timeout"
+
+    await asyncio.sleep(settings.sample_latency())
+    return None
+
+
+def _retry_after_text() -> str:
+    return f"{settings.retry_after:g}s"
+
+
+def _groq_error(kind: str) -> JSONResponse:
+    if kind == "429":
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": str(int(settings.retry_after))},
+            content={"error": {
+                "message": (
+                    "Rate limit reached for model in organization `org_mock` on requests per minute (RPM): "
+                    f"Limit 30, Used 30, Requested 1. Please try again in {_retry_after_text()}."
+                ),
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }},
+        )
+    return JSONResponse(status_code=504, content={"error": {"message": "Gateway timeout", "type": "timeout"}})
+
+
+def _gemini_error(kind: str) -> JSONResponse:
+    if kind == "429":
+        return JSONResponse(
+            status_code=429,
+            content={"error": {
+                "code": 429,
+                "message": f"Resource has been exhausted (e.g. check quota). Please retry in {_retry_after_text()}.",
+                "status": "RESOURCE_EXHAUSTED",
+            }},
+        )
+    return JSONResponse(status_code=504, content={"error": {"code": 504, "message": "Deadline exceeded", "status": "DEADLINE_EXCEEDED"}})
+
+
+def _chunks(text: str) -> List[str]:
+    size = max(1, settings.stream_chunk_chars)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# ==============================
+#  GROQ (OpenAI-compatible)
+# ==============================
+
+@app.post("/openai/v1/chat/completions")
+async def groq_chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "mock-llama")
+    prompt_text = "\n".join(
+        m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"))
+        for m in body.get("messages", [])
+    )
+
+    fault = await _simulate("groq")
+    if fault:
+        return _groq_error(fault)
+
+    reply = _canned_reply(prompt_text)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": _estimate_tokens(prompt_text),
+        "completion_tokens": _estimate_tokens(reply),
+        "total_tokens": _estimate_tokens(prompt_text) + _estimate_tokens(reply),
+    }
+    stats.responses += 1
+
+    if body.get("stream"):
+        async def event_stream():
+            for piece in _chunks(reply):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(0)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+# ==============================
+#  GEMINI (generativelanguage REST)
+# ==============================
+
+def _gemini_prompt_text(body: Dict[str, Any]) -> str:
+    texts = []
+    system = body.get("systemInstruction") or body.get("system_instruction") or {}
+    for part in system.get("parts", []):
+        texts.append(part.get("text", ""))
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            texts.append(part.get("text", ""))
+    return "\n".join(texts)
+
+
+def _gemini_response(reply: str, prompt_text: str, finish_reason: Optional[str] = "STOP") -> Dict[str, Any]:
+    candidate = {"content": {"parts": [{"text": reply}], "role": "model"}, "index": 0}
+    if finish_reason:
+        candidate["finishReason"] = finish_reason
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": _estimate_tokens(prompt_text),
+            "candidatesTokenCount": _estimate_tokens(reply),
+            "totalTokenCount": _estimate_tokens(prompt_text) + _estimate_tokens(reply),
+        },
+    }
+
+
+@app.post("/v1beta/models/{model_action:path}")
+async def gemini_generate_content(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    body = await request.json()
+    prompt_text = _gemini_prompt_text(body)
+
+    fault = await _simulate("gemini")
+    if fault:
+        return _gemini_error(fault)
+
+    reply = _canned_reply(prompt_text)
+    stats.responses += 1
+
+    if action == "streamGenerateContent":
+        pieces = _chunks(reply)
+
+        async def event_stream():
+            for i, piece in enumerate(pieces):
+                last = i == len(pieces) - 1
+                payload = _gemini_response(piece, prompt_text, "STOP" if last else None)
+                yield f"data: {json.dumps(payload)}\r\n\r\n"
+                await asyncio.sleep(0)
+
+        if request.query_params.get("alt") == "sse":
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+        # Without alt=sse the API returns one JSON array of partial responses
+        return [_gemini_response(piece, prompt_text, None) for piece in pieces]
+
+    if action != "generateContent":
+        return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"Unsupported action {action}"}})
+
+    return _gemini_response(reply, prompt_text)
+
+
+# ==============================
+#  CONTROL
+# ==============================
+
+@app.get("/mock/stats")
+def get_mock_stats():
+    return {"settings": asdict(settings), "stats": asdict(stats)}
+
+
+@app.post("/mock/config")
+async def update_mock_config(request: Request):
+    """Change behaviour at runtime, e.g. {"rate_429": 0.2, "latency": "lognormal:-0.5,0.6"}"""
+    updates = await request.json()
+    for key, value in updates.items():
+        if not hasattr(settings, key):
+            return JSONResponse(status_code=400, content={"detail": f"Unknown setting: {key}"})
+        current = getattr(settings, key)
+        setattr(settings, key, type(current)(value))
+    settings.sample_latency()  # validate the distribution string
+    return asdict(settings)
+
+
+@app.post("/mock/reset")
+def reset_mock_stats():
+    global stats
+    stats = MockLLMStats()
+    _recent_requests.clear()
+    return asdict(stats)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("MOCK_LLM_PORT", "8090")))
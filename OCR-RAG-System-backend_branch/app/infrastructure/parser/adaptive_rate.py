@@ -0,0 +1,186 @@
+"""
+Adaptive (AIMD) rate learning for RateLimiter
+Grows the request rate and in-flight concurrency additively while calls
+succeed and cuts them multiplicatively on 429s, so the limiter converges on
+the quota we actually have instead of the hard-coded preset. Learned values
+are persisted to a small JSON file and reloaded on restart.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_file_lock = threading.Lock()  # Limiters in one process share the state file
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease controller for one limiter
+
+    Rates are tracked in requests per minute. Each success adds
+    increase_rpm / rpm (about +increase_rpm per minute of full-rate
+    traffic, like TCP congestion avoidance) and likewise 1 / concurrency to
+    the in-flight limit. A 429 multiplies both by decrease_factor, or by
+    more when the provider asks us to wait long ("try again in 9m21s").
+    Decreases happen at most once per cooldown so that a burst of 429s from
+    requests already in flight counts as one signal.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_rpm: float,
+        initial_concurrency: float,
+        min_rpm: float,
+        max_rpm: float,
+        max_concurrency: float,
+        state_path: Optional[str] = None,
+        increase_rpm: float = 1.0,
+        decrease_factor: float = 0.5,
+        save_interval: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize controller
+
+        Args:
+            name: Limiter name (key in the state file)
+            initial_rpm: Starting rate if nothing was persisted
+            initial_concurrency: Starting in-flight limit if nothing was persisted
+            min_rpm / max_rpm: Bounds for the learned rate
+            max_concurrency: Upper bound for the in-flight limit
+            state_path: JSON file for learned values (None = don't persist)
+            increase_rpm: Additive increase per minute of successful traffic
+            decrease_factor: Multiplicative decrease on 429 (0 < f < 1)
+            save_interval: Minimum seconds between saves after successes
+            clock: Time source for cooldown/save intervals (the limiter's clock)
+        """
+        self.name = name
+        self.min_rpm = min_rpm
+        self.max_rpm = max(max_rpm, min_rpm)
+        self.max_concurrency = max(1.0, max_concurrency)
+        self.state_path = state_path
+        self.increase_rpm = increase_rpm
+        self.decrease_factor = decrease_factor
+        self.save_interval = save_interval
+        self.clock = clock
+
+        self.rpm = initial_rpm
+        self.concurrency = initial_concurrency
+        self.increases = 0
+        self.decreases = 0
+        self.last_decrease: Optional[float] = None
+        self.last_save = 0.0
+
+        persisted = self._load()
+        if persisted:
+            self.rpm = persisted.get("rpm", self.rpm)
+            self.concurrency = persisted.get("concurrency", self.concurrency)
+            logger.info(f"📈 Restored learned rate for {name}: {self.rpm:.2f} RPM, concurrency {self.concurrency:.1f}")
+        self._clamp()
+
+    @property
+    def refill_rate(self) -> float:
+        """Tokens per second for the limiter's bucket"""
+        return self.rpm / 60.0
+
+    @property
+    def concurrency_limit(self) -> int:
+        return max(1, int(self.concurrency))
+
+    def _clamp(self) -> None:
+        self.rpm = min(self.max_rpm, max(self.min_rpm, self.rpm))
+        self.concurrency = min(self.max_concurrency, max(1.0, self.concurrency))
+
+    def on_success(self) -> None:
+        """Additive increase"""
+        self.rpm += self.increase_rpm / max(self.rpm, 1.0)
+        self.concurrency += 1.0 / max(self.concurrency, 1.0)
+        self._clamp()
+        self.increases += 1
+        if self.clock() - self.last_save >= self.save_interval:
+            self.save()
+
+    def on_rate_limit(self, retry_after: Optional[float], cooldown: float) -> bool:
+        """
+        Multiplicative decrease
+
+        Args:
+            retry_after: Provider's "try again in" hint in seconds, if any
+            cooldown: Cooldown the limiter applies for this 429
+
+        Returns:
+            True if the rate was reduced (False if still within the last decrease's cooldown)
+        """
+        now = self.clock()
+        if self.last_decrease is not None and now - self.last_decrease < cooldown:
+            return False
+
+        factor = self.decrease_factor
+        if retry_after:
+            # Waiting longer than a minute means the window is far over quota
+            factor = min(factor, 60.0 / (60.0 + retry_after))
+
+        old_rpm = self.rpm
+        self.rpm *= factor
+        self.concurrency *= factor
+        self._clamp()
+        self.decreases += 1
+        self.last_decrease = now
+        logger.warning(f"📉 {self.name}: 429 feedback, rate {old_rpm:.2f} → {self.rpm:.2f} RPM")
+        self.save()
+        return True
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        if not self.state_path or not Path(self.state_path).exists():
+            return None
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f).get(self.name)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read learned rates from {self.state_path}: {e}")
+            return None
+
+    def save(self) -> None:
+        """Persist learned values (atomic replace; other limiters' entries are kept)"""
+        self.last_save = self.clock()
+        if not self.state_path:
+            return
+        path = Path(self.state_path)
+        try:
+            with _file_lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                state: Dict[str, Any] = {}
+                if path.exists():
+                    try:
+                        with open(path, "r") as f:
+                            state = json.load(f)
+                    except ValueError:
+                        state = {}
+                state[self.name] = {
+                    "rpm": self.rpm,
+                    "concurrency": self.concurrency,
+                    "updated_at": time.time(),
+                }
+                tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not persist learned rates to {self.state_path}: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "effective_rpm": self.rpm,
+            "concurrency_limit": self.concurrency_limit,
+            "min_rpm": self.min_rpm,
+            "max_rpm": self.max_rpm,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
@@ -0,0 +1,272 @@
+"""
+Micro-batching for the LLM parser
+Packs several short, queued OCR texts into one prompt so that a single
+rate-limited request parses many documents (RPM, not TPM, is the bottleneck
+on the free tiers).
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, TYPE_CHECKING
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.infrastructure.parser.document_schema import validate_document
+from app.infrastructure.parser.json_repair import loads_with_repair
+
+if TYPE_CHECKING:
+    from app.infrastructure.parser.gemini_parser_service import GeminiParserService
+
+logger = logging.getLogger(__name__)
+
+
+# Appended to PARSE_SYSTEM_PROMPT (ChatPromptTemplate syntax: braces are escaped)
+BATCH_INSTRUCTIONS = """
+
+             BATCH MODE:
+             The input contains SEVERAL independent documents. Each document starts with a line
+             "=== DOCUMENT <doc_id> ===" and ends with "=== END DOCUMENT <doc_id> ===".
+             Analyze each document on its own, exactly as described above.
+
+             Return ONLY a JSON array with one entry per document, in any order:
+             [
+               {{"doc_id": "<doc_id>", "result": {{ ...the JSON object for that document... }} }}
+             ]
+             Never merge documents and never omit a doc_id.
+             """
+
+
+@dataclass
+class _PendingDocument:
+    doc_id: str
+    text: str
+    future: asyncio.Future = field(repr=False)
+    tenant: Optional[str] = None
+
+
+@dataclass
+class BatchStats:
+    """Statistics for monitoring batch efficiency"""
+    batches_sent: int = 0
+    documents_batched: int = 0
+    slot_reparses: int = 0
+    batch_failures: int = 0
+
+    def documents_per_call(self) -> float:
+        if self.batches_sent == 0:
+            return 0.0
+        return self.documents_batched / self.batches_sent
+
+
+class ParseBatcher:
+    """
+    Collects short documents and parses them together
+
+    Documents are queued per tenant (company), so a prompt never mixes two
+    companies' OCR text and every batched call is fair-queued under its
+    tenant. A tenant's batch is flushed when it reaches max_batch_size or
+    when its oldest queued document has waited max_wait seconds. Every
+    document in the batch gets its own slot in a keyed JSON array;
+    malformed or missing slots are re-parsed individually.
+    """
+
+    def __init__(
+        self,
+        parser: "GeminiParserService",
+        max_batch_size: int = 5,
+        max_wait: float = 2.0,
+        max_chars: int = 3000,
+    ):
+        """
+        Initialize batcher
+
+        Args:
+            parser: Parser used for the batched call and for individual re-parses
+            max_batch_size: Maximum documents packed into one prompt
+            max_wait: Maximum seconds a document waits for the batch to fill
+            max_chars: Documents longer than this are parsed individually
+        """
+        self.parser = parser
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.max_chars = max_chars
+
+        self.pending: Dict[Optional[str], List[_PendingDocument]] = {}  # tenant -> queued documents
+        self.flush_tasks: Dict[Optional[str], asyncio.Task] = {}  # tenant -> max_wait timer
+        self.tasks: Set[asyncio.Task] = set()  # running batches (the loop only keeps weak references)
+        self.lock = asyncio.Lock()
+        self.next_id = 0
+        self.stats = BatchStats()
+
+    def accepts(self, text: str) -> bool:
+        """Only short documents are worth batching"""
+        return len(text) <= self.max_chars
+
+    async def submit(self, text: str, tenant: Optional[str] = None) -> dict:
+        """
+        Queue a document and wait for its parsed result
+
+        Args:
+            text: OCR extracted text
+            tenant: Company id: batches only hold one tenant's documents and are fair-queued under it
+
+        Returns:
+            Parsed document data (same shape as a single parse)
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        async with self.lock:
+            self.next_id += 1
+            queue = self.pending.setdefault(tenant, [])
+            queue.append(_PendingDocument(doc_id=f"d{self.next_id}", text=text, future=future, tenant=tenant))
+
+            if len(queue) >= self.max_batch_size:
+                self._start_batch(tenant, self._take_batch(tenant))
+                # The timer was started for documents that just left
+                self._cancel_flush_timer(tenant)
+            if self.pending.get(tenant) and tenant not in self.flush_tasks:
+                self.flush_tasks[tenant] = asyncio.create_task(self._flush_after_wait(tenant))
+
+        return await future
+
+    def _take_batch(self, tenant: Optional[str]) -> List[_PendingDocument]:
+        """Pop up to max_batch_size of the tenant's documents (caller holds the lock)"""
+        queue = self.pending.get(tenant, [])
+        batch, rest = queue[:self.max_batch_size], queue[self.max_batch_size:]
+        if rest:
+            self.pending[tenant] = rest
+        else:
+            self.pending.pop(tenant, None)
+        return batch
+
+    def _start_batch(self, tenant: Optional[str], batch: List[_PendingDocument]) -> None:
+        task = asyncio.create_task(self._run_batch(batch, tenant))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _cancel_flush_timer(self, tenant: Optional[str]) -> None:
+        """Stop the tenant's pending max_wait flush (caller holds the lock)"""
+        timer = self.flush_tasks.pop(tenant, None)
+        if timer is not None:
+            timer.cancel()
+
+    async def _flush_after_wait(self, tenant: Optional[str]) -> None:
+        await asyncio.sleep(self.max_wait)
+        async with self.lock:
+            self.flush_tasks.pop(tenant, None)
+            while self.pending.get(tenant):
+                self._start_batch(tenant, self._take_batch(tenant))
+
+    async def close(self) -> None:
+        """Cancel queued documents and running batches (shutdown); their submit() calls raise CancelledError"""
+        async with self.lock:
+            for tenant in list(self.flush_tasks):
+                self._cancel_flush_timer(tenant)
+            for queue in self.pending.values():
+                for doc in queue:
+                    doc.future.cancel()
+            self.pending.clear()
+            tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _build_prompt(self) -> ChatPromptTemplate:
+        from app.infrastructure.parser.gemini_parser_service import PARSE_SYSTEM_PROMPT
+
+        return ChatPromptTemplate.from_messages([
+            ("system", PARSE_SYSTEM_PROMPT + BATCH_INSTRUCTIONS),
+            ("human", "{context}")
+        ])
+
+    @staticmethod
+    def _pack(batch: List[_PendingDocument]) -> str:
+        parts = []
+        for doc in batch:
+            parts.append(
+                f"=== DOCUMENT {doc.doc_id} ===\n{doc.text}\n=== END DOCUMENT {doc.doc_id} ==="
+            )
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _split(output: str) -> Dict[str, Any]:
+        """Map doc_id -> result from the model's keyed JSON array"""
+        # Local repair salvages every complete slot of a truncated array
+        entries, _ = loads_with_repair(output[output.find("["):] if "[" in output else output)
+
+        slots: Dict[str, Any] = {}
+        if not isinstance(entries, list):
+            return slots
+        for entry in entries:
+            if isinstance(entry, dict) and isinstance(entry.get("doc_id"), str):
+                slots[entry["doc_id"]] = entry.get("result")
+        return slots
+
+    async def _reparse(self, doc: _PendingDocument) -> None:
+        """Parse a single document on its own and resolve its future"""
+        try:
+            result = await self.parser._parse_single_async(doc.text, doc.tenant)
+        except Exception as e:
+            if not doc.future.done():
+                doc.future.set_exception(e)
+            return
+        if not doc.future.done():
+            doc.future.set_result(result)
+
+    async def _run_batch(self, batch: List[_PendingDocument], tenant: Optional[str]) -> None:
+        try:
+            await self._parse_batch(batch, tenant)
+        except asyncio.CancelledError:
+            # Nobody else will resolve these: don't leave submit() waiting forever
+            for doc in batch:
+                doc.future.cancel()
+            raise
+
+    async def _parse_batch(self, batch: List[_PendingDocument], tenant: Optional[str]) -> None:
+        if not batch:
+            return
+
+        # Nothing to share the call with
+        if len(batch) == 1:
+            await self._reparse(batch[0])
+            return
+
+        try:
+            result = await self.parser._invoke_async(self._build_prompt(), self._pack(batch), tenant)
+            slots = self._split(result.content)
+        except Exception as e:
+            logger.warning(f"⚠️ Batch parse of {len(batch)} documents failed ({type(e).__name__}), parsing individually")
+            self.stats.batch_failures += 1
+            await asyncio.gather(*(self._reparse(doc) for doc in batch))
+            return
+
+        self.stats.batches_sent += 1
+        self.stats.documents_batched += len(batch)
+
+        reparse = []
+        for doc in batch:
+            document, _ = validate_document(slots.get(doc.doc_id))
+            if document is not None:
+                if not doc.future.done():
+                    doc.future.set_result(document)
+            else:
+                reparse.append(doc)
+
+        if reparse:
+            logger.warning(f"⚠️ {len(reparse)}/{len(batch)} batch slots malformed, re-parsing individually")
+            self.stats.slot_reparses += len(reparse)
+            await asyncio.gather(*(self._reparse(doc) for doc in reparse))
+
+        logger.info(f"📦 Parsed {len(batch)} documents in one API call")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "queued": sum(len(queue) for queue in self.pending.values()),
+            "queued_tenants": len(self.pending),
+            "batches_sent": self.stats.batches_sent,
+            "documents_batched": self.stats.documents_batched,
+            "documents_per_call": self.stats.documents_per_call(),
+            "slot_reparses": self.stats.slot_reparses,
+            "batch_failures": self.stats.batch_failures,
+        }
@@ -0,0 +1,182 @@
+"""
+Typed schemas for parser output, one per document_type
+Validation is deliberately structural: it rejects output that would corrupt
+Firebase / FAISS records (wrong types, unknown document types, malformed
+rows) while still allowing any extra fields the model chooses to add.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+
+class DocumentParseError(ValueError):
+    """Parser output could not be turned into a valid document (not saved or indexed)"""
+
+
+DOCUMENT_TYPES = ("invoice", "receipt", "bank statement", "bill", "other")
+
+# Unambiguous date formats we normalize to YYYY-MM-DD locally
+_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y", "%d-%b-%Y")
+
+
+_NUMBER_TOKEN = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def to_number(value: Any) -> Any:
+    """Accept "1,234.50", "$45", "Rs. 100" etc. for numeric fields"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        # First numeric token: the dot in "Rs." must not become a decimal point
+        match = _NUMBER_TOKEN.search(value)
+        if match is None:
+            return None
+        return match.group(0).replace(",", "")
+    return value
+
+
+def to_text(value: Any) -> Any:
+    """Numbers are fine where text is expected (account numbers, names)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def to_iso_date(value: Any) -> Any:
+    """Normalize unambiguous date formats; anything else is kept as-is"""
+    value = to_text(value)
+    if not isinstance(value, str):
+        return value
+    stripped = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(stripped, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return stripped
+
+
+class LineItem(BaseModel):
+    """Invoice/receipt line item; any of the alias fields may be used"""
+    model_config = ConfigDict(extra="allow")
+
+    quantity: Optional[float] = None
+    qty: Optional[float] = None
+    price: Optional[float] = None
+    unit_price: Optional[float] = None
+    rate: Optional[float] = None
+    total: Optional[float] = None
+    amount: Optional[float] = None
+
+    coerce_numbers = field_validator(
+        "quantity", "qty", "price", "unit_price", "rate", "total", "amount", mode="before"
+    )(to_number)
+
+
+class Transaction(BaseModel):
+    """Bank statement row"""
+    model_config = ConfigDict(extra="allow")
+
+    date: Optional[str] = None
+    debit: Optional[float] = None
+    credit: Optional[float] = None
+
+    coerce_numbers = field_validator("debit", "credit", mode="before")(to_number)
+    coerce_date = field_validator("date", mode="before")(to_iso_date)
+
+
+class BaseDocument(BaseModel):
+    """Fields every parsed document must carry"""
+    model_config = ConfigDict(extra="allow")
+
+    document_type: str
+    total_amount: Optional[float] = None
+    date: Optional[str] = None
+
+    coerce_numbers = field_validator("total_amount", mode="before")(to_number)
+    coerce_date = field_validator("date", mode="before")(to_iso_date)
+
+    @field_validator("document_type", mode="before")
+    @classmethod
+    def known_document_type(cls, value: Any) -> str:
+        normalized = str(value).strip().lower()
+        if normalized == "statement":
+            normalized = "bank statement"
+        if normalized not in DOCUMENT_TYPES:
+            raise ValueError(f"must be one of {', '.join(DOCUMENT_TYPES)}")
+        return normalized
+
+
+class InvoiceDocument(BaseDocument):
+    customer_name: Optional[str] = None
+    vendor_name: Optional[str] = None
+    line_items: Optional[List[LineItem]] = None
+    items: Optional[List[LineItem]] = None
+
+    coerce_names = field_validator("customer_name", "vendor_name", mode="before")(to_text)
+
+
+class ReceiptDocument(BaseDocument):
+    vendor_name: Optional[str] = None
+    items: Optional[List[LineItem]] = None
+    line_items: Optional[List[LineItem]] = None
+
+    coerce_names = field_validator("vendor_name", mode="before")(to_text)
+
+
+class BankStatementDocument(BaseDocument):
+    account_number: Optional[str] = None
+    transactions: List[Transaction] = []
+
+    coerce_names = field_validator("account_number", mode="before")(to_text)
+
+
+class BillDocument(BaseDocument):
+    vendor_name: Optional[str] = None
+    items: Optional[List[LineItem]] = None
+    line_items: Optional[List[LineItem]] = None
+
+    coerce_names = field_validator("vendor_name", mode="before")(to_text)
+
+
+SCHEMAS: Dict[str, Type[BaseDocument]] = {
+    "invoice": InvoiceDocument,
+    "receipt": ReceiptDocument,
+    "bank statement": BankStatementDocument,
+    "bill": BillDocument,
+    "other": BaseDocument,
+}
+
+
+def validate_document(data: Any) -> Tuple[Optional[dict], List[str]]:
+    """
+    Validate parser output against the schema of its document_type
+
+    Args:
+        data: Decoded model output
+
+    Returns:
+        (normalized document, []) on success, (None, error messages) on failure
+    """
+    if not isinstance(data, dict):
+        return None, [f"expected a JSON object, got {type(data).__name__}"]
+
+    try:
+        base = BaseDocument.model_validate(data)
+        document = SCHEMAS[base.document_type].model_validate(data)
+    except ValidationError as e:
+        return None, _format_errors(e)
+
+    # exclude_unset keeps the document shape as the model produced it
+    return document.model_dump(exclude_unset=True), []
+
+
+def _format_errors(error: ValidationError) -> List[str]:
+    messages = []
+    for item in error.errors():
+        location = ".".join(str(part) for part in item.get("loc", ())) or "<root>"
+        messages.append(f"{location}: {item.get('msg')}")
+    return messages
@@ -1,94 +1,30 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-import json, re, os
+import os
 from dotenv import load_dotenv
-from app.infrastructure.parser.gemini_rate_limiter import get_rate_limiter, APIProvider
+from app.infrastructure.parser.gemini_rate_limiter import get_rate_limiter, APIProvider, estimate_llm_tokens
+from app.infrastructure.parser.llm_router import LLMRouter, ProviderRoute, register_llm_router
+from app.infrastructure.parser.batch_parser import ParseBatcher
+from app.infrastructure.parser.streaming_json import IncrementalJSONParser, StreamEvent
+from app.infrastructure.parser.json_repair import loads_with_repair
+from app.infrastructure.parser.document_schema import DocumentParseError, validate_document
+from app.config.config import config
+from app.infrastructure.mock_llm.client_overrides import (
+    MOCK_API_KEY,
+    gemini_client_overrides,
+    groq_client_overrides,
+    is_mock_enabled,
+)
+from typing import AsyncIterator, List, Optional, Tuple
 import asyncio
 
 
 load_dotenv()
 
 
-class GeminiParserService():
-
-    def __init__(self, model_name: str = "llama-3.3-70b-versatile"):
-        """
-        Initialize Parser Service
-        
-        Args:
-            model_name: Model to use (e.g., "gemini-2.0-flash-exp" or "llama-3.3-70b-versatile")
-                        Defaults to Gemini 2.0 Flash as requested.
-        """
-        self.model_name = model_name
-        
-        # Determine provider based on model name
-        if "llama" in model_name.lower() or "mixtral" in model_name.lower():
-            # Use Groq
-            api_key = os.getenv("GROQ_API_KEY")
-            if not api_key:
-                raise ValueError("GROQ_API_KEY not found")
-                
-            self.llm = ChatGroq(
-                model=model_name,
-                groq_api_key=api_key,
-                temperature=0,
-                max_tokens=None,
-                timeout=120.0,
-                max_retries=2,
-            )
-            self.rate_limiter = get_rate_limiter(provider=APIProvider.GROQ, name="groq_processing")
-            print(f"✅ Parser initialized with Groq model: {model_name}")
-            
-        else:
-            # Default to Gemini (Google)
-            # Prioritize GEMINI_API_KEY, fallback to GOOGLE_API_KEY
-            api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found")
-                
-            self.llm = ChatGoogleGenerativeAI(
-                model=model_name,
-                google_api_key=api_key,
-                temperature=0,
-                convert_system_message_to_human=True,
-                max_retries=2,
-            )
-            self.rate_limiter = get_rate_limiter(provider=APIProvider.GEMINI_FREE, name="gemini_processing")
-            print(f"✅ Parser initialized with Gemini model: {model_name}")
-
-        # Legacy LLMs (for backward compatibility if needed)
-        self.classifier_llm = self.llm
-        self.extractor_llm = self.llm
-
-        # API timeout setting
-        self.api_timeout = 120.0  # 120 seconds max wait for API response
-
-    def _normalize_doc_type(self, doc_type: str) -> str:
-        """Normalize document type to standard categories"""
-        doc_type = doc_type.strip().lower()
-        if doc_type == "statement":
-            return "bank statement"
-        return doc_type
-    
-    async def parse_async(self, text: str, image_url: str = None) -> dict:
-        """
-        Parse document with SINGLE API call (optimized approach)
-        
-        This combines classification and extraction into one call,
-        reducing API usage by 50%
-        
-        Args:
-            text: OCR extracted text
-            image_url: Optional image URL to include in result
-            
-        Returns:
-            Parsed document data with document_type and extracted fields
-        """
-        # Create combined prompt that does BOTH classification and extraction
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             """
+# Combined classification + extraction prompt (ChatPromptTemplate syntax: braces are escaped)
+PARSE_SYSTEM_PROMPT = """
              You are a document analysis assistant. Analyze the provided document text and extract all relevant information.
              
              STEP 1: Classify the document into one of these categories:
@@ -181,34 +117,321 @@ class GeminiParserService():
              }}}}
              
              Output ONLY the JSON object, no additional text or formatting.
-             """),
+             """
+
+
+# Targeted re-ask when local repair cannot produce a valid document
+FIX_SYSTEM_PROMPT = """
+             You repair the JSON output of a document parser.
+             You receive the validation errors and the previous output.
+             Return ONLY the corrected JSON object: keep every value that is already valid,
+             fix only what the errors point at, and do not invent data that is not in the output.
+             "document_type" must be one of: invoice, receipt, bank statement, bill, other.
+             Numbers must be JSON numbers, dates must be YYYY-MM-DD.
+             """
+
+
+class GeminiParserService():
+
+    DEFAULT_GROQ_MODEL = "llama-3.3-70b-versatile"
+    DEFAULT_GEMINI_MODEL = "gemini-2.0-flash"
+    FIX_MAX_OUTPUT_CHARS = 20000  # cap on the broken output echoed back for a re-ask
+
+    def __init__(self, model_name: str = "llama-3.3-70b-versatile"):
+        """
+        Initialize Parser Service
+        
+        Args:
+            model_name: Preferred model (e.g., "gemini-2.0-flash-exp" or "llama-3.3-70b-versatile").
+                        The provider of this model is tried first; the other configured
+                        provider (if its API key is set) is used for failover.
+        """
+        self.model_name = model_name
+
+        # API timeout setting
+        self.api_timeout = 120.0  # 120 seconds max wait for API response
+
+        # Determine preferred provider based on model name
+        prefers_groq = self._is_groq_model(model_name)
+        groq_model = model_name if prefers_groq else os.getenv("GROQ_MODEL", self.DEFAULT_GROQ_MODEL)
+        gemini_model = os.getenv("GEMINI_MODEL", self.DEFAULT_GEMINI_MODEL) if prefers_groq else model_name
+
+        groq_route = self._build_groq_route(groq_model, required=prefers_groq)
+        gemini_route = self._build_gemini_route(gemini_model, required=not prefers_groq)
+
+        if prefers_groq:
+            routes = [r for r in (groq_route, gemini_route) if r is not None]
+        else:
+            routes = [r for r in (gemini_route, groq_route) if r is not None]
+
+        self.router = register_llm_router(
+            "processing", LLMRouter(routes, timeout=self.api_timeout)
+        )
+
+        # Primary provider (kept for backward compatibility)
+        self.llm = routes[0].llm
+        self.rate_limiter = routes[0].rate_limiter
+        print(f"✅ Parser routing across: {', '.join(f'{r.name} ({r.model_name})' for r in routes)}")
+
+        # Legacy LLMs (for backward compatibility if needed)
+        self.classifier_llm = self.llm
+        self.extractor_llm = self.llm
+
+        # Optional micro-batching of short documents
+        self.batcher: Optional[ParseBatcher] = None
+        if config.PARSER_BATCH_MODE:
+            self.batcher = ParseBatcher(
+                self,
+                max_batch_size=config.PARSER_BATCH_SIZE,
+                max_wait=config.PARSER_BATCH_MAX_WAIT,
+                max_chars=config.PARSER_BATCH_MAX_CHARS,
+            )
+            print(f"📦 Parser batch mode enabled (up to {config.PARSER_BATCH_SIZE} documents per call)")
+
+    @staticmethod
+    def _is_groq_model(model_name: str) -> bool:
+        return "llama" in model_name.lower() or "mixtral" in model_name.lower()
+
+    def _build_groq_route(self, model_name: str, required: bool) -> Optional[ProviderRoute]:
+        """Create the Groq client + limiter, or None if GROQ_API_KEY is missing and optional"""
+        api_key = os.getenv("GROQ_API_KEY") or (MOCK_API_KEY if is_mock_enabled() else None)
+        if not api_key:
+            if required:
+                raise ValueError("GROQ_API_KEY not found")
+            return None
+
+        llm = ChatGroq(
+            model=model_name,
+            groq_api_key=api_key,
+            temperature=0,
+            max_tokens=None,
+            timeout=self.api_timeout,
+            max_retries=2,
+            **groq_client_overrides(),
+        )
+        rate_limiter = get_rate_limiter(provider=APIProvider.GROQ, name="groq_processing")
+        print(f"✅ Parser initialized with Groq model: {model_name}")
+        return ProviderRoute(name="groq", llm=llm, rate_limiter=rate_limiter, model_name=model_name)
+
+    def _build_gemini_route(self, model_name: str, required: bool) -> Optional[ProviderRoute]:
+        """Create the Gemini client + limiter, or None if no Gemini key is set and optional"""
+        # Prioritize GEMINI_API_KEY, fallback to GOOGLE_API_KEY
+        api_key = (
+            os.getenv("GEMINI_API_KEY")
+            or os.getenv("GOOGLE_API_KEY")
+            or (MOCK_API_KEY if is_mock_enabled() else None)
+        )
+        if not api_key:
+            if required:
+                raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found")
+            return None
+
+        llm = ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=api_key,
+            temperature=0,
+            convert_system_message_to_human=True,
+            max_retries=2,
+            **gemini_client_overrides(),
+        )
+        rate_limiter = get_rate_limiter(provider=APIProvider.GEMINI_FREE, name="gemini_processing")
+        print(f"✅ Parser initialized with Gemini model: {model_name}")
+        return ProviderRoute(name="gemini", llm=llm, rate_limiter=rate_limiter, model_name=model_name)
+
+    def _normalize_doc_type(self, doc_type: str) -> str:
+        """Normalize document type to standard categories"""
+        doc_type = doc_type.strip().lower()
+        if doc_type == "statement":
+            return "bank statement"
+        return doc_type
+    
+    async def aclose(self) -> None:
+        """Stop the micro-batcher (server shutdown)"""
+        if self.batcher is not None:
+            await self.batcher.close()
+
+    async def parse_async(self, text: str, image_url: str = None, tenant: Optional[str] = None) -> dict:
+        """
+        Parse document with SINGLE API call (optimized approach)
+        
+        This combines classification and extraction into one call,
+        reducing API usage by 50%. In batch mode, short documents share
+        that call with other queued documents.
+        
+        Args:
+            text: OCR extracted text
+            image_url: Optional image URL to include in result
+            tenant: Fair-queuing key for the rate limiter (company id)
+            
+        Returns:
+            Parsed document data with document_type and extracted fields
+        """
+        if self.batcher is not None and self.batcher.accepts(text):
+            # Micro-batch mode: share one API call with other short documents
+            parsed_json = await self.batcher.submit(text, tenant)
+        else:
+            parsed_json = await self._parse_single_async(text, tenant)
+
+        return self._finalize(parsed_json, image_url)
+
+    def _build_prompt(self) -> ChatPromptTemplate:
+        """Combined prompt that does BOTH classification and extraction"""
+        return ChatPromptTemplate.from_messages([
+            ("system", PARSE_SYSTEM_PROMPT),
             ("human", "{context}")
         ])
-        
-        chain = prompt | self.llm
 
-        # Execute with rate limiting, retry logic, AND timeout
-        try:
-            print(f"⏱️ Calling {self.model_name} API with {self.api_timeout}s timeout...")
-            result = await self.rate_limiter.execute_with_retry(
-                chain.ainvoke,
-                {"context": text},
-                priority=10)
+    async def _invoke_async(self, prompt: ChatPromptTemplate, context: str, tenant: Optional[str] = None):
+        """Run a prompt through the provider router and return the raw LLM message"""
+        async def call(route: ProviderRoute):
+            print(f"⏱️ Calling {route.model_name} API with {self.api_timeout}s timeout...")
+            chain = prompt | route.llm
+            return await chain.ainvoke({"context": context})
 
-            print(f"✅ {self.model_name} API call completed successfully")
+        messages = prompt.format_messages(context=context)
+
+        # Execute with routing, rate limiting, retry logic, AND timeout
+        # (a double-submitted upload shares the in-flight call instead of paying twice)
+        try:
+            result = await self.router.invoke(
+                call,
+                priority=10,
+                prompt_tokens=estimate_llm_tokens(messages),
+                tenant=tenant,
+                coalesce_messages=messages,
+            )
+            print("✅ Parser API call completed successfully")
         except asyncio.TimeoutError:
-            print(f"❌ {self.model_name} API call timed out after {self.api_timeout}s")
+            print(f"❌ Parser API call timed out after {self.api_timeout}s on every provider")
             raise Exception(
-                f"{self.model_name} API call timed out after {self.api_timeout} seconds. "
+                f"Parser API call timed out after {self.api_timeout} seconds. "
                 "The API may be slow or unresponsive. Please try again."
             )
         except Exception as e:
-            print(f"❌ Groq API call failed: {type(e).__name__}: {str(e)}")
+            print(f"❌ Parser API call failed: {type(e).__name__}: {str(e)}")
             raise
 
-        # Extract JSON from response
-        parsed_json = self._extract_json(result.content)
-        
+        return result
+
+    async def _parse_single_async(self, text: str, tenant: Optional[str] = None) -> dict:
+        """Parse one document with its own API call"""
+        result = await self._invoke_async(self._build_prompt(), text, tenant)
+
+        # Extract, repair and validate JSON from response
+        return await self._structure_async(result.content, tenant)
+
+    def _parse_structured(self, output: str) -> Tuple[Optional[dict], List[str], bool]:
+        """
+        Decode (repairing locally if needed) and validate model output
+
+        Returns:
+            (document or None, validation errors, whether local repair was needed)
+        """
+        data, repaired = loads_with_repair(output)
+        if data is None:
+            return None, ["no JSON object found in output"], False
+        document, errors = validate_document(data)
+        return document, errors, repaired
+
+    async def _structure_async(self, output: str, tenant: Optional[str] = None) -> dict:
+        """
+        Turn model output into a schema-valid document
+
+        Cheap local repair is tried first; only if that fails is the model
+        asked once to fix its own output, given the validation errors.
+
+        Raises:
+            DocumentParseError: If the output is still invalid after the re-ask
+        """
+        document, errors, repaired = self._parse_structured(output)
+        if document is not None:
+            if repaired:
+                print("🔧 Repaired malformed parser JSON locally")
+            return document
+
+        print(f"⚠️ Parser output invalid ({'; '.join(errors[:3])}), asking model to fix it")
+        fix_context = (
+            "Validation errors:\n- " + "\n- ".join(errors[:20])
+            + "\n\nPrevious output:\n" + output[:self.FIX_MAX_OUTPUT_CHARS]
+        )
+        result = await self._invoke_async(self._build_fix_prompt(), fix_context, tenant)
+
+        document, retry_errors, _ = self._parse_structured(result.content)
+        if document is None:
+            raise DocumentParseError(
+                "Could not extract a valid document from the model output: "
+                + "; ".join(retry_errors[:5])
+            )
+        print("✅ Model fixed its output after targeted re-ask")
+        return document
+
+    def _build_fix_prompt(self) -> ChatPromptTemplate:
+        return ChatPromptTemplate.from_messages([
+            ("system", FIX_SYSTEM_PROMPT),
+            ("human", "{context}")
+        ])
+
+    async def parse_stream_async(
+        self, text: str, image_url: str = None, tenant: Optional[str] = None
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Parse document while the model is still generating
+
+        Yields "field" events for completed top-level fields and "item" events
+        for completed rows of top-level arrays (transactions, line_items, ...),
+        then one final "document" event with the finalized result. If the
+        output is cut off, the document keeps every completed row and the
+        event has truncated=True.
+
+        Args:
+            text: OCR extracted text
+            image_url: Optional image URL to include in result
+            tenant: Fair-queuing key for the rate limiter (company id)
+        """
+        prompt = self._build_prompt()
+
+        def call(route: ProviderRoute):
+            print(f"⏱️ Streaming {route.model_name} API ({self.api_timeout}s idle timeout)...")
+            chain = prompt | route.llm
+            return chain.astream({"context": text})
+
+        json_parser = IncrementalJSONParser()
+        prompt_tokens = estimate_llm_tokens(prompt.format_messages(context=text))
+        async for chunk in self.router.stream(call, priority=10, prompt_tokens=prompt_tokens, tenant=tenant):
+            for event in json_parser.feed(self._chunk_text(chunk)):
+                yield event
+
+        document, _ = validate_document(json_parser.result())
+        if document is None:
+            # Streamed rows did not form a valid document: repair / re-ask on the full text
+            document = await self._structure_async(json_parser.buffer, tenant)
+        if json_parser.truncated:
+            print(f"⚠️ Streamed output was truncated; kept {len(document)} completed fields")
+        else:
+            print("✅ Parser stream completed successfully")
+
+        yield StreamEvent(
+            kind="document",
+            value=self._finalize(document, image_url),
+            truncated=json_parser.truncated,
+        )
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text of a streamed message chunk (Gemini may send a list of parts)"""
+        content = getattr(chunk, "content", chunk)
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                part if isinstance(part, str) else part.get("text", "")
+                for part in content
+                if isinstance(part, (str, dict))
+            )
+        return ""
+
+    def _finalize(self, parsed_json: dict, image_url: str = None) -> dict:
+        """Normalize parser output and attach the image URL"""
         # Normalize document type
         if "document_type" in parsed_json:
             parsed_json["document_type"] = self._normalize_doc_type(parsed_json["document_type"])
@@ -218,18 +441,3 @@ class GeminiParserService():
             parsed_json["image_url"] = str(image_url)
 
         return parsed_json
-    
-
-    def _extract_json(self, output: str) -> dict:
-        """Extract JSON from LLM output"""
-        # Try to find JSON object in the output
-        match = re.search(r"\{.*\}", output, re.DOTALL)
-        if not match:
-            return {"error": "No JSON found", "raw": output}
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON", "raw": match.group(0)}
-
-
-            
\ No newline at end of file
@@ -5,13 +5,20 @@ Supports both Gemini and Groq APIs with configurable limits.
 """
 
 import asyncio
+import contextlib
+import functools
 import time
 import re
-from typing import Callable, Any, Optional, Dict
+from typing import AsyncIterator, Callable, Any, Optional, Dict, List, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 import logging
 import heapq
+import bisect
+
+from app.config.config import config as app_config
+from app.infrastructure.parser.adaptive_rate import AIMDController
+from app.infrastructure.parser.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +40,12 @@ class RateLimitConfig:
     max_retries: int
     initial_backoff: float
     max_backoff: float
+    max_tpm: Optional[int] = None  # LLM tokens per minute (None = no TPM limit)
+    default_output_tokens: int = 512  # output allowance added to prompt estimates
+    adaptive: bool = False  # learn refill rate / concurrency from 429 feedback (AIMD)
+    min_rpm: Optional[float] = None  # adaptive bounds (default: preset / 10 .. preset * 10)
+    max_rpm: Optional[float] = None
+    max_concurrency: Optional[int] = None  # adaptive in-flight bound (default: 4 x max_tokens)
     
     @staticmethod
     def get_preset(provider: APIProvider) -> 'RateLimitConfig':
@@ -44,7 +57,8 @@ class RateLimitConfig:
                 cooldown_after_429=60.0,
                 max_retries=2,
                 initial_backoff=5.0,
-                max_backoff=60.0
+                max_backoff=60.0,
+                max_tpm=250_000  # Flash Free Tier input TPM
             ),
             APIProvider.GEMINI_PAID: RateLimitConfig(
                 max_tokens=10,
@@ -52,7 +66,8 @@ class RateLimitConfig:
                 cooldown_after_429=60.0,
                 max_retries=3,
                 initial_backoff=2.0,
-                max_backoff=60.0
+                max_backoff=60.0,
+                max_tpm=1_000_000
             ),
             APIProvider.GROQ: RateLimitConfig(
                 max_tokens=25,  # Conservative: 25 of 30 RPM
@@ -60,12 +75,38 @@ class RateLimitConfig:
                 cooldown_after_429=15.0,  # Default cooldown (will be overridden by smart parsing)
                 max_retries=3,
                 initial_backoff=2.0,
-                max_backoff=30.0
+                max_backoff=30.0,
+                max_tpm=10_000  # Conservative: 10k of 12k TPM
             )
         }
         return presets.get(provider, presets[APIProvider.GEMINI_FREE])
 
 
+# Upper bounds (seconds) of the queue wait histogram exported on /admin/metrics
+WAIT_TIME_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class TenantWaitStats:
+    """Queueing delay seen by one tenant"""
+    requests: int = 0
+    waited: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    def record(self, duration: float) -> None:
+        self.requests += 1
+        if duration > 0:
+            self.waited += 1
+            self.total_wait_time += duration
+            self.max_wait_time = max(self.max_wait_time, duration)
+
+    def average_wait_time(self) -> float:
+        if self.requests == 0:
+            return 0.0
+        return self.total_wait_time / self.requests
+
+
 @dataclass
 class RateLimitStats:
     """Statistics for monitoring rate limiter performance"""
@@ -77,6 +118,15 @@ class RateLimitStats:
     failed_calls: int = 0
     total_calls: int = 0
     average_wait_time: float = 0.0
+    llm_tokens_estimated: float = 0.0
+    llm_tokens_actual: float = 0.0
+    shed_requests: int = 0  # deadline passed before a token was granted
+    cancelled_requests: int = 0  # caller went away while queued
+    tenant_waits: Dict[str, TenantWaitStats] = field(default_factory=dict)
+    # Per-bucket (non-cumulative) counts for WAIT_TIME_BUCKETS plus a final +Inf bucket
+    wait_histogram: List[int] = field(default_factory=lambda: [0] * (len(WAIT_TIME_BUCKETS) + 1))
+    wait_count: int = 0
+    wait_sum: float = 0.0
     last_reset_time: float = field(default_factory=time.monotonic)
     
     def update_average_wait(self) -> None:
@@ -90,14 +140,103 @@ class RateLimitStats:
             return 0.0
         return (self.successful_calls / self.total_calls) * 100
 
+    def record_tenant_wait(self, tenant: str, duration: float) -> None:
+        """Record queueing delay for a tenant (0 for immediate acquisitions)"""
+        if tenant not in self.tenant_waits:
+            self.tenant_waits[tenant] = TenantWaitStats()
+        self.tenant_waits[tenant].record(duration)
+        self.wait_histogram[bisect.bisect_left(WAIT_TIME_BUCKETS, duration)] += 1
+        self.wait_count += 1
+        self.wait_sum += duration
+
+
+DEFAULT_TENANT = "default"  # requests that don't name a tenant share one queue
+
 
 @dataclass(order=True)
 class PriorityRequest:
-    """Request object for priority queue"""
+    """Request object for priority queue (fair-queuing tag orders tenants within a priority)"""
     priority: int
+    virtual_finish: float
     timestamp: float
     tokens: float = field(compare=False)
     future: asyncio.Future = field(compare=False)
+    llm_tokens: float = field(default=0.0, compare=False)
+    tenant: str = field(default=DEFAULT_TENANT, compare=False)
+    deadline: Optional[float] = field(default=None, compare=False)  # on the limiter clock (time.monotonic() by default)
+    hold_slot: bool = field(default=False, compare=False)  # slot(): counts against the in-flight limit
+
+
+@dataclass
+class LimiterSnapshot:
+    """Point-in-time view of a limiter, read without waiting (see RateLimiter.snapshot)"""
+    available_tokens: float
+    max_tokens: float
+    queue_depth: int
+    in_cooldown: bool
+    cooldown_remaining: float
+
+    @property
+    def availability(self) -> float:
+        """Share of the bucket left once the queued requests are served (0.0 - 1.0)"""
+        if not self.max_tokens:
+            return 0.0
+        return max(0.0, (self.available_tokens - self.queue_depth) / self.max_tokens)
+
+
+class DeadlineExceededError(Exception):
+    """The request's deadline passed before it could be sent (no token was used)"""
+
+
+def resolve_deadline(
+    deadline: Optional[float],
+    timeout: Optional[float],
+    clock: Callable[[], float] = time.monotonic,
+) -> Optional[float]:
+    """Earliest of an absolute deadline (on the limiter's clock) and a relative timeout"""
+    if timeout is not None:
+        timeout_deadline = clock() + timeout
+        return timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+    return deadline
+
+
+CHARS_PER_TOKEN = 4  # rough average for English text across Gemini/Llama tokenizers
+
+
+def estimate_llm_tokens(*payloads: Any) -> float:
+    """
+    Estimate prompt tokens from call arguments
+
+    Walks strings, dicts, lists/tuples and LangChain messages (.content) and
+    converts the total character count to tokens.
+    """
+    chars = 0
+    stack = list(payloads)
+    while stack:
+        item = stack.pop()
+        if item is None:
+            continue
+        if isinstance(item, str):
+            chars += len(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, "content"):
+            stack.append(item.content)
+    return float(chars // CHARS_PER_TOKEN + 1) if chars else 0.0
+
+
+def _actual_llm_tokens(result: Any) -> Optional[float]:
+    """Total tokens reported by the provider on a LangChain result, if any"""
+    usage = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict) and usage.get("total_tokens"):
+        return float(usage["total_tokens"])
+    metadata = getattr(result, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") if isinstance(metadata, dict) else None
+    if isinstance(token_usage, dict) and token_usage.get("total_tokens"):
+        return float(token_usage["total_tokens"])
+    return None
 
 
 class RateLimiter:
@@ -106,33 +245,51 @@ class RateLimiter:
     
     Features:
     - Token bucket algorithm for smooth rate limiting
+    - Second token bucket for LLM tokens per minute (TPM), debited by the
+      estimated prompt size and corrected with actual usage
     - Automatic cooldown after rate limit hits
     - Smart cooldown parsing ("try again in X seconds")
     - Priority Queue (lower number = higher priority)
+    - Weighted fair queuing across tenants within each priority class, so one
+      tenant's large batch does not block everyone else's uploads
     - Exponential backoff retry logic
+    - Optional adaptive mode: AIMD on refill rate and in-flight concurrency
     """
     
     def __init__(
         self,
         provider: APIProvider = APIProvider.GEMINI_FREE,
         config: Optional[RateLimitConfig] = None,
-        min_wait_interval: float = 0.1
+        min_wait_interval: float = 0.1,
+        name: Optional[str] = None,
+        clock: Optional[Callable[[], float]] = None,
     ):
         """
         Initialize rate limiter
+
+        clock defaults to time.monotonic; the simulator passes the event
+        loop's (virtual) clock so asyncio timers and the buckets agree.
         """
+        self.clock: Callable[[], float] = clock or time.monotonic
         self.provider = provider
         self.config = config or RateLimitConfig.get_preset(provider)
+        self.name = name or provider.value
         
         self.max_tokens = float(self.config.max_tokens)
         self.tokens = float(self.config.max_tokens)
         self.refill_rate = self.config.refill_rate
-        self.last_refill = time.monotonic()
+        self.last_refill = self.clock()
+
+        # TPM bucket (LLM tokens, refilled per second)
+        self.tpm_capacity: Optional[float] = float(self.config.max_tpm) if self.config.max_tpm else None
+        self.tpm_tokens: float = self.tpm_capacity or 0.0
+        self.tpm_refill_rate: float = (self.tpm_capacity or 0.0) / 60.0
         
         # We process waiters using a priority queue logic
         self.waiters: list[PriorityRequest] = []
         self.processing_task: Optional[asyncio.Task] = None
         self.lock = asyncio.Lock()  # Protects shared state (tokens, waiters heap)
+        self.wakeup = asyncio.Event()  # Reschedules _process_waiters before its timer fires
         
         self.queue_depth = 0
         self.min_wait_interval = min_wait_interval
@@ -140,6 +297,36 @@ class RateLimiter:
         self.last_429_time: Optional[float] = None
         self.current_cooldown: float = self.config.cooldown_after_429
         self.stats = RateLimitStats()
+
+        # Self-clocked fair queuing: per priority class, the virtual time is the
+        # finish tag of the last request served; each tenant's next request is
+        # tagged max(virtual time, tenant's last tag) + tokens / weight.
+        self.tenant_weights: Dict[str, float] = dict(app_config.RATE_LIMITER_TENANT_WEIGHTS)
+        self.virtual_time: Dict[int, float] = {}
+        self.tenant_finish: Dict[Tuple[int, str], float] = {}
+
+        # slot() blocks granted and not yet exited; only capped in adaptive mode
+        self.in_flight = 0
+        self.concurrency_limit: Optional[int] = None
+        self.adaptive: Optional[AIMDController] = None
+        if self.config.adaptive or app_config.RATE_LIMITER_ADAPTIVE:
+            preset_rpm = self.config.refill_rate * 60
+            self.adaptive = AIMDController(
+                name=self.name,
+                initial_rpm=preset_rpm,
+                initial_concurrency=self.max_tokens,
+                min_rpm=self.config.min_rpm or preset_rpm / 10,
+                max_rpm=self.config.max_rpm or preset_rpm * 10,
+                max_concurrency=self.config.max_concurrency or self.max_tokens * 4,
+                state_path=app_config.RATE_LIMITER_STATE_PATH,
+                increase_rpm=max(1.0, preset_rpm * 0.1),  # +10% of the preset per minute of traffic
+                clock=self.clock,
+            )
+            self.refill_rate = self.adaptive.refill_rate
+            self.concurrency_limit = self.adaptive.concurrency_limit
+
+        # Identical concurrent calls (same coalesce_key) share one token and one API call
+        self.single_flight = SingleFlight()
         
         logger.info(
             f"🔧 Rate limiter initialized for {provider.value}: "
@@ -150,25 +337,71 @@ class RateLimiter:
 
     def _refill_tokens(self) -> None:
         """Refill tokens based on elapsed time"""
-        now = time.monotonic()
+        now = self.clock()
         elapsed = now - self.last_refill
         
         if elapsed > 0:
             tokens_to_add = elapsed * self.refill_rate
             old_tokens = self.tokens
             self.tokens = min(self.max_tokens, self.tokens + tokens_to_add)
+            if self.tpm_capacity is not None:
+                self.tpm_tokens = min(self.tpm_capacity, self.tpm_tokens + elapsed * self.tpm_refill_rate)
             self.last_refill = now
             
             if self.tokens > old_tokens:
                # logger.debug(f"🔄 Refilled {tokens_to_add:.3f} tokens")
                pass
 
+    def _clamp_llm_tokens(self, llm_tokens: float) -> float:
+        """A prompt bigger than the whole TPM bucket still goes out once the bucket is full"""
+        if self.tpm_capacity is None:
+            return 0.0
+        return max(0.0, min(llm_tokens, self.tpm_capacity))
+
+    def _at_concurrency_limit(self) -> bool:
+        return self.concurrency_limit is not None and self.in_flight >= self.concurrency_limit
+
+    def _has_capacity(self, tokens: float, llm_tokens: float, hold_slot: bool = False) -> bool:
+        """Both buckets must cover the request (and the in-flight limit allow a slot)"""
+        if hold_slot and self._at_concurrency_limit():
+            return False
+        if self.tokens < tokens:
+            return False
+        return self.tpm_capacity is None or self.tpm_tokens >= llm_tokens
+
+    def _debit(self, tokens: float, llm_tokens: float, hold_slot: bool = False) -> None:
+        if hold_slot:
+            self.in_flight += 1
+        self.tokens -= tokens
+        if self.tpm_capacity is not None:
+            self.tpm_tokens -= llm_tokens
+
+    def _time_until_capacity(self, tokens: float, llm_tokens: float) -> float:
+        """Seconds until both buckets cover the request (0 if they already do)"""
+        wait = max(0.0, tokens - self.tokens) / self.refill_rate
+        if self.tpm_capacity is not None and self.tpm_refill_rate > 0:
+            wait = max(wait, max(0.0, llm_tokens - self.tpm_tokens) / self.tpm_refill_rate)
+        return wait
+
+    def _settle_llm_tokens(self, estimated: float, actual: Optional[float]) -> None:
+        """Correct the TPM bucket once the provider reports real usage"""
+        self.stats.llm_tokens_estimated += estimated
+        if actual is None:
+            self.stats.llm_tokens_actual += estimated
+            return
+        self.stats.llm_tokens_actual += actual
+        if self.tpm_capacity is not None:
+            # May go negative: the next requests wait until the debt is refilled
+            self.tpm_tokens = max(-self.tpm_capacity, min(self.tpm_capacity, self.tpm_tokens - (actual - estimated)))
+            if actual < estimated:
+                self.wakeup.set()
+
     def _is_in_cooldown(self) -> bool:
         """Check if we're in cooldown period"""
         if self.last_429_time is None:
             return False
         
-        elapsed = time.monotonic() - self.last_429_time
+        elapsed = self.clock() - self.last_429_time
         return elapsed < self.current_cooldown
     
     def _get_cooldown_remaining(self) -> float:
@@ -176,7 +409,7 @@ class RateLimiter:
         if not self._is_in_cooldown():
             return 0.0
         
-        elapsed = time.monotonic() - self.last_429_time
+        elapsed = self.clock() - self.last_429_time
         return max(0.0, self.current_cooldown - elapsed)
 
     def _parse_retry_after(self, error_msg: str) -> Optional[float]:
@@ -210,58 +443,115 @@ class RateLimiter:
         except Exception:
             return None
 
+    def set_tenant_weight(self, tenant: str, weight: float) -> None:
+        """Give a tenant a larger (or smaller) share of its priority class (default 1.0)"""
+        if weight <= 0:
+            raise ValueError(f"Tenant weight must be positive (got {weight})")
+        self.tenant_weights[tenant] = weight
+
+    def _fair_tag(self, priority: int, tenant: str, tokens: float) -> float:
+        """Assign the virtual finish tag of a new request (caller holds the lock)"""
+        start = max(
+            self.virtual_time.get(priority, 0.0),
+            self.tenant_finish.get((priority, tenant), 0.0),
+        )
+        finish = start + tokens / self.tenant_weights.get(tenant, 1.0)
+        self.tenant_finish[(priority, tenant)] = finish
+        return finish
+
+    def _advance_virtual_time(self, priority: int, tenant: str, finish: float) -> None:
+        """A request with this tag is being served (caller holds the lock)"""
+        self.virtual_time[priority] = max(self.virtual_time.get(priority, 0.0), finish)
+        # Tenants with nothing queued beyond the virtual time carry no state
+        if self.tenant_finish.get((priority, tenant), 0.0) <= self.virtual_time[priority]:
+            self.tenant_finish.pop((priority, tenant), None)
+
+    def _drop_abandoned_waiters(self) -> None:
+        """
+        Pop dead waiters off the top of the heap (caller holds the lock)
+
+        Cancelled or timed-out acquire() calls leave a done future behind;
+        waiters whose deadline passed are failed here before they can take a
+        token. Both are removed lazily, only when they reach the top.
+        """
+        now = self.clock()
+        while self.waiters:
+            request = self.waiters[0]
+            if request.future.done():
+                heapq.heappop(self.waiters)
+            elif request.deadline is not None and now >= request.deadline:
+                heapq.heappop(self.waiters)
+                self.stats.shed_requests += 1
+                request.future.set_exception(DeadlineExceededError(
+                    f"Deadline passed after {now - request.timestamp:.1f}s in the queue; dropped before the API call"
+                ))
+            else:
+                return
+
+    def _refund(self, tokens: float, llm_tokens: float, hold_slot: bool = False) -> None:
+        """Give back tokens (and the slot) granted to a caller that never made its call"""
+        self.tokens = min(self.max_tokens, self.tokens + tokens)
+        if self.tpm_capacity is not None:
+            self.tpm_tokens = min(self.tpm_capacity, self.tpm_tokens + llm_tokens)
+        if hold_slot:
+            self.release()
+        self.wakeup.set()
+
+    def _abandon(self, request: PriorityRequest) -> None:
+        """The caller stopped waiting (deadline or cancellation)"""
+        if request.future.done() and not request.future.cancelled() and request.future.exception() is None:
+            # Granted in the same instant the caller gave up
+            self._refund(request.tokens, request.llm_tokens, request.hold_slot)
+        else:
+            request.future.cancel()
+            if self.waiters and self.waiters[0] is request:
+                # The scheduler's timer was set for this request
+                self.wakeup.set()
+
     async def _process_waiters(self):
-        """Background task to wake up waiters when tokens allow"""
+        """
+        Background task that serves waiters in priority order
+
+        Sleeps exactly until the head waiter can be served (next token or end
+        of cooldown) and is woken early when the schedule changes: a new head
+        waiter, a cleared cooldown or returned TPM budget.
+        """
         while True:
             try:
                 async with self.lock:
+                    self._drop_abandoned_waiters()
                     if not self.waiters:
                         self.processing_task = None
                         return  # Exit if no waiters
-                    
-                    # Check cooldown
+
                     if self._is_in_cooldown():
-                        remaining = self._get_cooldown_remaining()
-                        # Wait out the cooldown
-                        # We release lock to wait
-                        pass 
+                        delay = self._get_cooldown_remaining()
                     else:
-                        remaining = 0.0
-                
-                if remaining > 0:
-                    await asyncio.sleep(min(remaining, 1.0))
-                    continue
+                        self._refill_tokens()
+                        request = self.waiters[0]
 
-                async with self.lock:
-                    self._refill_tokens()
-                    
-                    # Peek highest priority waiter
-                    if not self.waiters:
-                        continue
-                        
-                    request = self.waiters[0]
-                    tokens_needed = request.tokens
-                    
-                    if self.tokens >= tokens_needed:
-                        # We can serve this request!
-                        heapq.heappop(self.waiters)
-                        self.tokens -= tokens_needed
-                        self.stats.tokens_acquired += 1
-                        
-                        if not request.future.done():
+                        if self._has_capacity(request.tokens, request.llm_tokens, request.hold_slot):
+                            # We can serve this request!
+                            heapq.heappop(self.waiters)
+                            self._debit(request.tokens, request.llm_tokens, request.hold_slot)
+                            self._advance_virtual_time(request.priority, request.tenant, request.virtual_finish)
+                            self.stats.tokens_acquired += 1
                             request.future.set_result(True)
                             logger.debug(f"✅ Served priority {request.priority} request (remaining: {self.tokens:.2f})")
-                        
-                        continue # Check next waiter immediately
-                    
-                    # Not enough tokens yet
-                    # Calculate wait time
-                    needed = tokens_needed - self.tokens
-                    wait_time = needed / self.refill_rate
-                    wait_time = max(self.min_wait_interval, min(wait_time, 1.0))
-                
-                await asyncio.sleep(wait_time)
-                
+                            continue  # Check next waiter immediately
+
+                        if request.hold_slot and self._at_concurrency_limit():
+                            delay = None  # release() wakes us
+                        else:
+                            delay = self._time_until_capacity(request.tokens, request.llm_tokens)
+
+                    self.wakeup.clear()
+
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
             except Exception as e:
                 logger.error(f"Error in waiter processing: {e}")
                 await asyncio.sleep(1.0)
@@ -271,38 +561,118 @@ class RateLimiter:
         if self.processing_task is None or self.processing_task.done():
             self.processing_task = asyncio.create_task(self._process_waiters())
 
-    async def acquire(self, tokens: float = 1.0, priority: int = 10) -> None:
+    async def acquire(
+        self,
+        tokens: float = 1.0,
+        priority: int = 10,
+        llm_tokens: float = 0.0,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
         """
         Acquire token(s) with priority
+
+        Nothing needs to be returned afterwards; use slot() to also count the
+        call against the in-flight limit.
         
         Args:
             tokens: Number of tokens
             priority: 0=High (Chat), 10=Low (Processing)
+            llm_tokens: Estimated LLM tokens debited from the TPM bucket
+            tenant: Fair-queuing key (e.g. company id); None shares the default queue
+            deadline: Give up at this self.clock() value
+            timeout: Give up after this many seconds (the earlier of the two wins)
+
+        Raises:
+            DeadlineExceededError: If the deadline passed before a token was granted
+        """
+        await self._acquire(tokens, priority, llm_tokens, tenant, deadline, timeout, hold_slot=False)
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self,
+        tokens: float = 1.0,
+        priority: int = 10,
+        llm_tokens: float = 0.0,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Acquire token(s) and hold an in-flight slot until the block exits
+
+        Usage: async with limiter.slot(priority=0): await call()
+        In adaptive mode the grant also waits for a free slot
+        (concurrency_limit). Arguments are the same as acquire().
+
+        Raises:
+            DeadlineExceededError: If the deadline passed before a token was granted
         """
+        await self._acquire(tokens, priority, llm_tokens, tenant, deadline, timeout, hold_slot=True)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def _acquire(
+        self,
+        tokens: float,
+        priority: int,
+        llm_tokens: float,
+        tenant: Optional[str],
+        deadline: Optional[float],
+        timeout: Optional[float],
+        hold_slot: bool,
+    ) -> None:
+        """acquire() / slot(): hold_slot counts the grant in in_flight"""
         if tokens > self.max_tokens:
             raise ValueError(f"Cannot acquire {tokens} tokens (max: {self.max_tokens})")
+        llm_tokens = self._clamp_llm_tokens(llm_tokens)
+        tenant = tenant or DEFAULT_TENANT
+        deadline = resolve_deadline(deadline, timeout, self.clock)
+        if deadline is not None and self.clock() >= deadline:
+            self.stats.shed_requests += 1
+            raise DeadlineExceededError("Deadline already passed; dropped before the API call")
         
         wait_start = None
         
         async with self.lock:
-            # Check if we can acquire immediately (if no higher priority waiters)
-            # Higher priority = lower number
-            has_higher_priority = any(w.priority < priority for w in self.waiters)
+            # Check if we can acquire immediately (if nobody of equal or higher priority waits;
+            # jumping same-priority waiters would bypass tenant fairness)
+            # Higher priority = lower number; the heap top is the best waiting priority
+            self._drop_abandoned_waiters()
+            queued_ahead = bool(self.waiters) and self.waiters[0].priority <= priority
             
             self._refill_tokens()
             
-            if not self._is_in_cooldown() and not has_higher_priority and self.tokens >= tokens:
-                self.tokens -= tokens
+            if not self._is_in_cooldown() and not queued_ahead and self._has_capacity(tokens, llm_tokens, hold_slot):
+                self._debit(tokens, llm_tokens, hold_slot)
+                self._advance_virtual_time(priority, tenant, self._fair_tag(priority, tenant, tokens))
                 self.stats.tokens_acquired += 1
+                self.stats.record_tenant_wait(tenant, 0.0)
                 return # Acquired immediately
             
             # Must wait
-            wait_start = time.monotonic()
+            wait_start = self.clock()
             future = asyncio.get_running_loop().create_future()
-            request = PriorityRequest(priority=priority, timestamp=wait_start, tokens=tokens, future=future)
+            request = PriorityRequest(
+                priority=priority,
+                virtual_finish=self._fair_tag(priority, tenant, tokens),
+                timestamp=wait_start,
+                tokens=tokens,
+                future=future,
+                llm_tokens=llm_tokens,
+                tenant=tenant,
+                deadline=deadline,
+                hold_slot=hold_slot,
+            )
             
             heapq.heappush(self.waiters, request)
             self.queue_depth = len(self.waiters)
+            if self.waiters[0] is request:
+                # The scheduler's timer was set for the previous head
+                self.wakeup.set()
             self._ensure_processing_started()
             
             if priority == 0:
@@ -311,20 +681,37 @@ class RateLimiter:
                 logger.info(f"⏳ Low priority request queued (pos: {len(self.waiters)})")
 
         # Wait for the future
-        await future
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(future, timeout=max(0.0, deadline - self.clock()))
+        except asyncio.TimeoutError:
+            self._abandon(request)
+            self.stats.shed_requests += 1
+            raise DeadlineExceededError(
+                f"Deadline passed after {self.clock() - wait_start:.1f}s in the queue; dropped before the API call"
+            ) from None
+        except asyncio.CancelledError:
+            # Caller went away (e.g. client disconnected): leave the queue cleanly
+            self._abandon(request)
+            self.stats.cancelled_requests += 1
+            raise
         
         # Stats update
         if wait_start:
-            duration = time.monotonic() - wait_start
+            duration = self.clock() - wait_start
             self.stats.total_wait_time += duration
             self.stats.tokens_waited += 1
             self.stats.update_average_wait()
+            self.stats.record_tenant_wait(tenant, duration)
 
     async def _mark_429_error(self, error_msg: str = "") -> None:
         """Mark 429 error and set smart cooldown"""
         async with self.lock:
-            self.last_429_time = time.monotonic()
+            self.last_429_time = self.clock()
             self.stats.rate_limit_hits += 1
+            self._refill_tokens()  # settle the bucket clock before emptying it
             self.tokens = 0
             
             # Try parse numeric wait time
@@ -336,10 +723,38 @@ class RateLimiter:
                 self.current_cooldown = self.config.cooldown_after_429
                 logger.warning(f"🚨 Rate limit hit! Default cooldown: {self.current_cooldown:.1f}s")
 
+            self._adapt_on_rate_limit(parsed_wait)
+
+    def release(self) -> None:
+        """A slot() block has exited: free its in-flight slot"""
+        if self.in_flight > 0:
+            self.in_flight -= 1
+        if self.concurrency_limit is not None:
+            self.wakeup.set()
+
+    def _apply_adaptive(self) -> None:
+        # Bank tokens earned at the old rate before switching
+        self._refill_tokens()
+        self.refill_rate = self.adaptive.refill_rate
+        self.concurrency_limit = self.adaptive.concurrency_limit
+        self.wakeup.set()
+
+    def _adapt_on_success(self) -> None:
+        """Additive increase while calls succeed (adaptive mode)"""
+        if self.adaptive is not None and not self._is_in_cooldown():
+            self.adaptive.on_success()
+            self._apply_adaptive()
+
+    def _adapt_on_rate_limit(self, retry_after: Optional[float]) -> None:
+        """Multiplicative decrease on 429 feedback (adaptive mode)"""
+        if self.adaptive is not None and self.adaptive.on_rate_limit(retry_after, self.current_cooldown):
+            self._apply_adaptive()
+
     async def _clear_cooldown(self) -> None:
         async with self.lock:
             if self.last_429_time is not None:
                 self.last_429_time = None
+                self.wakeup.set()
                 logger.info("✅ API call succeeded, clearing cooldown")
 
     def _is_rate_limit_error(self, exception: Exception) -> bool:
@@ -361,39 +776,75 @@ class RateLimiter:
         *args,
         tokens: float = 1.0,
         priority: int = 10,  # Default to low priority
+        llm_tokens: Optional[float] = None,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+        timeout: Optional[float] = None,
         max_retries: Optional[int] = None,
         initial_backoff: Optional[float] = None,
         max_backoff: Optional[float] = None,
+        coalesce_key: Optional[str] = None,
         **kwargs
     ) -> Any:
         """
         Execute with retry and priority
+
+        llm_tokens is the estimated TPM cost of one attempt; when omitted it is
+        estimated from the call arguments plus the configured output allowance.
+        tenant is the fair-queuing key passed to acquire(). deadline/timeout
+        bound the whole call including retries: once passed, the request is
+        shed (DeadlineExceededError) instead of being sent. The timeout does
+        not interrupt an API call that is already running.
+        With a coalesce_key (see single_flight_key), concurrent calls with the
+        same key share the first caller's execution; followers take no token
+        and inherit the leader's priority and deadline.
         """
-        max_retries = max_retries or self.config.max_retries
-        backoff = initial_backoff or self.config.initial_backoff
-        max_backoff_time = max_backoff or self.config.max_backoff
+        if coalesce_key is not None:
+            return await self.single_flight.do(
+                coalesce_key,
+                functools.partial(
+                    self.execute_with_retry, func, *args,
+                    tokens=tokens, priority=priority, llm_tokens=llm_tokens, tenant=tenant,
+                    deadline=deadline, timeout=timeout, max_retries=max_retries,
+                    initial_backoff=initial_backoff, max_backoff=max_backoff, **kwargs
+                ),
+            )
+
+        deadline = resolve_deadline(deadline, timeout, self.clock)
+        max_retries = max_retries if max_retries is not None else self.config.max_retries
+        backoff = initial_backoff if initial_backoff is not None else self.config.initial_backoff
+        max_backoff_time = max_backoff if max_backoff is not None else self.config.max_backoff
         
+        if llm_tokens is None:
+            llm_tokens = estimate_llm_tokens(args, kwargs) + self.config.default_output_tokens
+        llm_tokens = self._clamp_llm_tokens(llm_tokens)
+
         last_exception = None
         self.stats.total_calls += 1
         
         for attempt in range(max_retries + 1):
             try:
-                # Acquire with priority
-                await self.acquire(tokens, priority)
-                
-                # Small delay to spread requests
-                if attempt > 0:
-                    await asyncio.sleep(0.5)
-                
-                logger.info(f"🚀 Executing API call (P{priority}, attempt {attempt + 1})")
-                result = await func(*args, **kwargs)
+                # Acquire with priority; the slot is held for the API call only
+                async with self.slot(tokens, priority, llm_tokens, tenant, deadline=deadline):
+                    # Small delay to spread requests
+                    if attempt > 0:
+                        await asyncio.sleep(0.5)
+                    
+                    logger.info(f"🚀 Executing API call (P{priority}, attempt {attempt + 1})")
+                    result = await func(*args, **kwargs)
                 
+                self._settle_llm_tokens(llm_tokens, _actual_llm_tokens(result))
+                self._adapt_on_success()
                 self.stats.successful_calls += 1
                 if self.last_429_time is not None:
                     await self._clear_cooldown()
                 
                 return result
                 
+            except DeadlineExceededError:
+                self.stats.failed_calls += 1
+                logger.warning(f"⌛ Request shed (P{priority}): deadline passed before the API call")
+                raise
             except Exception as e:
                 last_exception = e
                 error_msg = str(e)
@@ -408,6 +859,12 @@ class RateLimiter:
                         # But acquire() will enforce cooldown anyway. 
                         # We just sleep a bit to yield.
                         wait_time = max(backoff, 1.0)
+                        if deadline is not None and self.clock() + wait_time >= deadline:
+                            self.stats.failed_calls += 1
+                            self.stats.shed_requests += 1
+                            raise DeadlineExceededError(
+                                "Deadline would pass before the retry; giving up"
+                            ) from e
                         logger.warning(
                             f"⚠️ Rate limit hit ({error_type}). "
                             f"Retrying in {wait_time:.1f}s (global cooldown active)..."
@@ -430,14 +887,58 @@ class RateLimiter:
         self.stats.failed_calls += 1
         raise last_exception
 
+    def pending_requests(self) -> int:
+        """Number of requests waiting for tokens"""
+        return len(self.waiters)
+
+    async def refresh(self) -> None:
+        """Reload state kept outside this process (in-memory limiters have none)"""
+
+    def snapshot(self) -> LimiterSnapshot:
+        """
+        Bucket level, queue depth and cooldown for routing decisions
+
+        Never takes the lock or changes state: the refill since the last
+        grant is projected, not banked.
+        """
+        elapsed = max(0.0, self.clock() - self.last_refill)
+        return LimiterSnapshot(
+            available_tokens=min(self.max_tokens, self.tokens + elapsed * self.refill_rate),
+            max_tokens=self.max_tokens,
+            queue_depth=self.pending_requests(),
+            in_cooldown=self._is_in_cooldown(),
+            cooldown_remaining=self._get_cooldown_remaining(),
+        )
+
     def get_status(self) -> Dict[str, Any]:
         """Get status info"""
         return {
             "provider": self.provider.value,
-            "queue_depth": len(self.waiters),
+            "queue_depth": self.pending_requests(),
             "in_cooldown": self._is_in_cooldown(),
             "cooldown_remaining": self._get_cooldown_remaining(),
-            "available_tokens": self.tokens
+            "available_tokens": self.tokens,
+            "tpm_capacity": self.tpm_capacity,
+            "tpm_available": self.tpm_tokens if self.tpm_capacity is not None else None,
+            "tpm_headroom_pct": (
+                max(0.0, self.tpm_tokens) / self.tpm_capacity * 100 if self.tpm_capacity else None
+            ),
+            "effective_rpm": self.refill_rate * 60,
+            "in_flight": self.in_flight,
+            "concurrency_limit": self.concurrency_limit,
+            "adaptive": self.adaptive.get_status() if self.adaptive is not None else None,
+            "shed_requests": self.stats.shed_requests,
+            "cancelled_requests": self.stats.cancelled_requests,
+            "single_flight": self.single_flight.get_status(),
+            "tenants": {
+                tenant: {
+                    "requests": waits.requests,
+                    "average_wait": waits.average_wait_time(),
+                    "max_wait": waits.max_wait_time,
+                    "weight": self.tenant_weights.get(tenant, 1.0),
+                }
+                for tenant, waits in self.stats.tenant_waits.items()
+            },
         }
 
 # Global registry
@@ -449,9 +950,20 @@ def get_rate_limiter(
     config: Optional[RateLimitConfig] = None
 ) -> RateLimiter:
     if name not in _rate_limiters:
-        _rate_limiters[name] = RateLimiter(provider, config)
+        if app_config.RATE_LIMITER_BACKEND == "sqlite":
+            # Shared by every worker process on this host
+            from app.infrastructure.parser.shared_rate_limiter import SharedRateLimiter
+            _rate_limiters[name] = SharedRateLimiter(
+                name, provider, config, db_path=app_config.RATE_LIMITER_DB_PATH
+            )
+        else:
+            _rate_limiters[name] = RateLimiter(provider, config, name=name)
     return _rate_limiters[name]
 
+def get_all_rate_limiters() -> Dict[str, RateLimiter]:
+    """Snapshot of every registered limiter (for metrics export)"""
+    return dict(_rate_limiters)
+
 def reset_rate_limiter(name: str = "default") -> None:
     if name in _rate_limiters:
         del _rate_limiters[name]
@@ -0,0 +1,155 @@
+"""
+Cheap local repair of almost-valid LLM JSON
+Fixes the defects we actually see from the models without another API call:
+- markdown fences / chatter around the JSON
+- trailing commas before } or ]
+- unescaped double quotes and raw newlines inside strings
+- mismatched closing brackets
+- truncation mid-object or mid-array (incomplete tail is dropped, brackets closed)
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _next_significant(text: str, start: int) -> Optional[str]:
+    for j in range(start, len(text)):
+        if not text[j].isspace():
+            return text[j]
+    return None
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    """Remove whitespace and a dangling comma from the end of the output buffer"""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _close(prefix: str, stack: List[str]) -> str:
+    body = prefix.rstrip()
+    if body.endswith(","):
+        body = body[:-1]
+    return body + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Rewrite text into parseable JSON where possible
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Repaired JSON text, or None if no JSON object/array could be recovered
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    # (output length, open brackets) at every safe cut point, for truncation recovery
+    cut_points: List[Tuple[int, List[str]]] = []
+
+    i = min(starts)
+    n = len(text)
+    while i < n:
+        c = text[i]
+
+        if in_string:
+            if escape:
+                out.append(c)
+                escape = False
+            elif c == "\\":
+                out.append(c)
+                escape = True
+            elif c == '"':
+                # A real closing quote is followed by a separator or the end of input
+                follower = _next_significant(text, i + 1)
+                if follower is None or follower in ",}]:":
+                    in_string = False
+                    out.append(c)
+                else:
+                    out.append('\\"')
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        if c == '"':
+            in_string = True
+            out.append(c)
+        elif c in _CLOSERS:
+            # Cutting here drops this (possibly incomplete) container entirely
+            cut_points.append((len(out), list(stack)))
+            stack.append(_CLOSERS[c])
+            out.append(c)
+        elif c in "}]":
+            if stack:
+                _strip_trailing_comma(out)
+                out.append(stack.pop())
+                cut_points.append((len(out), list(stack)))
+                if not stack:
+                    break
+        elif c == ",":
+            cut_points.append((len(out), list(stack)))
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+
+    repaired = "".join(out)
+    if not stack and not in_string:
+        return repaired
+
+    # Truncated: try closing the whole thing, then back off to earlier cut points.
+    # A cut-off string is never closed - half a value is worse than no value.
+    candidates = []
+    if not in_string:
+        candidates.append(_close(repaired, stack))
+    for length, open_stack in reversed(cut_points):
+        candidates.append(_close(repaired[:length], open_stack))
+
+    for candidate in candidates[:64]:
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def loads_with_repair(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    Decode JSON, repairing it locally if needed
+
+    Returns:
+        (value, repaired) - value is None if nothing could be decoded
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        first = min(starts)
+        last = max(text.rfind("}"), text.rfind("]"))
+        if last > first:
+            try:
+                return json.loads(text[first:last + 1]), False
+            except json.JSONDecodeError:
+                pass
+
+    repaired = repair_json(text)
+    if repaired is None:
+        return None, False
+    try:
+        return json.loads(repaired), True
+    except json.JSONDecodeError:
+        return None, False
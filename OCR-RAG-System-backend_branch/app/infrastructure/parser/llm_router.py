@@ -0,0 +1,342 @@
+"""
+Multi-Provider LLM Router
+Keeps one client + rate limiter per provider (Groq, Gemini) and picks the
+healthiest provider for every request, failing over on 429s and timeouts.
+"""
+
+import asyncio
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.infrastructure.parser.gemini_rate_limiter import LimiterSnapshot, RateLimiter, _actual_llm_tokens
+from app.infrastructure.parser.single_flight import single_flight_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderHealth:
+    """Rolling health signals for a single provider"""
+    latency_ewma: Optional[float] = None  # seconds
+    error_rate_ewma: float = 0.0  # 0.0 - 1.0
+    consecutive_failures: int = 0
+    last_failure_time: Optional[float] = None
+    successes: int = 0
+    failures: int = 0
+    rate_limit_failures: int = 0
+    timeouts: int = 0
+
+    def record_success(self, latency: float, alpha: float) -> None:
+        """Fold a successful call into the moving averages"""
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = alpha * latency + (1 - alpha) * self.latency_ewma
+        self.error_rate_ewma = (1 - alpha) * self.error_rate_ewma
+
+    def record_failure(self, alpha: float) -> None:
+        """Fold a failed call into the moving averages"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_failure_time = time.monotonic()
+        self.error_rate_ewma = alpha + (1 - alpha) * self.error_rate_ewma
+
+
+@dataclass
+class ProviderRoute:
+    """A routable provider: LLM client + its own rate limiter"""
+    name: str
+    llm: Any
+    rate_limiter: RateLimiter
+    model_name: str
+    health: ProviderHealth = field(default_factory=ProviderHealth)
+
+
+@dataclass
+class RouterStats:
+    """Routing decisions, exposed through get_status()"""
+    decisions: Dict[str, int] = field(default_factory=dict)
+    fallbacks: Dict[str, int] = field(default_factory=dict)  # times each provider was used as a failover target
+    failovers: int = 0
+    exhausted: int = 0
+    last_decision: Optional[Dict[str, Any]] = None
+
+
+class LLMRouter:
+    """
+    Health-weighted router over several LLM providers
+
+    Each request is sent to the provider with the best score, computed from:
+    - available rate limiter tokens (fraction of the bucket)
+    - cooldown state (providers in cooldown are only used as a last resort)
+    - recent latency (EWMA)
+    - recent error rate (EWMA)
+
+    Rate limit errors and timeouts fail over to the next best provider
+    instead of waiting out the cooldown of the current one.
+    """
+
+    def __init__(
+        self,
+        routes: List[ProviderRoute],
+        timeout: Optional[float] = 120.0,
+        ewma_alpha: float = 0.3,
+        reference_latency: float = 5.0,
+    ):
+        """
+        Initialize router
+
+        Args:
+            routes: Providers in preference order (first = preferred on ties)
+            timeout: Per-attempt timeout in seconds (None = no timeout)
+            ewma_alpha: Smoothing factor for latency/error averages
+            reference_latency: Latency (s) at which the latency factor halves the score
+        """
+        if not routes:
+            raise ValueError("LLMRouter needs at least one provider route")
+
+        self.routes = routes
+        self.timeout = timeout
+        self.ewma_alpha = ewma_alpha
+        self.reference_latency = reference_latency
+        self.stats = RouterStats(
+            decisions={r.name: 0 for r in routes},
+            fallbacks={r.name: 0 for r in routes},
+        )
+
+    def _score(self, route: ProviderRoute, position: int, snapshot: LimiterSnapshot) -> float:
+        """Higher is better. Cooldown is handled separately by _rank."""
+        # Queued waiters will take the available tokens first
+        availability = snapshot.availability
+
+        latency = route.health.latency_ewma or 0.0
+        latency_factor = 1.0 / (1.0 + latency / self.reference_latency)
+        health_factor = 1.0 - route.health.error_rate_ewma
+
+        # Small bias towards the preferred (earlier) providers on ties
+        preference = 1.0 - 0.01 * position
+
+        return (0.1 + availability) * latency_factor * health_factor * preference
+
+    def _rank(self) -> List[ProviderRoute]:
+        """Order providers best-first: usable ones by score, cooling ones by remaining cooldown"""
+        usable = []
+        cooling = []
+        for position, route in enumerate(self.routes):
+            snapshot = route.rate_limiter.snapshot()
+            if snapshot.in_cooldown:
+                cooling.append((snapshot.cooldown_remaining, route))
+            else:
+                usable.append((self._score(route, position, snapshot), route))
+
+        usable.sort(key=lambda item: item[0], reverse=True)
+        cooling.sort(key=lambda item: item[0])
+        return [route for _, route in usable] + [route for _, route in cooling]
+
+    def _is_failover_error(self, route: ProviderRoute, exception: Exception) -> bool:
+        """429s and timeouts fail over; other errors are raised to the caller"""
+        if isinstance(exception, asyncio.TimeoutError):
+            return True
+        return route.rate_limiter._is_rate_limit_error(exception)
+
+    def _record_decision(self, route: ProviderRoute, reason: str) -> None:
+        self.stats.decisions[route.name] = self.stats.decisions.get(route.name, 0) + 1
+        if reason == "failover":
+            self.stats.failovers += 1
+            self.stats.fallbacks[route.name] = self.stats.fallbacks.get(route.name, 0) + 1
+        self.stats.last_decision = {
+            "provider": route.name,
+            "reason": reason,
+            "time": time.time(),
+        }
+
+    def record_success(self, route: ProviderRoute, latency: float) -> None:
+        route.health.record_success(latency, self.ewma_alpha)
+
+    def record_failure(self, route: ProviderRoute, exception: Exception) -> None:
+        route.health.record_failure(self.ewma_alpha)
+        if isinstance(exception, asyncio.TimeoutError):
+            route.health.timeouts += 1
+        elif route.rate_limiter._is_rate_limit_error(exception):
+            route.health.rate_limit_failures += 1
+
+    async def invoke(
+        self,
+        call: Callable[[ProviderRoute], Awaitable[Any]],
+        priority: int = 10,
+        prompt_tokens: Optional[float] = None,
+        deadline: Optional[float] = None,
+        coalesce_messages: Optional[Any] = None,
+        **limiter_kwargs,
+    ) -> Any:
+        """
+        Run call(route) on the best provider, failing over on 429s/timeouts
+
+        Args:
+            call: Async callable receiving the chosen ProviderRoute
+            priority: Rate limiter priority (0=High, 10=Low)
+            prompt_tokens: Estimated prompt tokens; each provider adds its own output allowance
+            deadline: time.monotonic() after which queued attempts are shed (spans failovers)
+            coalesce_messages: Prompt messages; identical concurrent calls on the same model share one call
+            **limiter_kwargs: Extra arguments for RateLimiter.execute_with_retry
+
+        Returns:
+            Result of the first successful call
+        """
+        ranked = self._rank()
+        last_exception: Optional[Exception] = None
+
+        for attempt, route in enumerate(ranked):
+            is_last = attempt == len(ranked) - 1
+            self._record_decision(route, reason="primary" if attempt == 0 else "failover")
+            if attempt > 0:
+                logger.warning(f"🔀 Failing over to {route.name} ({route.model_name})")
+
+            async def timed_call(r: ProviderRoute = route):
+                if self.timeout is None:
+                    return await call(r)
+                return await asyncio.wait_for(call(r), timeout=self.timeout)
+
+            start = time.monotonic()
+            try:
+                # Only the last provider keeps the limiter's own retry loop;
+                # the others fail fast so we can move on to a healthier provider.
+                if prompt_tokens is not None:
+                    limiter_kwargs["llm_tokens"] = prompt_tokens + route.rate_limiter.config.default_output_tokens
+                if coalesce_messages is not None:
+                    limiter_kwargs["coalesce_key"] = single_flight_key(route.model_name, coalesce_messages)
+                result = await route.rate_limiter.execute_with_retry(
+                    timed_call,
+                    priority=priority,
+                    max_retries=None if is_last else 0,
+                    deadline=deadline,
+                    **limiter_kwargs,
+                )
+            except Exception as e:
+                self.record_failure(route, e)
+                last_exception = e
+                if self._is_failover_error(route, e) and not is_last:
+                    logger.warning(f"⚠️ {route.name} unavailable ({type(e).__name__}), trying next provider")
+                    continue
+                if is_last:
+                    self.stats.exhausted += 1
+                raise
+
+            self.record_success(route, time.monotonic() - start)
+            return result
+
+        raise last_exception
+
+    async def stream(
+        self,
+        call: Callable[[ProviderRoute], AsyncIterator[Any]],
+        priority: int = 10,
+        prompt_tokens: float = 0.0,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Stream call(route) from the best provider
+
+        Fails over on 429s/timeouts only until the first chunk has been
+        yielded; after that the error is raised to the caller. The timeout
+        applies to the gap between chunks.
+
+        Args:
+            call: Callable receiving the chosen ProviderRoute and returning an async iterator
+            priority: Rate limiter priority (0=High, 10=Low)
+            prompt_tokens: Estimated prompt tokens debited from the TPM bucket
+            tenant: Fair-queuing key for the rate limiter (e.g. company id)
+            deadline: time.monotonic() after which a queued attempt is shed
+        """
+        ranked = self._rank()
+
+        for attempt, route in enumerate(ranked):
+            is_last = attempt == len(ranked) - 1
+            self._record_decision(route, reason="primary" if attempt == 0 else "failover")
+            if attempt > 0:
+                logger.warning(f"🔀 Failing over to {route.name} ({route.model_name})")
+
+            limiter = route.rate_limiter
+            limiter.stats.total_calls += 1
+            started = False
+            start = time.monotonic()
+            llm_tokens = limiter._clamp_llm_tokens(prompt_tokens + limiter.config.default_output_tokens)
+            actual_tokens: Optional[float] = None
+            try:
+                async with limiter.slot(priority=priority, llm_tokens=llm_tokens, tenant=tenant, deadline=deadline):
+                    iterator = call(route).__aiter__()
+                    while True:
+                        try:
+                            if self.timeout is None:
+                                chunk = await iterator.__anext__()
+                            else:
+                                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        started = True
+                        # Usage metadata arrives on the last chunk (if the provider sends it)
+                        actual_tokens = _actual_llm_tokens(chunk) or actual_tokens
+                        yield chunk
+            except Exception as e:
+                limiter.stats.failed_calls += 1
+                if limiter._is_rate_limit_error(e):
+                    await limiter._mark_429_error(str(e))
+                self.record_failure(route, e)
+                if not started and not is_last and self._is_failover_error(route, e):
+                    logger.warning(f"⚠️ {route.name} unavailable ({type(e).__name__}), trying next provider")
+                    continue
+                if is_last:
+                    self.stats.exhausted += 1
+                raise
+
+            limiter._settle_llm_tokens(llm_tokens, actual_tokens)
+            limiter._adapt_on_success()
+            limiter.stats.successful_calls += 1
+            if limiter.last_429_time is not None:
+                await limiter._clear_cooldown()
+            self.record_success(route, time.monotonic() - start)
+            return
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get routing metrics and per-provider health"""
+        ranked = self._rank()
+        return {
+            "ranking": [route.name for route in ranked],
+            "decisions": dict(self.stats.decisions),
+            "fallbacks": dict(self.stats.fallbacks),
+            "failovers": self.stats.failovers,
+            "exhausted": self.stats.exhausted,
+            "last_decision": self.stats.last_decision,
+            "providers": {
+                route.name: {
+                    "model": route.model_name,
+                    "latency_ewma": route.health.latency_ewma,
+                    "error_rate_ewma": route.health.error_rate_ewma,
+                    "consecutive_failures": route.health.consecutive_failures,
+                    "successes": route.health.successes,
+                    "failures": route.health.failures,
+                    "rate_limit_failures": route.health.rate_limit_failures,
+                    "timeouts": route.health.timeouts,
+                    "limiter": route.rate_limiter.get_status(),
+                }
+                for route in self.routes
+            },
+        }
+
+
+# Global registry (mirrors the rate limiter registry)
+_llm_routers: Dict[str, LLMRouter] = {}
+
+
+def register_llm_router(name: str, router: LLMRouter) -> LLMRouter:
+    _llm_routers[name] = router
+    return router
+
+
+def get_llm_routers() -> Dict[str, LLMRouter]:
+    return dict(_llm_routers)
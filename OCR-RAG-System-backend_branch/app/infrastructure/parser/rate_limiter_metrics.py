@@ -0,0 +1,209 @@
+"""
+Prometheus text exposition for the rate limiters
+Renders every registered RateLimiter (queue depth, bucket levels, cooldown,
+call outcomes and a queue wait histogram) and every registered LLMRouter
+(provider choices and failovers) in the text format scraped by Prometheus
+(version 0.0.4). Served by GET /admin/metrics.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config.config import config
+from app.infrastructure.parser.gemini_rate_limiter import (
+    WAIT_TIME_BUCKETS,
+    RateLimiter,
+    TenantWaitStats,
+    get_all_rate_limiters,
+)
+from app.infrastructure.parser.llm_router import LLMRouter, get_llm_routers
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "rate_limiter"
+OTHER_TENANTS = "other"
+
+# (metric suffix, help, status key) gauges read from RateLimiter.get_status()
+_STATUS_GAUGES: Tuple[Tuple[str, str, str], ...] = (
+    ("queue_depth", "Requests waiting for tokens", "queue_depth"),
+    ("available_tokens", "Request tokens currently in the bucket", "available_tokens"),
+    ("tpm_available", "LLM tokens currently in the TPM bucket", "tpm_available"),
+    ("cooldown_remaining_seconds", "Seconds left in the 429 cooldown", "cooldown_remaining"),
+    ("effective_rpm", "Current refill rate in requests per minute", "effective_rpm"),
+    ("in_flight", "slot() blocks granted and not yet exited", "in_flight"),
+    ("concurrency_limit", "In-flight cap (adaptive mode only)", "concurrency_limit"),
+)
+
+# (metric suffix, help, RateLimitStats attribute)
+_STATS_COUNTERS: Tuple[Tuple[str, str, str], ...] = (
+    ("calls_total", "Calls made through execute_with_retry", "total_calls"),
+    ("successful_calls_total", "Calls that returned a result", "successful_calls"),
+    ("failed_calls_total", "Calls that raised after retries", "failed_calls"),
+    ("rate_limit_hits_total", "429 responses seen", "rate_limit_hits"),
+    ("shed_requests_total", "Requests dropped because their deadline passed", "shed_requests"),
+    ("cancelled_requests_total", "Requests whose caller went away while queued", "cancelled_requests"),
+    ("llm_tokens_estimated_total", "Estimated LLM tokens debited from the TPM bucket", "llm_tokens_estimated"),
+    ("llm_tokens_actual_total", "LLM tokens reported by the provider", "llm_tokens_actual"),
+)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Family:
+    """Samples of one metric, emitted together under a single HELP/TYPE header"""
+
+    def __init__(self, name: str, metric_type: str, help_text: str):
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples: List[str] = []
+
+    def add(self, labels: Dict[str, Any], value: Optional[float], suffix: str = "") -> None:
+        if value is None:
+            return
+        self.samples.append(f"{self.name}{suffix}{_labels(labels)} {_format_value(value)}")
+
+    def render(self) -> List[str]:
+        if not self.samples:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}", *self.samples]
+
+
+def _top_tenants(tenant_waits: Dict[str, TenantWaitStats], limit: int) -> List[Tuple[str, TenantWaitStats]]:
+    """
+    The `limit` busiest tenants plus one "other" entry summing the rest
+
+    Company ids are unbounded; this keeps the tenant label's cardinality at
+    limit + 1. A tenant entering or leaving the top set shows up as a counter
+    reset on its series and on "other", which rate() absorbs.
+    """
+    if limit <= 0:
+        return []
+    ranked = sorted(tenant_waits.items(), key=lambda item: (-item[1].requests, item[0]))
+    top, rest = ranked[:limit], ranked[limit:]
+    if rest:
+        other = TenantWaitStats()
+        for _, waits in rest:
+            other.requests += waits.requests
+            other.waited += waits.waited
+            other.total_wait_time += waits.total_wait_time
+            other.max_wait_time = max(other.max_wait_time, waits.max_wait_time)
+        top.append((OTHER_TENANTS, other))
+    return top
+
+
+def _render(families: Dict[str, _Family]) -> str:
+    lines: List[str] = []
+    for metric_family in families.values():
+        lines.extend(metric_family.render())
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def render_prometheus(
+    limiters: Optional[Dict[str, RateLimiter]] = None,
+    top_tenants: Optional[int] = None,
+) -> str:
+    """
+    Render limiter metrics in Prometheus text format
+
+    Args:
+        limiters: Limiters by registry name (defaults to every registered limiter)
+        top_tenants: Tenants with their own series (default RATE_LIMITER_METRICS_TOP_TENANTS)
+
+    Returns:
+        Exposition text, newline-terminated
+    """
+    if limiters is None:
+        limiters = get_all_rate_limiters()
+    if top_tenants is None:
+        top_tenants = config.RATE_LIMITER_METRICS_TOP_TENANTS
+
+    families: Dict[str, _Family] = {}
+
+    def family(suffix: str, metric_type: str, help_text: str) -> _Family:
+        name = f"{PREFIX}_{suffix}"
+        if name not in families:
+            families[name] = _Family(name, metric_type, help_text)
+        return families[name]
+
+    for registry_name, limiter in sorted(limiters.items()):
+        labels = {"limiter": registry_name, "provider": limiter.provider.value}
+        status = limiter.get_status()
+        stats = limiter.stats
+
+        for suffix, help_text, key in _STATUS_GAUGES:
+            family(suffix, "gauge", help_text).add(labels, status.get(key))
+        family("in_cooldown", "gauge", "1 while the limiter is cooling down after a 429").add(
+            labels, 1.0 if status.get("in_cooldown") else 0.0
+        )
+
+        for suffix, help_text, attribute in _STATS_COUNTERS:
+            family(suffix, "counter", help_text).add(labels, getattr(stats, attribute))
+
+        single_flight = status.get("single_flight") or {}
+        family("coalesced_calls_total", "counter", "Calls served by an identical in-flight call").add(
+            labels, single_flight.get("coalesced")
+        )
+        family("coalescing_ratio", "gauge", "Share of coalescable calls that were coalesced").add(
+            labels, single_flight.get("coalescing_ratio")
+        )
+
+        histogram = family("wait_seconds", "histogram", "Time requests spent queued for a token")
+        cumulative = 0
+        bounds: Iterable[float] = (*WAIT_TIME_BUCKETS, float("inf"))
+        for bound, count in zip(bounds, stats.wait_histogram):
+            cumulative += count
+            histogram.add({**labels, "le": _format_value(bound)}, cumulative, suffix="_bucket")
+        histogram.add(labels, stats.wait_sum, suffix="_sum")
+        histogram.add(labels, stats.wait_count, suffix="_count")
+
+        for tenant, waits in _top_tenants(stats.tenant_waits, top_tenants):
+            tenant_labels = {**labels, "tenant": tenant}
+            family("tenant_requests_total", "counter", "Requests granted per tenant").add(
+                tenant_labels, waits.requests
+            )
+            family("tenant_wait_seconds_total", "counter", "Total queue wait per tenant").add(
+                tenant_labels, waits.total_wait_time
+            )
+            family("tenant_wait_seconds_max", "gauge", "Longest queue wait seen per tenant").add(
+                tenant_labels, waits.max_wait_time
+            )
+
+    return _render(families)
+
+
+def render_router_metrics(routers: Optional[Dict[str, LLMRouter]] = None) -> str:
+    """
+    Render provider routing decisions in Prometheus text format
+
+    Args:
+        routers: Routers by registry name (defaults to every registered router)
+
+    Returns:
+        Exposition text, newline-terminated (empty without routers)
+    """
+    if routers is None:
+        routers = get_llm_routers()
+
+    choices = _Family("llm_router_choices_total", "counter", "Attempts routed to each provider")
+    fallbacks = _Family("llm_router_fallbacks_total", "counter", "Attempts that failed over to each provider")
+    exhausted = _Family("llm_router_exhausted_total", "counter", "Requests that failed on every provider")
+    for registry_name, router in sorted(routers.items()):
+        status = router.get_status()
+        for provider, count in sorted(status["decisions"].items()):
+            choices.add({"router": registry_name, "provider": provider}, count)
+        for provider, count in sorted(status["fallbacks"].items()):
+            fallbacks.add({"router": registry_name, "provider": provider}, count)
+        exhausted.add({"router": registry_name}, status["exhausted"])
+
+    return _render({family.name: family for family in (choices, fallbacks, exhausted)})
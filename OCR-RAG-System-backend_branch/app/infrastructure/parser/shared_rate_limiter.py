@@ -0,0 +1,534 @@
+"""
+Cross-process Rate Limiter
+Keeps the token buckets, the 429 cooldown and the priority waiter queue in a
+SQLite file, so every uvicorn worker on the host draws from one quota instead
+of each believing it owns the full RPM/TPM budget.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.infrastructure.parser.gemini_rate_limiter import (
+    DEFAULT_TENANT,
+    APIProvider,
+    DeadlineExceededError,
+    RateLimitConfig,
+    RateLimiter,
+    resolve_deadline,
+)
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    tpm_tokens REAL NOT NULL,
+    last_refill REAL NOT NULL,
+    cooldown_until REAL NOT NULL DEFAULT 0,
+    cooldown REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id TEXT PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    enqueued REAL NOT NULL,
+    tokens REAL NOT NULL,
+    llm_tokens REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    tenant TEXT NOT NULL DEFAULT 'default',
+    virtual_finish REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS fair_queue (
+    bucket TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    tenant TEXT NOT NULL,  -- '' holds the virtual time of the priority class
+    finish REAL NOT NULL,
+    PRIMARY KEY (bucket, priority, tenant)
+);
+CREATE INDEX IF NOT EXISTS waiters_fair_order ON waiters (bucket, priority, virtual_finish, enqueued, id);
+"""
+
+CLASS_CLOCK = ""
+
+WAITER_ORDER = "ORDER BY priority, virtual_finish, enqueued, id"
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter whose state lives in SQLite
+
+    Same acquire / execute_with_retry API and priority semantics as
+    RateLimiter. Every state change runs in a BEGIN IMMEDIATE transaction
+    (one writer at a time across processes) and uses wall-clock time, since
+    monotonic clocks are not comparable between processes. Queued requests
+    are rows ordered by (priority, fair-queuing tag, enqueue time); only the
+    head row may take tokens. Tenant tags and class virtual times live in
+    fair_queue, so fairness holds across workers too. Rows whose owner
+    stopped heartbeating (crashed worker) are removed after stale_after
+    seconds.
+
+    Stats, in-flight limits and adaptive (AIMD) learning are still per
+    process; the learned rate file is shared. SQLite is only touched from
+    executor threads; the local mirror of the bucket and queue depth is
+    refreshed by every transaction (and by refresh()).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        provider: APIProvider = APIProvider.GEMINI_FREE,
+        config: Optional[RateLimitConfig] = None,
+        db_path: str = "data/rate_limiter.db",
+        min_wait_interval: float = 0.1,
+        stale_after: float = 15.0,
+        busy_timeout: float = 5.0,
+    ):
+        """
+        Initialize shared rate limiter
+
+        Args:
+            name: Bucket name shared by every process (the registry name)
+            provider: API provider preset
+            config: Custom config (overrides the preset)
+            db_path: SQLite file visible to every worker
+            min_wait_interval: Minimum polling interval while queued
+            stale_after: Seconds without heartbeat before a queued row is dropped
+            busy_timeout: Seconds to wait for another process's transaction
+        """
+        super().__init__(provider, config, min_wait_interval, name=name)
+        self.name = name
+        self.db_path = db_path
+        self.stale_after = stale_after
+        self.busy_timeout = busy_timeout
+        self.cooldown_until: float = 0.0
+        self.slot_freed = asyncio.Event()  # set by release(): slot() waiters re-check the in-flight limit
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._migrate_waiters(conn)
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets (name, tokens, tpm_tokens, last_refill) VALUES (?, ?, ?, ?)",
+                (name, self.max_tokens, self.tpm_capacity or 0.0, time.time()),
+            )
+        finally:
+            conn.close()
+
+        logger.info(f"🔗 Rate limiter '{name}' shares state via {db_path}")
+
+    @staticmethod
+    def _migrate_waiters(conn: sqlite3.Connection) -> None:
+        """Queue rows are transient: recreate a waiters table that predates fair queuing"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(waiters)")}
+        if columns and "virtual_finish" not in columns:
+            conn.execute("DROP TABLE waiters")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation: safe from executor threads
+        return sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run work(conn) while holding the database write lock"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        finally:
+            conn.close()
+
+    def _load_bucket(self, conn: sqlite3.Connection, now: float) -> None:
+        """Read the shared bucket, refill it to `now` and mirror it locally"""
+        tokens, tpm_tokens, last_refill, cooldown_until, cooldown = conn.execute(
+            "SELECT tokens, tpm_tokens, last_refill, cooldown_until, cooldown FROM buckets WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+
+        elapsed = max(0.0, now - last_refill)
+        self.tokens = min(self.max_tokens, tokens + elapsed * self.refill_rate)
+        if self.tpm_capacity is not None:
+            self.tpm_tokens = min(self.tpm_capacity, tpm_tokens + elapsed * self.tpm_refill_rate)
+        self.cooldown_until = cooldown_until
+        self.current_cooldown = cooldown or self.config.cooldown_after_429
+        self.last_429_time = cooldown_until - self.current_cooldown if cooldown_until else None
+        self.last_refill = self.clock()  # snapshot() projects the mirror from here
+        self.queue_depth = conn.execute(
+            "SELECT COUNT(*) FROM waiters WHERE bucket = ? AND heartbeat >= ?",
+            (self.name, now - self.stale_after),
+        ).fetchone()[0]
+
+    def _store_bucket(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "UPDATE buckets SET tokens = ?, tpm_tokens = ?, last_refill = ?, cooldown_until = ?, cooldown = ? "
+            "WHERE name = ?",
+            (self.tokens, self.tpm_tokens, now, self.cooldown_until, self.current_cooldown, self.name),
+        )
+
+    def _refill_tokens(self) -> None:
+        """No-op: the shared bucket is refilled inside each transaction (_load_bucket)"""
+
+    def _read_shared_state(self) -> None:
+        """Refresh the local mirror of the shared bucket (read-only, executor thread)"""
+        conn = self._connect()
+        try:
+            self._load_bucket(conn, time.time())
+        finally:
+            conn.close()
+
+    async def refresh(self) -> None:
+        """Pick up bucket and queue changes made by other processes"""
+        await asyncio.get_running_loop().run_in_executor(None, self._read_shared_state)
+
+    def _run_in_background(self, func: Callable, *args) -> None:
+        """Fire-and-forget database work that must not block the event loop"""
+        def report(done: asyncio.Future) -> None:
+            if not done.cancelled() and done.exception() is not None:
+                logger.warning(f"⚠️ Shared rate limiter '{self.name}' update failed: {done.exception()}")
+
+        asyncio.get_running_loop().run_in_executor(None, func, *args).add_done_callback(report)
+
+    def _is_in_cooldown(self) -> bool:
+        return time.time() < self.cooldown_until
+
+    def _get_cooldown_remaining(self) -> float:
+        return max(0.0, self.cooldown_until - time.time())
+
+    def _poll_interval(self, wait: float) -> float:
+        # Queued rows must heartbeat well within stale_after
+        return max(self.min_wait_interval, min(wait, self.stale_after / 3))
+
+    def _fair_clock(self, conn: sqlite3.Connection, priority: int, tenant: str) -> float:
+        row = conn.execute(
+            "SELECT finish FROM fair_queue WHERE bucket = ? AND priority = ? AND tenant = ?",
+            (self.name, priority, tenant),
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    def _set_fair_clock(self, conn: sqlite3.Connection, priority: int, tenant: str, finish: float) -> None:
+        conn.execute(
+            "INSERT INTO fair_queue (bucket, priority, tenant, finish) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (bucket, priority, tenant) DO UPDATE SET finish = excluded.finish",
+            (self.name, priority, tenant, finish),
+        )
+
+    def _shared_fair_tag(self, conn: sqlite3.Connection, priority: int, tenant: str, tokens: float) -> float:
+        """Same tagging as RateLimiter._fair_tag, on the shared clocks"""
+        start = max(self._fair_clock(conn, priority, CLASS_CLOCK), self._fair_clock(conn, priority, tenant))
+        finish = start + tokens / self.tenant_weights.get(tenant, 1.0)
+        self._set_fair_clock(conn, priority, tenant, finish)
+        return finish
+
+    def _shared_advance(self, conn: sqlite3.Connection, priority: int, finish: float) -> None:
+        """Advance the class virtual time and forget tenants that fell behind it"""
+        virtual_time = max(self._fair_clock(conn, priority, CLASS_CLOCK), finish)
+        self._set_fair_clock(conn, priority, CLASS_CLOCK, virtual_time)
+        conn.execute(
+            "DELETE FROM fair_queue WHERE bucket = ? AND priority = ? AND tenant != ? AND finish <= ?",
+            (self.name, priority, CLASS_CLOCK, virtual_time),
+        )
+
+    def _try_acquire(
+        self,
+        waiter_id: str,
+        priority: int,
+        tokens: float,
+        llm_tokens: float,
+        tenant: str,
+        first: bool,
+    ) -> Tuple[bool, float]:
+        """
+        One scheduling step for a request
+
+        Returns:
+            (granted, seconds to wait before the next attempt)
+        """
+        def work(conn: sqlite3.Connection) -> Tuple[bool, float]:
+            now = time.time()
+            conn.execute(
+                "DELETE FROM waiters WHERE bucket = ? AND heartbeat < ?",
+                (self.name, now - self.stale_after),
+            )
+            self._load_bucket(conn, now)
+            in_cooldown = now < self.cooldown_until
+
+            if first:
+                # Same rule as RateLimiter.acquire: go now unless an equal or higher priority request is queued
+                queued_ahead = conn.execute(
+                    "SELECT 1 FROM waiters WHERE bucket = ? AND priority <= ? LIMIT 1",
+                    (self.name, priority),
+                ).fetchone()
+                if not in_cooldown and not queued_ahead and self._has_capacity(tokens, llm_tokens):
+                    self._debit(tokens, llm_tokens)
+                    self._shared_advance(conn, priority, self._shared_fair_tag(conn, priority, tenant, tokens))
+                    self._store_bucket(conn, now)
+                    return True, 0.0
+                self._insert_waiter(conn, waiter_id, priority, now, tokens, llm_tokens, tenant)
+            else:
+                updated = conn.execute(
+                    "UPDATE waiters SET heartbeat = ? WHERE id = ?", (now, waiter_id)
+                ).rowcount
+                if not updated:
+                    # Dropped as stale (e.g. the event loop was blocked): queue again
+                    self._insert_waiter(conn, waiter_id, priority, now, tokens, llm_tokens, tenant)
+
+            self._store_bucket(conn, now)
+            if in_cooldown:
+                return False, self._poll_interval(self.cooldown_until - now)
+
+            head = conn.execute(
+                f"SELECT id, tokens, llm_tokens, virtual_finish FROM waiters WHERE bucket = ? {WAITER_ORDER} LIMIT 1",
+                (self.name,),
+            ).fetchone()
+            if head[0] != waiter_id:
+                # Someone else is first in line; check back once they could be served
+                return False, self._poll_interval(self._time_until_capacity(head[1], head[2]))
+
+            if self._has_capacity(tokens, llm_tokens):
+                self._debit(tokens, llm_tokens)
+                self._shared_advance(conn, priority, head[3])
+                conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+                self._store_bucket(conn, now)
+                return True, 0.0
+
+            return False, self._poll_interval(self._time_until_capacity(tokens, llm_tokens))
+
+        return self._transaction(work)
+
+    def _insert_waiter(
+        self,
+        conn: sqlite3.Connection,
+        waiter_id: str,
+        priority: int,
+        now: float,
+        tokens: float,
+        llm_tokens: float,
+        tenant: str,
+    ) -> None:
+        conn.execute(
+            "INSERT INTO waiters "
+            "(id, bucket, priority, enqueued, tokens, llm_tokens, heartbeat, tenant, virtual_finish) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                waiter_id, self.name, priority, now, tokens, llm_tokens, now, tenant,
+                self._shared_fair_tag(conn, priority, tenant, tokens),
+            ),
+        )
+
+    def _remove_waiter(self, waiter_id: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+        finally:
+            conn.close()
+
+    def _refund_shared(self, tokens: float, llm_tokens: float) -> None:
+        def work(conn: sqlite3.Connection) -> None:
+            now = time.time()
+            self._load_bucket(conn, now)
+            self.tokens = min(self.max_tokens, self.tokens + tokens)
+            if self.tpm_capacity is not None:
+                self.tpm_tokens = min(self.tpm_capacity, self.tpm_tokens + llm_tokens)
+            self._store_bucket(conn, now)
+
+        self._transaction(work)
+
+    def _refund(self, tokens: float, llm_tokens: float, hold_slot: bool = False) -> None:
+        """Give back shared tokens (and the slot) granted to a caller that never made its call"""
+        self._run_in_background(self._refund_shared, tokens, llm_tokens)
+        if hold_slot:
+            self.release()
+
+    def _abandon_step(self, step: asyncio.Future, waiter_id: str, tokens: float, llm_tokens: float) -> None:
+        """A scheduling step finished after its caller was cancelled"""
+        if not step.cancelled() and step.exception() is None and step.result()[0]:
+            self._refund(tokens, llm_tokens)
+        else:
+            self._run_in_background(self._remove_waiter, waiter_id)
+
+    async def _step(
+        self,
+        waiter_id: str,
+        priority: int,
+        tokens: float,
+        llm_tokens: float,
+        tenant: str,
+        first: bool,
+    ) -> Tuple[bool, float]:
+        """Run _try_acquire off the event loop; a grant that lands after cancellation is refunded"""
+        step = asyncio.get_running_loop().run_in_executor(
+            None, self._try_acquire, waiter_id, priority, tokens, llm_tokens, tenant, first
+        )
+        try:
+            return await asyncio.shield(step)
+        except asyncio.CancelledError:
+            step.add_done_callback(lambda done: self._abandon_step(done, waiter_id, tokens, llm_tokens))
+            raise
+
+    async def _acquire(
+        self,
+        tokens: float,
+        priority: int,
+        llm_tokens: float,
+        tenant: Optional[str],
+        deadline: Optional[float],
+        timeout: Optional[float],
+        hold_slot: bool,
+    ) -> None:
+        """
+        acquire() / slot() against the shared bucket (deadline is a time.monotonic() value)
+
+        The in-flight limit is per process, so slot() reserves its slot here
+        on the event loop before queueing for shared tokens.
+        """
+        if tokens > self.max_tokens:
+            raise ValueError(f"Cannot acquire {tokens} tokens (max: {self.max_tokens})")
+        llm_tokens = self._clamp_llm_tokens(llm_tokens)
+        tenant = tenant or DEFAULT_TENANT
+        deadline = resolve_deadline(deadline, timeout, self.clock)
+        if deadline is not None and self.clock() >= deadline:
+            self.stats.shed_requests += 1
+            raise DeadlineExceededError("Deadline already passed; dropped before the API call")
+
+        waiter_id = uuid.uuid4().hex
+        wait_start = self.clock()
+        if hold_slot:
+            await self._reserve_slot(deadline)
+
+        try:
+            granted, wait_time = await self._step(waiter_id, priority, tokens, llm_tokens, tenant, True)
+            if granted:
+                self.stats.tokens_acquired += 1
+                self.stats.record_tenant_wait(tenant, 0.0)
+                return
+
+            if priority == 0:
+                logger.info("⚡ High priority request queued (shared)")
+            else:
+                logger.info("⏳ Low priority request queued (shared)")
+
+            while not granted:
+                if deadline is not None:
+                    wait_time = min(wait_time, max(0.0, deadline - self.clock()))
+                await asyncio.sleep(wait_time)
+                if deadline is not None and self.clock() >= deadline:
+                    raise DeadlineExceededError(
+                        f"Deadline passed after {self.clock() - wait_start:.1f}s in the queue; "
+                        "dropped before the API call"
+                    )
+                granted, wait_time = await self._step(waiter_id, priority, tokens, llm_tokens, tenant, False)
+        except BaseException as e:
+            if hold_slot:
+                self.release()
+            self._run_in_background(self._remove_waiter, waiter_id)
+            if isinstance(e, DeadlineExceededError):
+                self.stats.shed_requests += 1
+            elif isinstance(e, asyncio.CancelledError):
+                # Caller went away (e.g. client disconnected): leave the shared queue
+                self.stats.cancelled_requests += 1
+            raise
+
+        duration = self.clock() - wait_start
+        self.stats.tokens_acquired += 1
+        self.stats.total_wait_time += duration
+        self.stats.tokens_waited += 1
+        self.stats.update_average_wait()
+        self.stats.record_tenant_wait(tenant, duration)
+
+    async def _reserve_slot(self, deadline: Optional[float]) -> None:
+        """Wait until release() frees an in-flight slot (no polling), then take it"""
+        while self._at_concurrency_limit():
+            self.slot_freed.clear()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            try:
+                await asyncio.wait_for(self.slot_freed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.stats.shed_requests += 1
+                raise DeadlineExceededError(
+                    "Deadline passed while waiting for an in-flight slot; dropped before the API call"
+                ) from None
+        self.in_flight += 1
+
+    def release(self) -> None:
+        """A slot() block has exited: free its in-flight slot"""
+        super().release()
+        self.slot_freed.set()
+
+    def _apply_adaptive(self) -> None:
+        super()._apply_adaptive()
+        self.slot_freed.set()  # The in-flight limit may have grown
+
+    async def _mark_429_error(self, error_msg: str = "") -> None:
+        """Mark 429 error and set the cooldown for every process"""
+        parsed_wait = self._parse_retry_after(error_msg)
+        cooldown = parsed_wait or self.config.cooldown_after_429
+        self.stats.rate_limit_hits += 1
+
+        def work(conn: sqlite3.Connection) -> None:
+            now = time.time()
+            self._load_bucket(conn, now)
+            self.tokens = 0
+            # Never shorten a cooldown another worker already started
+            if now + cooldown > self.cooldown_until:
+                self.cooldown_until = now + cooldown
+                self.current_cooldown = cooldown
+            self._store_bucket(conn, now)
+
+        await asyncio.get_running_loop().run_in_executor(None, self._transaction, work)
+        self._adapt_on_rate_limit(parsed_wait)
+        if parsed_wait:
+            logger.warning(f"🚨 Rate limit hit! Smart cooldown: {parsed_wait:.1f}s (shared)")
+        else:
+            logger.warning(f"🚨 Rate limit hit! Default cooldown: {cooldown:.1f}s (shared)")
+
+    async def _clear_cooldown(self) -> None:
+        def work(conn: sqlite3.Connection) -> bool:
+            now = time.time()
+            self._load_bucket(conn, now)
+            if not self.cooldown_until:
+                return False
+            self.cooldown_until = 0.0
+            self.last_429_time = None
+            self._store_bucket(conn, now)
+            return True
+
+        if await asyncio.get_running_loop().run_in_executor(None, self._transaction, work):
+            logger.info("✅ API call succeeded, clearing cooldown")
+
+    def _settle_llm_tokens(self, estimated: float, actual: Optional[float]) -> None:
+        """Correct the shared TPM bucket once the provider reports real usage"""
+        super()._settle_llm_tokens(estimated, actual)
+        if actual is None or self.tpm_capacity is None:
+            return
+
+        def work(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE buckets SET tpm_tokens = MAX(?, MIN(?, tpm_tokens - ?)) WHERE name = ?",
+                (-self.tpm_capacity, self.tpm_capacity, actual - estimated, self.name),
+            )
+
+        self._run_in_background(self._transaction, work)
+
+    def pending_requests(self) -> int:
+        """Requests queued by every process (as of the last transaction or refresh())"""
+        return self.queue_depth
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get status info from the local mirror (bucket and queue are shared, stats are per process)"""
+        status = super().get_status()
+        status["backend"] = "sqlite"
+        status["db_path"] = self.db_path
+        return status
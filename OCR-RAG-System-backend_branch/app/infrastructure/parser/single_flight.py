@@ -0,0 +1,111 @@
+"""
+Single-flight coalescing for LLM calls
+Concurrent calls with the same key (model + messages) share one in-flight
+execution, so a double-submitted upload or the same chat question asked by
+several users at once costs one rate-limiter token and one API call.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _message_payload(message: Any) -> Any:
+    """Reduce a LangChain message (or plain value) to something JSON can hash"""
+    content = getattr(message, "content", None)
+    if content is not None:
+        return {"type": getattr(message, "type", type(message).__name__), "content": content}
+    if isinstance(message, (list, tuple)):
+        return [_message_payload(m) for m in message]
+    if isinstance(message, dict):
+        return {str(k): _message_payload(v) for k, v in message.items()}
+    return message
+
+
+def single_flight_key(model: str, messages: Any) -> str:
+    """
+    Build the coalescing key for a call
+
+    Args:
+        model: Model name (the same prompt on another model is a different call)
+        messages: Prompt messages (LangChain messages, strings or dicts)
+
+    Returns:
+        Hex digest identifying the call
+    """
+    payload = json.dumps([model, _message_payload(messages)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Share one in-flight execution between concurrent callers with the same key
+
+    The first caller (the leader) starts the execution as a task; callers that
+    arrive with the same key before it finishes await the same task and get
+    its result or exception. Results are not cached: once the task is done the
+    next call with that key runs again. The execution is only cancelled when
+    every caller waiting on it has gone away.
+    """
+
+    def __init__(self):
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func() once per key among concurrent callers
+
+        Args:
+            key: Coalescing key (see single_flight_key)
+            func: Zero-argument coroutine factory, only called by the leader
+
+        Returns:
+            The shared result
+        """
+        self.calls += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.in_flight[key] = task
+            self.waiters[key] = 0
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.coalesced += 1
+            logger.info(f"🔗 Coalesced identical in-flight call ({self.waiters[key]} already waiting)")
+
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self.waiters.get(key) == 1:
+                task.cancel()  # Last interested caller left
+            raise
+        finally:
+            if key in self.waiters and self.in_flight.get(key) is task:
+                self.waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+            del self.waiters[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved by the waiters; avoid "never retrieved" warnings
+
+    def coalescing_ratio(self) -> float:
+        """Share of calls that were served by another caller's execution"""
+        return self.coalesced / self.calls if self.calls else 0.0
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalescing_ratio": self.coalescing_ratio(),
+            "in_flight_keys": len(self.in_flight),
+        }
@@ -0,0 +1,209 @@
+"""
+Incremental JSON parsing of streamed LLM output
+Emits top-level fields and rows of top-level arrays (transactions,
+line_items, ...) as soon as they are complete, long before the model has
+finished generating the whole document.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class StreamEvent:
+    """
+    Event emitted while a document is being streamed
+
+    kind:
+    - "field": a complete top-level field (key, value)
+    - "item": a complete element of a top-level array (key, index, value)
+    - "document": the final document (value), truncated=True if the output ended early
+    """
+    kind: str
+    key: Optional[str] = None
+    value: Any = None
+    index: Optional[int] = None
+    truncated: bool = False
+
+
+class IncrementalJSONParser:
+    """
+    Character-level scanner for a single JSON object arriving in chunks
+
+    Only the structure (depth, strings, separators) is tracked while scanning;
+    each completed value is decoded once with json.loads on its own slice, so
+    the total work stays linear in the output size. Text before the first "{"
+    (e.g. markdown fences) and after the closing "}" is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+
+        # Root object state: "key" -> "colon" -> "value"
+        self.state = "key"
+        self.key: Optional[str] = None
+        self.key_start: Optional[int] = None
+        self.value_start: Optional[int] = None
+
+        # Top-level array currently being streamed
+        self.array_key: Optional[str] = None
+        self.elem_start: Optional[int] = None
+        self.elem_index = 0
+
+        self.fields: Dict[str, Any] = {}
+        self.items: Dict[str, List[Any]] = {}
+        self.errors: List[str] = []
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """
+        Add a chunk of model output
+
+        Args:
+            chunk: Next piece of the completion text
+
+        Returns:
+            Events for every field/array row completed by this chunk
+        """
+        self.buffer += chunk
+        events: List[StreamEvent] = []
+        self._scan(events)
+        return events
+
+    def _decode(self, start: Optional[int], end: int) -> Any:
+        if start is None:
+            raise ValueError("empty value")
+        return json.loads(self.buffer[start:end])
+
+    def _emit_field(self, end: int, events: List[StreamEvent]) -> None:
+        if self.key is None or self.value_start is None:
+            return
+        try:
+            value = self._decode(self.value_start, end)
+        except ValueError as e:
+            self.errors.append(f"field {self.key!r}: {e}")
+            return
+        self.fields[self.key] = value
+        events.append(StreamEvent(kind="field", key=self.key, value=value))
+
+    def _emit_item(self, end: int, events: List[StreamEvent]) -> None:
+        if self.elem_start is None:
+            return
+        try:
+            value = self._decode(self.elem_start, end)
+        except ValueError as e:
+            self.errors.append(f"{self.array_key}[{self.elem_index}]: {e}")
+        else:
+            self.items.setdefault(self.array_key, []).append(value)
+            events.append(StreamEvent(kind="item", key=self.array_key, value=value, index=self.elem_index))
+        self.elem_index += 1
+        self.elem_start = None
+
+    def _starts_value(self) -> bool:
+        return self.depth == 1 and self.state == "value" and self.value_start is None
+
+    def _starts_item(self) -> bool:
+        return self.depth == 2 and self.array_key is not None and self.elem_start is None
+
+    def _scan(self, events: List[StreamEvent]) -> None:
+        buf = self.buffer
+        i = self.pos
+        n = len(buf)
+
+        while i < n and not self.done:
+            c = buf[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == "key" and self.key_start is not None:
+                        try:
+                            self.key = json.loads(buf[self.key_start:i + 1])
+                        except ValueError:
+                            self.key = buf[self.key_start + 1:i]
+                        self.state = "colon"
+                i += 1
+                continue
+
+            if self.depth == 0:
+                if c == "{":
+                    self.depth = 1
+                    self.state = "key"
+                i += 1
+                continue
+
+            if c == '"':
+                if self.depth == 1 and self.state == "key":
+                    self.key_start = i
+                elif self._starts_value():
+                    self.value_start = i
+                elif self._starts_item():
+                    self.elem_start = i
+                self.in_string = True
+            elif c == ":":
+                if self.depth == 1 and self.state == "colon":
+                    self.state = "value"
+                    self.value_start = None
+            elif c in "{[":
+                if self._starts_value():
+                    self.value_start = i
+                    if c == "[":
+                        self.array_key = self.key
+                        self.elem_start = None
+                        self.elem_index = 0
+                elif self._starts_item():
+                    self.elem_start = i
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 1 and c == "]" and self.array_key is not None:
+                    self._emit_item(i, events)
+                    self.array_key = None
+                elif self.depth == 0:
+                    if self.state == "value":
+                        self._emit_field(i, events)
+                    self.done = True
+            elif c == ",":
+                if self.depth == 1 and self.state == "value":
+                    self._emit_field(i, events)
+                    self.state = "key"
+                    self.key = None
+                    self.key_start = None
+                    self.value_start = None
+                elif self.depth == 2 and self.array_key is not None:
+                    self._emit_item(i, events)
+            elif not c.isspace():
+                if self._starts_value():
+                    self.value_start = i
+                elif self._starts_item():
+                    self.elem_start = i
+
+            i += 1
+
+        self.pos = i
+
+    @property
+    def truncated(self) -> bool:
+        """True if the root object has not been closed (yet)"""
+        return not self.done
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Best-effort document from everything completed so far
+
+        For truncated output, the array that was being streamed keeps all of
+        its completed rows; a partially generated trailing value is dropped.
+        """
+        document = dict(self.fields)
+        if self.array_key is not None and self.array_key not in document:
+            document[self.array_key] = list(self.items.get(self.array_key, []))
+        return document
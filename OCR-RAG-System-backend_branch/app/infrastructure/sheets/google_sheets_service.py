@@ -432,6 +432,7 @@ import os
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from typing import Optional, Dict, Any
+from app.utils.timestamps import local_date
 
 
 class GoogleSheetsService:
@@ -924,8 +925,12 @@ class GoogleSheetsService:
         # Extract date - prioritize created_at from Firebase (when uploaded), then document date
         date = None
 
-        # Check if created_at exists (from Firebase - when document was uploaded)
-        if doc_data.get("created_at"):
+        # created_at_ms is written at ingest (and backfilled); no string parsing needed
+        if doc_data.get("created_at_ms"):
+            date = local_date(doc_data["created_at_ms"])
+
+        # Legacy documents not yet backfilled only have the display string
+        elif doc_data.get("created_at"):
             try:
                 # Parse Firebase created_at format: "22 November 2025 at 07:30:40 PM"
                 from datetime import datetime as dt
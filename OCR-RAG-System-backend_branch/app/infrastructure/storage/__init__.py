@@ -0,0 +1 @@
+# Document store backends (Firebase RTDB, in-memory, SQLite)
@@ -0,0 +1,277 @@
+"""
+Document store interface with Realtime Database path semantics
+FirebaseService, DocumentRepository, WriteBatch and the key allocator only
+use the firebase_admin.db surface: reference(path) with get / set / update /
+delete / transaction and ordered child queries. DocumentStore pins that
+surface down so the same code runs against:
+
+    firebase  the live Realtime Database (firebase_admin.db)
+    memory    a process-local tree (tests, benchmarks, offline runs)
+    sqlite    a local file shared by every worker process on the host
+
+Selected with DOCUMENT_STORE; see get_document_store().
+
+The local backends follow RTDB rules: writing None or {} deletes a node,
+empty parents disappear, lists are stored as "0", "1", ... children (and come
+back as lists when the keys are dense), {".sv": {"increment": n}} and
+{".sv": "timestamp"} are resolved at write time, and queries order children
+null < false < true < numbers < strings < objects, ties broken by key.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config.config import config
+
+
+def split_path(path: str) -> List[str]:
+    return [part for part in (path or "").split("/") if part]
+
+
+def join_path(*parts: str) -> str:
+    return "/".join(part for part in (p.strip("/") for p in parts) if part)
+
+
+def has_server_values(value: Any) -> bool:
+    if isinstance(value, dict):
+        return ".sv" in value or any(has_server_values(child) for child in value.values())
+    return False
+
+
+def resolve_server_values(value: Any, current: Any) -> Any:
+    """Replace {".sv": ...} placeholders the way the server would"""
+    if isinstance(value, dict):
+        if ".sv" in value:
+            server_value = value[".sv"]
+            if server_value == "timestamp":
+                return int(time.time() * 1000)
+            if isinstance(server_value, dict) and "increment" in server_value:
+                base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+                return base + server_value["increment"]
+            raise ValueError(f"Unsupported server value: {server_value!r}")
+        return {
+            key: resolve_server_values(child, current.get(key) if isinstance(current, dict) else None)
+            for key, child in value.items()
+        }
+    return value
+
+
+def normalize(value: Any) -> Any:
+    """Stored form of a value: lists become keyed children, nulls and empty objects vanish"""
+    if isinstance(value, (list, tuple)):
+        value = {str(i): child for i, child in enumerate(value)}
+    if isinstance(value, dict):
+        children = {str(key): normalize(child) for key, child in value.items()}
+        children = {key: child for key, child in children.items() if child is not None}
+        return children or None
+    return value
+
+
+def denormalize(value: Any) -> Any:
+    """Value as the RTDB SDK returns it: objects with mostly dense integer keys become lists"""
+    if not isinstance(value, dict):
+        return value
+    children = {key: denormalize(child) for key, child in value.items()}
+    if children and all(key.isdigit() and (key == "0" or not key.startswith("0")) for key in children):
+        highest = max(int(key) for key in children)
+        if len(children) * 2 > highest + 1:
+            return [children.get(str(i)) for i in range(highest + 1)]
+    return children
+
+
+def order_key(value: Any) -> Tuple:
+    """RTDB child ordering: null < false < true < numbers < strings < objects"""
+    if value is None:
+        return (0,)
+    if value is False:
+        return (1,)
+    if value is True:
+        return (2,)
+    if isinstance(value, (int, float)):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    return (5,)
+
+
+def _key_order(key: str) -> Tuple:
+    # Integer-like keys sort first, numerically, as on the server
+    return (0, int(key), "") if key.isdigit() else (1, 0, key)
+
+
+def _child_value(node: Any, child: List[str]) -> Any:
+    for part in child:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return None if isinstance(node, dict) else node
+
+
+def order_children(
+    node: Any,
+    child: List[str],
+    start: Any = None,
+    end: Any = None,
+    limit_first: Optional[int] = None,
+    limit_last: Optional[int] = None,
+) -> "OrderedDict[str, Any]":
+    """Children of node ordered by the value at child (a split path), filtered and limited like a query"""
+    if isinstance(node, list):
+        node = {str(i): value for i, value in enumerate(node) if value is not None}
+    if not isinstance(node, dict):
+        return OrderedDict()
+
+    rows = sorted(node.items(), key=lambda item: (order_key(_child_value(item[1], child)), _key_order(item[0])))
+    if start is not None:
+        rows = [row for row in rows if order_key(_child_value(row[1], child)) >= order_key(start)]
+    if end is not None:
+        rows = [row for row in rows if order_key(_child_value(row[1], child)) <= order_key(end)]
+    if limit_first is not None:
+        rows = rows[:limit_first]
+    if limit_last is not None:
+        rows = rows[-limit_last:] if limit_last else []
+    return OrderedDict(rows)
+
+
+class StoreQuery:
+    """Ordered child query: order_by_child(...).start_at(...).end_at(...).limit_to_*()"""
+
+    def __init__(self, reference: "StoreReference", child: str):
+        self.reference = reference
+        self.child = split_path(child)
+        self.start: Any = None
+        self.end: Any = None
+        self.limit_first: Optional[int] = None
+        self.limit_last: Optional[int] = None
+
+    def start_at(self, value: Any) -> "StoreQuery":
+        self.start = value
+        return self
+
+    def end_at(self, value: Any) -> "StoreQuery":
+        self.end = value
+        return self
+
+    def limit_to_first(self, limit: int) -> "StoreQuery":
+        self.limit_first = limit
+        return self
+
+    def limit_to_last(self, limit: int) -> "StoreQuery":
+        self.limit_last = limit
+        return self
+
+    def get(self) -> "OrderedDict[str, Any]":
+        return order_children(
+            self.reference.get(), self.child, self.start, self.end, self.limit_first, self.limit_last
+        )
+
+
+class StoreReference(ABC):
+    """One path in a DocumentStore (mirrors firebase_admin.db.Reference)"""
+
+    def __init__(self, store: "DocumentStore", path: str):
+        self.store = store
+        self.path = join_path(path)
+
+    @property
+    def key(self) -> Optional[str]:
+        parts = split_path(self.path)
+        return parts[-1] if parts else None
+
+    def child(self, path: str) -> "StoreReference":
+        return self.store.reference(join_path(self.path, path))
+
+    @abstractmethod
+    def get(self, shallow: bool = False) -> Any:
+        """Value at this path (None if missing); shallow=True returns {child: True | leaf}"""
+
+    @abstractmethod
+    def set(self, value: Any) -> None:
+        """Replace the value at this path (None deletes it)"""
+
+    @abstractmethod
+    def update(self, values: Dict[str, Any]) -> None:
+        """Atomically set several (possibly nested) child paths"""
+
+    @abstractmethod
+    def transaction(self, transaction_update: Callable[[Any], Any]) -> Any:
+        """Atomically replace the value with transaction_update(current); returns the new value"""
+
+    def delete(self) -> None:
+        self.set(None)
+
+    def order_by_child(self, path: str) -> StoreQuery:
+        return StoreQuery(self, path)
+
+    @staticmethod
+    def check_update_paths(values: Dict[str, Any]) -> None:
+        """RTDB rejects an update where one path contains another"""
+        paths = sorted(join_path(path) for path in values)
+        for first, second in zip(paths, paths[1:]):
+            if second == first or second.startswith(first + "/"):
+                raise ValueError(f"Path '{first}' is an ancestor of '{second}' in the same update")
+
+    @staticmethod
+    def shallow(value: Any) -> Any:
+        if isinstance(value, list):
+            value = {str(i): child for i, child in enumerate(value) if child is not None}
+        if isinstance(value, dict):
+            return {key: True if isinstance(child, (dict, list)) else child for key, child in value.items()}
+        return value
+
+
+class DocumentStore(ABC):
+    """Root of a hierarchical JSON store; hands out references by path"""
+
+    name = "abstract"
+
+    @abstractmethod
+    def reference(self, path: str = "/") -> Any:
+        """Reference to path (a StoreReference, or firebase_admin's own Reference)"""
+
+    def close(self) -> None:
+        """Release resources (connections, files); the default has none"""
+
+
+_document_store: Optional[DocumentStore] = None
+
+
+def create_document_store(backend: str, path: Optional[str] = None) -> DocumentStore:
+    """
+    Build a store for a backend name
+
+    Args:
+        backend: "firebase", "memory" or "sqlite"
+        path: SQLite file (sqlite only; defaults to DOCUMENT_STORE_PATH)
+
+    Returns:
+        A new DocumentStore
+    """
+    backend = (backend or "firebase").lower()
+    if backend == "memory":
+        from app.infrastructure.storage.memory_store import MemoryDocumentStore
+        return MemoryDocumentStore()
+    if backend == "sqlite":
+        from app.infrastructure.storage.sqlite_store import SQLiteDocumentStore
+        return SQLiteDocumentStore(path or config.DOCUMENT_STORE_PATH)
+    if backend == "firebase":
+        from app.infrastructure.storage.firebase_store import FirebaseDocumentStore
+        return FirebaseDocumentStore()
+    raise ValueError(f"Unknown DOCUMENT_STORE '{backend}' (expected firebase, memory or sqlite)")
+
+
+def get_document_store() -> DocumentStore:
+    """Process-wide store selected by DOCUMENT_STORE"""
+    global _document_store
+    if _document_store is None:
+        _document_store = create_document_store(config.DOCUMENT_STORE)
+        print(f"🗄️ Document store: {_document_store.name}")
+    return _document_store
+
+
+def set_document_store(store: Optional[DocumentStore]) -> None:
+    """Replace the process-wide store (tests, benchmarks); None resets to DOCUMENT_STORE"""
+    global _document_store
+    _document_store = store
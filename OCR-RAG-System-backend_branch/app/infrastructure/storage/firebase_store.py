@@ -0,0 +1,21 @@
+"""
+Firebase Realtime Database document store
+firebase_admin's db.reference() already has the DocumentStore surface, so
+this only initializes the app and hands out its references.
+"""
+
+from typing import Any
+
+from app.config.settings import init_firebase
+from app.infrastructure.storage.document_store import DocumentStore
+
+
+class FirebaseDocumentStore(DocumentStore):
+    name = "firebase"
+
+    def __init__(self):
+        # firebase_admin db module (initialized once per process)
+        self.db = init_firebase()
+
+    def reference(self, path: str = "/") -> Any:
+        return self.db.reference(path)
@@ -0,0 +1,104 @@
+"""
+In-memory document store
+A process-local JSON tree behind one lock. Nothing is persisted: meant for
+tests, benchmarks and running the pipeline offline (DOCUMENT_STORE=memory).
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from app.infrastructure.storage.document_store import (
+    DocumentStore,
+    StoreReference,
+    denormalize,
+    has_server_values,
+    join_path,
+    normalize,
+    resolve_server_values,
+    split_path,
+)
+
+
+class MemoryDocumentStore(DocumentStore):
+    name = "memory"
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.root: Optional[Dict[str, Any]] = normalize(data) if data else None
+        self.lock = threading.RLock()
+
+    def reference(self, path: str = "/") -> "MemoryReference":
+        return MemoryReference(self, path)
+
+    # Tree helpers (caller holds the lock)
+
+    def read(self, parts: List[str]) -> Any:
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def write(self, parts: List[str], value: Any) -> None:
+        """Store an already normalized value (None deletes and prunes empty parents)"""
+        if not parts:
+            self.root = copy.deepcopy(value) if isinstance(value, dict) else None
+            return
+
+        if value is None:
+            trail = []
+            node = self.root
+            for part in parts[:-1]:
+                if not isinstance(node, dict) or part not in node:
+                    return
+                trail.append((node, part))
+                node = node[part]
+            if isinstance(node, dict):
+                node.pop(parts[-1], None)
+            # Drop parents left empty, as RTDB does
+            while trail and not node:
+                parent, key = trail.pop()
+                del parent[key]
+                node = parent
+            if not self.root:
+                self.root = None
+            return
+
+        if not isinstance(self.root, dict):
+            self.root = {}
+        node = self.root
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}  # A leaf on the way is replaced by an object
+            node = node[part]
+        node[parts[-1]] = copy.deepcopy(value)
+
+
+class MemoryReference(StoreReference):
+    store: MemoryDocumentStore
+
+    def get(self, shallow: bool = False) -> Any:
+        with self.store.lock:
+            value = denormalize(copy.deepcopy(self.store.read(split_path(self.path))))
+        return self.shallow(value) if shallow else value
+
+    def set(self, value: Any) -> None:
+        self.update({"": value})
+
+    def update(self, values: Dict[str, Any]) -> None:
+        self.check_update_paths(values)
+        with self.store.lock:
+            for child, value in values.items():
+                parts = split_path(join_path(self.path, child))
+                if has_server_values(value):
+                    value = resolve_server_values(value, denormalize(self.store.read(parts)))
+                self.store.write(parts, normalize(value))
+
+    def transaction(self, transaction_update: Callable[[Any], Any]) -> Any:
+        parts = split_path(self.path)
+        with self.store.lock:
+            current = denormalize(copy.deepcopy(self.store.read(parts)))
+            new_value = transaction_update(current)
+            self.store.write(parts, normalize(new_value))
+            return denormalize(copy.deepcopy(self.store.read(parts)))
@@ -0,0 +1,160 @@
+"""
+SQLite document store
+Keeps the JSON tree in a local file as one row per leaf, keyed by its full
+path ("users/u1/companies/c1/documents/INV1/total_amount"). A subtree is a
+path range, so reads, overwrites and deletes are single indexed statements.
+Writes and transactions run under BEGIN IMMEDIATE, which makes update()
+atomic and transaction() safe across every worker process on the host
+(DOCUMENT_STORE=sqlite).
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.infrastructure.storage.document_store import (
+    DocumentStore,
+    StoreReference,
+    denormalize,
+    has_server_values,
+    join_path,
+    normalize,
+    resolve_server_values,
+    split_path,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    path TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _flatten(prefix: str, value: Any, rows: List[Tuple[str, str]]) -> None:
+    """Leaf rows of a normalized value"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(f"{prefix}/{key}" if prefix else key, child, rows)
+    elif value is not None:
+        rows.append((prefix, json.dumps(value)))
+
+
+class SQLiteDocumentStore(DocumentStore):
+    name = "sqlite"
+
+    def __init__(self, db_path: str, busy_timeout: float = 10.0):
+        """
+        Args:
+            db_path: SQLite file (created with its parent directory if missing)
+            busy_timeout: Seconds to wait for another process's write
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def reference(self, path: str = "/") -> "SQLiteReference":
+        return SQLiteReference(self, path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation: safe from executor threads
+        return sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+
+    def run(self, work: Callable[[sqlite3.Connection], Any], write: bool = False) -> Any:
+        """Run work(conn) in a transaction (holding the write lock if write=True)"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        finally:
+            conn.close()
+
+    # Tree helpers (run inside run())
+
+    @staticmethod
+    def _subtree_clause(path: str) -> Tuple[str, tuple]:
+        if not path:
+            return "1", ()
+        # Every descendant path sorts between "path/" and "path0" ('0' follows '/')
+        return "(path = ? OR (path >= ? AND path < ?))", (path, path + "/", path + "0")
+
+    def read(self, conn: sqlite3.Connection, path: str) -> Any:
+        """Normalized value at path (None if missing)"""
+        clause, params = self._subtree_clause(path)
+        rows = conn.execute(f"SELECT path, value FROM nodes WHERE {clause}", params).fetchall()
+        if not rows:
+            return None
+
+        depth = len(split_path(path))
+        tree: Dict[str, Any] = {}
+        for row_path, raw in rows:
+            if row_path == path:
+                return json.loads(raw)
+            parts = row_path.split("/")[depth:]
+            node = tree
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = json.loads(raw)
+        return tree
+
+    def write(self, conn: sqlite3.Connection, path: str, value: Any) -> None:
+        """Store an already normalized value (None deletes the subtree)"""
+        clause, params = self._subtree_clause(path)
+        conn.execute(f"DELETE FROM nodes WHERE {clause}", params)
+        if value is None:
+            return
+        # A leaf on the way is replaced by an object
+        parts = split_path(path)
+        ancestors = ["/".join(parts[:i]) for i in range(1, len(parts))]
+        if ancestors:
+            conn.execute(
+                f"DELETE FROM nodes WHERE path IN ({','.join('?' * len(ancestors))})", ancestors
+            )
+        rows: List[Tuple[str, str]] = []
+        _flatten(path, value, rows)
+        conn.executemany("INSERT INTO nodes (path, value) VALUES (?, ?)", rows)
+
+
+class SQLiteReference(StoreReference):
+    store: SQLiteDocumentStore
+
+    def get(self, shallow: bool = False) -> Any:
+        value = denormalize(self.store.run(lambda conn: self.store.read(conn, self.path)))
+        return self.shallow(value) if shallow else value
+
+    def set(self, value: Any) -> None:
+        self.update({"": value})
+
+    def update(self, values: Dict[str, Any]) -> None:
+        self.check_update_paths(values)
+
+        def work(conn: sqlite3.Connection) -> None:
+            for child, value in values.items():
+                path = join_path(self.path, child)
+                if has_server_values(value):
+                    value = resolve_server_values(value, denormalize(self.store.read(conn, path)))
+                self.store.write(conn, path, normalize(value))
+
+        self.store.run(work, write=True)
+
+    def transaction(self, transaction_update: Callable[[Any], Any]) -> Any:
+        def work(conn: sqlite3.Connection) -> Any:
+            new_value = normalize(transaction_update(denormalize(self.store.read(conn, self.path))))
+            self.store.write(conn, self.path, new_value)
+            return denormalize(new_value)
+
+        return self.store.run(work, write=True)
@@ -1,54 +1,173 @@
 """
 FAISS Vector Database Service
 Manages document embeddings and similarity search using FAISS
+
+Vectors are partitioned per tenant: each (user_id, company_id) has its own
+shard under data/vector_db/tenants/<user>/<company>/. Shards are loaded on
+first use and kept in an LRU of VECTOR_SHARD_CACHE_SIZE, so a query only
+scans its tenant's vectors and memory follows the active tenants.
+
+Updates and deletes leave tombstoned vectors behind, and writes go to each
+shard's write-ahead log (see VectorShard). A background job
+(start_vector_maintenance, run from main.py) compacts shards whose tombstone
+ratio reaches VECTOR_COMPACTION_RATIO and snapshots shards whose log is older
+than VECTOR_SNAPSHOT_INTERVAL.
 """
+import asyncio
 import faiss
-import numpy as np
-import json
+import heapq
 import pickle
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
-from datetime import datetime
+from typing import Any, Iterator, List, Dict, Set, Tuple, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from app.config.config import config
+from app.infrastructure.vector_db.vector_shard import VectorShard
+
+
+def _encode_tenant_part(value: str) -> str:
+    """Directory name for a user / company id (reversible, no separators or dots)"""
+    if not value:
+        raise ValueError("user_id and company_id are required for the vector index")
+    return quote(str(value), safe="").replace(".", "%2E")
 
 
 class FAISSService:
-    """Service for managing FAISS vector database"""
+    """Service for managing the per-tenant FAISS vector database"""
     
-    def __init__(self, vector_db_path: str = "data/vector_db"):
+    def __init__(self, vector_db_path: str = "data/vector_db", max_loaded_shards: Optional[int] = None):
         """
         Initialize FAISS service
         
         Args:
-            vector_db_path: Path to store FAISS index and metadata
+            vector_db_path: Path to store the tenant shards
+            max_loaded_shards: Shards kept in memory (default VECTOR_SHARD_CACHE_SIZE)
         """
         self.vector_db_path = Path(vector_db_path)
         self.vector_db_path.mkdir(parents=True, exist_ok=True)
-        
-        self.index_path = self.vector_db_path / "index.faiss"
-        self.pkl_path = self.vector_db_path / "index.pkl"
-        
-        self.index: Optional[faiss.Index] = None
-        self.metadata: Dict[int, Dict] = {}  # FAISS ID -> metadata
-        self.id_mapping: Dict[str, int] = {}  # document_key -> FAISS ID
-        self.reverse_mapping: Dict[int, str] = {}  # FAISS ID -> document_key
-        self.embedding_dim: Optional[int] = None
-        self.next_id = 0
-        
-        # Load existing index if available
-        self.load()
-    
-    def initialize_index(self, embedding_dim: int):
+        self.tenants_path = self.vector_db_path / "tenants"
+
+        self.max_loaded_shards = max(1, max_loaded_shards or config.VECTOR_SHARD_CACHE_SIZE)
+        self.shards: "OrderedDict[Tuple[str, str], VectorShard]" = OrderedDict()
+        self.lock = threading.Lock()
+        # Shards being read from disk, set once they are in self.shards (or failed)
+        self.loading: Dict[Tuple[str, str], threading.Event] = {}
+        self.shard_loads = 0
+        self.shard_evictions = 0
+
+        self.compaction_ratio = config.VECTOR_COMPACTION_RATIO
+        self.compaction_pending: Set[Tuple[str, str]] = set()
+        self.compactions = 0
+        self.vectors_compacted = 0
+
+        # One-time split of the old global index.faiss / index.pkl
+        self.migrate_global_index()
+
+    # ==============================
+    #  SHARDS
+    # ==============================
+
+    def _shard_path(self, user_id: str, company_id: str) -> Path:
+        return self.tenants_path / _encode_tenant_part(user_id) / _encode_tenant_part(company_id)
+
+    @contextmanager
+    def _shard(self, user_id: str, company_id: str) -> Iterator[VectorShard]:
         """
-        Initialize a new FAISS index
-        
-        Args:
-            embedding_dim: Dimension of embeddings
+        The tenant's shard, loaded if needed and pinned while in use
+
+        A pinned shard is never evicted, so a write in progress cannot be lost
+        to a second copy loaded from disk by another thread. Loading happens
+        outside self.lock: other tenants are served meanwhile, and callers of
+        the same tenant wait for that one load.
         """
-        self.embedding_dim = embedding_dim
-        # Use IndexFlatL2 for exact nearest neighbor search
-        self.index = faiss.IndexFlatL2(embedding_dim)
-        print(f"✅ Initialized FAISS index with dimension {embedding_dim}")
-    
+        key = (str(user_id), str(company_id))
+        shard = None
+        while shard is None:
+            with self.lock:
+                shard = self.shards.get(key)
+                if shard is not None:
+                    self._pin_locked(key, shard)
+                    break
+                loading = self.loading.get(key)
+                owner = loading is None
+                if owner:
+                    loading = self.loading[key] = threading.Event()
+
+            if not owner:
+                loading.wait()
+                continue  # Loaded (or failed: then this caller tries itself)
+
+            try:
+                shard = VectorShard(self._shard_path(*key))
+                with self.lock:
+                    self.shards[key] = shard
+                    self.shard_loads += 1
+                    self._pin_locked(key, shard)
+            finally:
+                with self.lock:
+                    del self.loading[key]
+                loading.set()
+        try:
+            yield shard
+        finally:
+            with self.lock:
+                shard.pins -= 1
+                # Covers both writes that just added tombstones and shards loaded with them
+                if shard.tombstones and shard.tombstone_ratio >= self.compaction_ratio:
+                    self.compaction_pending.add(key)
+                self._evict_locked()
+
+    def _pin_locked(self, key: Tuple[str, str], shard: VectorShard) -> None:
+        self.shards.move_to_end(key)
+        shard.pins += 1
+        self._evict_locked()
+
+    def _evict_locked(self):
+        # Least recently used first; pinned shards stay (briefly exceeding the cap)
+        for key in list(self.shards):
+            if len(self.shards) <= self.max_loaded_shards:
+                break
+            if self.shards[key].pins == 0:
+                del self.shards[key]
+                self.shard_evictions += 1
+
+    def _tenants(self, user_id: Optional[str] = None, company_id: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(user_id, company_id) of every shard on disk or in memory matching the filters"""
+        tenants = set()
+        if self.tenants_path.exists():
+            user_dirs = (
+                [self.tenants_path / _encode_tenant_part(user_id)] if user_id is not None
+                else [path for path in self.tenants_path.iterdir() if path.is_dir()]
+            )
+            for user_dir in user_dirs:
+                if not user_dir.is_dir():
+                    continue
+                for company_dir in user_dir.iterdir():
+                    if VectorShard.exists_at(company_dir):
+                        tenants.add((unquote(user_dir.name), unquote(company_dir.name)))
+        with self.lock:
+            tenants.update(self.shards)
+        return sorted(
+            (u, c) for u, c in tenants
+            if (user_id is None or u == user_id) and (company_id is None or c == company_id)
+        )
+
+    @staticmethod
+    def _tenant_of(metadata: Dict) -> Tuple[str, str]:
+        user_id, company_id = metadata.get('user_id'), metadata.get('company_id')
+        if not user_id or not company_id:
+            raise ValueError("metadata must include user_id and company_id (vectors are stored per tenant)")
+        return user_id, company_id
+
+    # ==============================
+    #  WRITES
+    # ==============================
+
     def add_document(
         self,
         document_key: str,
@@ -56,43 +175,18 @@ class FAISSService:
         metadata: Dict
     ) -> int:
         """
-        Add a document to the vector database
+        Add a document to its tenant's shard (metadata carries user_id / company_id)
         
         Args:
-            document_key: Unique identifier for the document
+            document_key: Document identifier (unique within the tenant)
             embedding: Document embedding vector
             metadata: Document metadata
             
         Returns:
-            FAISS index ID
+            FAISS index ID within the shard
         """
-        # Initialize index if not exists
-        if self.index is None:
-            self.initialize_index(len(embedding))
-        
-        # Check if document already exists
-        if document_key in self.id_mapping:
-            # Update existing document
-            return self.update_document(document_key, embedding, metadata)
-        
-        # Reshape embedding for FAISS
-        embedding_array = embedding.reshape(1, -1).astype('float32')
-        
-        # Add to FAISS index
-        self.index.add(embedding_array)
-        
-        # Store metadata and mappings
-        faiss_id = self.next_id
-        self.metadata[faiss_id] = metadata
-        self.id_mapping[document_key] = faiss_id
-        self.reverse_mapping[faiss_id] = document_key
-        
-        self.next_id += 1
-        
-        # Save to disk
-        self.save()
-        
-        return faiss_id
+        with self._shard(*self._tenant_of(metadata)) as shard:
+            return shard.add_document(document_key, embedding, metadata)
     
     def update_document(
         self,
@@ -101,50 +195,42 @@ class FAISSService:
         metadata: Dict
     ) -> int:
         """
-        Update an existing document
+        Update an existing document (the old vector is tombstoned, the new one added)
         
         Args:
             document_key: Document identifier
             embedding: New embedding
-            metadata: New metadata
+            metadata: New metadata (carries user_id / company_id)
             
         Returns:
-            FAISS index ID
+            New FAISS index ID within the shard
         """
-        if document_key not in self.id_mapping:
-            raise ValueError(f"Document {document_key} not found")
-        
-        faiss_id = self.id_mapping[document_key]
-        
-        # FAISS doesn't support in-place updates, so we need to rebuild
-        # For now, just update metadata (embedding update requires full rebuild)
-        self.metadata[faiss_id] = metadata
-        self.save()
-        
-        return faiss_id
+        with self._shard(*self._tenant_of(metadata)) as shard:
+            return shard.update_document(document_key, embedding, metadata)
     
-    def delete_document(self, document_key: str):
+    def delete_document(self, document_key: str, user_id: str, company_id: str) -> bool:
         """
-        Delete a document (marks as deleted in metadata)
+        Delete a document (its vector is removed at the next compaction)
         
         Args:
             document_key: Document identifier
+            user_id: Owner user ID
+            company_id: Owner company ID
+
+        Returns:
+            True if the document existed
         """
-        if document_key not in self.id_mapping:
-            return
-        
-        faiss_id = self.id_mapping[document_key]
-        
-        # Mark as deleted in metadata
-        if faiss_id in self.metadata:
-            self.metadata[faiss_id]['deleted'] = True
-        
-        self.save()
-    
+        with self._shard(user_id, company_id) as shard:
+            return shard.delete_document(document_key)
+
+    # ==============================
+    #  SEARCH
+    # ==============================
+
     def search(
         self,
         query_embedding: np.ndarray,
-        top_k: int = 5,
+        top_k: Optional[int] = 5,
         score_threshold: Optional[float] = None,
         user_id: Optional[str] = None,
         company_id: Optional[str] = None
@@ -152,9 +238,12 @@ class FAISSService:
         """
         Search for similar documents with optional user and company filtering
 
+        With both user_id and company_id only that tenant's shard is scanned.
+        Otherwise every matching shard is searched and the results merged.
+
         Args:
             query_embedding: Query embedding vector
-            top_k: Number of results to return
+            top_k: Number of results to return (None = all)
             score_threshold: Optional score threshold (lower is better for L2)
             user_id: Optional user ID to filter results (for multi-tenant isolation)
             company_id: Optional company ID to filter results (for multi-tenant isolation)
@@ -162,54 +251,24 @@ class FAISSService:
         Returns:
             List of (document_key, score, metadata) tuples
         """
-        if self.index is None or self.index.ntotal == 0:
-            return []
-
         # Reshape query for FAISS
         query_array = query_embedding.reshape(1, -1).astype('float32')
 
-        # Search with higher limit if filtering is enabled
-        # (we need more results to account for filtering)
-        search_limit = min(top_k * 3 if (user_id or company_id) else top_k, self.index.ntotal)
-        distances, indices = self.index.search(query_array, search_limit)
+        if user_id is not None and company_id is not None:
+            tenants = [(user_id, company_id)]
+        else:
+            tenants = self._tenants(user_id, company_id)
 
         results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx == -1:  # FAISS returns -1 for empty slots
-                continue
-
-            idx = int(idx)
-
-            # Skip deleted documents
-            if self.metadata.get(idx, {}).get('deleted', False):
-                continue
-
-            # Apply user filter if specified
-            if user_id is not None:
-                doc_user_id = self.metadata.get(idx, {}).get('user_id')
-                if doc_user_id != user_id:
-                    continue
-
-            # Apply company filter if specified
-            if company_id is not None:
-                doc_company_id = self.metadata.get(idx, {}).get('company_id')
-                if doc_company_id != company_id:
-                    continue
-
-            # Apply score threshold if specified
-            if score_threshold is not None and dist > score_threshold:
-                continue
-
-            document_key = self.reverse_mapping.get(idx)
-            if document_key:
-                metadata = self.metadata.get(idx, {})
-                results.append((document_key, float(dist), metadata))
-
-            # Stop if we have enough results
-            if len(results) >= top_k:
-                break
+        for tenant in tenants:
+            with self._shard(*tenant) as shard:
+                results.extend(shard.search(query_array, top_k, score_threshold))
 
-        return results
+        if len(tenants) == 1:
+            return results
+        if top_k is None:
+            return sorted(results, key=lambda result: result[1])
+        return heapq.nsmallest(top_k, results, key=lambda result: result[1])
     
     def search_all(
         self,
@@ -230,83 +289,162 @@ class FAISSService:
         Returns:
             List of (document_key, score, metadata) tuples
         """
-        if self.index is None or self.index.ntotal == 0:
-            return []
-
-        # Search with all documents
         return self.search(
             query_embedding,
-            top_k=self.index.ntotal,
+            top_k=None,
             score_threshold=score_threshold,
             user_id=user_id,
             company_id=company_id
         )
     
-    def get_all_documents(self) -> List[Tuple[str, Dict]]:
+    def get_all_documents(
+        self,
+        user_id: Optional[str] = None,
+        company_id: Optional[str] = None
+    ) -> List[Tuple[str, Dict]]:
         """
-        Get all documents in the database
+        Get all documents, optionally for one user / company only
         
+        Args:
+            user_id: Optional user ID filter
+            company_id: Optional company ID filter
+
         Returns:
             List of (document_key, metadata) tuples
         """
         results = []
-        for faiss_id, metadata in self.metadata.items():
-            if metadata.get('deleted', False):
-                continue
-            
-            document_key = self.reverse_mapping.get(faiss_id)
-            if document_key:
-                results.append((document_key, metadata))
-        
+        for tenant in self._tenants(user_id, company_id):
+            with self._shard(*tenant) as shard:
+                results.extend(shard.get_all_documents())
         return results
-    
-    def save(self):
-        """Save index and metadata to disk"""
-        if self.index is not None:
-            # Save FAISS index
-            faiss.write_index(self.index, str(self.index_path))
-        
-        # Save metadata and mappings using pickle
-        data_to_save = {
-            'metadata': self.metadata,
-            'id_mapping': self.id_mapping,
-            'reverse_mapping': self.reverse_mapping,
-            'next_id': self.next_id,
-            'embedding_dim': self.embedding_dim
-        }
-        
-        with open(self.pkl_path, 'wb') as f:
-            pickle.dump(data_to_save, f)
-    
-    def load(self):
-        """Load index and metadata from disk"""
+
+    # ==============================
+    #  MAINTENANCE
+    # ==============================
+
+    def migrate_global_index(self):
+        """
+        Split the pre-sharding global index into tenant shards (runs once)
+
+        Vectors are read back from the flat index; deleted entries and entries
+        without user_id / company_id (never returned by tenant searches) are
+        dropped. The old files are kept as *.migrated.
+        """
+        index_path = self.vector_db_path / "index.faiss"
+        pkl_path = self.vector_db_path / "index.pkl"
+        if not pkl_path.exists():
+            return
+
         try:
-            # Load FAISS index
-            if self.index_path.exists():
-                self.index = faiss.read_index(str(self.index_path))
-                print(f"✅ Loaded FAISS index with {self.index.ntotal} documents")
-            
-            # Load metadata and mappings
-            if self.pkl_path.exists():
-                with open(self.pkl_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.metadata = data.get('metadata', {})
-                    self.id_mapping = data.get('id_mapping', {})
-                    self.reverse_mapping = data.get('reverse_mapping', {})
-                    self.next_id = data.get('next_id', 0)
-                    self.embedding_dim = data.get('embedding_dim')
-        
+            with open(pkl_path, 'rb') as f:
+                data = pickle.load(f)
+            index = faiss.read_index(str(index_path)) if index_path.exists() else None
         except Exception as e:
-            print(f"⚠️ Error loading FAISS index: {e}")
-            print("Starting with empty index")
-    
-    def get_stats(self) -> Dict:
-        """Get database statistics"""
+            print(f"⚠️ Error reading the global FAISS index for migration: {e}")
+            return
+
+        metadata = data.get('metadata', {})
+        reverse_mapping = data.get('reverse_mapping', {})
+        by_tenant: Dict[Tuple[str, str], List[int]] = {}
+        skipped = 0
+
+        for faiss_id in sorted(reverse_mapping):
+            meta = metadata.get(faiss_id, {})
+            if index is None or faiss_id >= index.ntotal or meta.get('deleted', False):
+                skipped += 1
+                continue
+            try:
+                by_tenant.setdefault(self._tenant_of(meta), []).append(faiss_id)
+            except ValueError:
+                skipped += 1
+
+        for tenant, faiss_ids in by_tenant.items():
+            # Saved while still pinned: an unsaved shard must not be evicted
+            with self._shard(*tenant) as shard:
+                for faiss_id in faiss_ids:
+                    # Old keys were global, so the same key in two tenants now gets two entries
+                    shard.add_document(reverse_mapping[faiss_id], index.reconstruct(int(faiss_id)),
+                                       metadata[faiss_id], persist=False)
+                shard.save()
+        migrated = sum(len(faiss_ids) for faiss_ids in by_tenant.values())
+
+        for path in (index_path, pkl_path):
+            if path.exists():
+                path.rename(path.with_name(path.name + ".migrated"))
+
+        print(f"🔀 Migrated {migrated} vectors from the global FAISS index into {len(by_tenant)} tenant shards"
+              f" ({skipped} deleted or without tenant skipped)")
+
+    def compact(self, force: bool = False) -> Dict[str, int]:
+        """
+        Compact shards whose tombstone ratio reached VECTOR_COMPACTION_RATIO
+
+        Args:
+            force: Compact every shard with any tombstones, loaded or on disk
+
+        Returns:
+            Shards compacted and vectors removed
+        """
+        with self.lock:
+            tenants, self.compaction_pending = self.compaction_pending, set()
+        if force:
+            tenants = set(tenants) | set(self._tenants())
+
+        compacted, removed = 0, 0
+        for tenant in sorted(tenants):
+            with self._shard(*tenant) as shard:
+                if shard.tombstones and (force or shard.tombstone_ratio >= self.compaction_ratio):
+                    removed += shard.compact()
+                    compacted += 1
+        with self.lock:
+            self.compactions += compacted
+            self.vectors_compacted += removed
+        return {'shards': compacted, 'vectors_removed': removed}
+
+    def snapshot(self, max_age: float = 0.0) -> int:
+        """
+        Fold the WAL of loaded shards into fresh snapshots
+
+        Args:
+            max_age: Only shards whose last snapshot is older than this (seconds)
+
+        Returns:
+            Number of snapshots written
+        """
+        with self.lock:
+            loaded = list(self.shards.values())
+        return sum(1 for shard in loaded if shard.snapshot_if_dirty(max_age))
+
+    def get_stats(self, user_id: Optional[str] = None, company_id: Optional[str] = None) -> Dict:
+        """
+        Get database statistics (one tenant's shard when both ids are given)
+
+        The totals only count loaded shards; shards on disk are not loaded for this.
+        """
+        if user_id is not None and company_id is not None:
+            with self._shard(user_id, company_id) as shard:
+                return shard.get_stats()
+
+        tenants = self._tenants(user_id, company_id)
+        with self.lock:
+            loaded = list(self.shards.values())
+        index_bytes = sum(
+            VectorShard.disk_size_of(self._shard_path(*tenant)) for tenant in tenants
+        )
         return {
-            'total_documents': self.index.ntotal if self.index else 0,
-            'active_documents': len([m for m in self.metadata.values() if not m.get('deleted', False)]),
-            'embedding_dimension': self.embedding_dim,
-            'index_size_mb': self.index_path.stat().st_size / (1024 * 1024) if self.index_path.exists() else 0
+            'tenants': len(tenants),
+            'loaded_shards': len(loaded),
+            'max_loaded_shards': self.max_loaded_shards,
+            'shard_loads': self.shard_loads,
+            'shard_evictions': self.shard_evictions,
+            'loaded_documents': sum(shard.size for shard in loaded),
+            'loaded_tombstones': sum(shard.tombstones for shard in loaded),
+            'loaded_wal_records': sum(shard.wal_records for shard in loaded),
+            'compaction_ratio': self.compaction_ratio,
+            'compaction_pending': len(self.compaction_pending),
+            'compactions': self.compactions,
+            'vectors_compacted': self.vectors_compacted,
+            'index_size_mb': index_bytes / (1024 * 1024)
         }
 
 
@@ -320,3 +458,45 @@ def get_faiss_service() -> FAISSService:
     if _faiss_service is None:
         _faiss_service = FAISSService()
     return _faiss_service
+
+
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+async def _maintenance_loop(service: FAISSService, interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # remove_ids and snapshots are passes over a shard's vectors: keep them off the event loop
+            result = await loop.run_in_executor(None, service.compact)
+            if result['shards']:
+                print(f"🧹 Compacted {result['shards']} FAISS shards ({result['vectors_removed']} stale vectors removed)")
+            await loop.run_in_executor(None, service.snapshot, config.VECTOR_SNAPSHOT_INTERVAL)
+        except Exception as e:
+            print(f"⚠️ FAISS maintenance failed: {e}")
+
+
+async def start_vector_maintenance() -> Optional[asyncio.Task]:
+    """Compact and snapshot FAISS shards every VECTOR_COMPACTION_INTERVAL seconds (0 = off)"""
+    global _maintenance_task
+    if _maintenance_task is None and config.VECTOR_COMPACTION_INTERVAL > 0:
+        _maintenance_task = asyncio.create_task(
+            _maintenance_loop(get_faiss_service(), config.VECTOR_COMPACTION_INTERVAL)
+        )
+    return _maintenance_task
+
+
+async def stop_vector_maintenance() -> None:
+    """Stop the background job and snapshot every loaded shard (a shorter WAL replay on next start)"""
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        try:
+            await _maintenance_task
+        except asyncio.CancelledError:
+            pass
+        _maintenance_task = None
+    if _faiss_service is not None:
+        await asyncio.get_running_loop().run_in_executor(None, _faiss_service.snapshot)
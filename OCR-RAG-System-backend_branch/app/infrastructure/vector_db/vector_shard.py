@@ -0,0 +1,513 @@
+"""
+FAISS shard for one tenant (user, company)
+Holds that tenant's vectors, metadata and key mappings in its own directory.
+FAISSService routes every call to the right shard, so a search only scans
+the tenant's own vectors and needs no post-filtering.
+
+Vectors live in an IndexIDMap2 keyed by FAISS ID, so they can really be
+removed. Updates and deletes drop the document's metadata at once and leave
+the old vector as a tombstone (never returned, skipped by search); compact()
+removes all tombstones with one remove_ids pass, which FAISSService runs in
+the background once a shard's tombstone ratio crosses a threshold.
+
+Persistence is a snapshot plus an append-only write-ahead log:
+
+    snapshot.pkl   index (faiss.serialize_index) + metadata + wal_seq, in ONE
+                   file written to a temp file and renamed into place
+    wal.log        adds / deletes since then, each record
+                   [length][crc32][pickle of (seq, op, ...)], fsynced
+
+A write costs one small append instead of rewriting the whole index. A new
+snapshot is taken once the log reaches VECTOR_SNAPSHOT_EVERY records or
+VECTOR_SNAPSHOT_WAL_MB, after compaction, periodically by FAISSService and
+at shutdown. Loading reads the snapshot and replays records newer than its
+wal_seq (a crash between rename and log reset replays nothing twice); a torn
+record at the end of the log is cut off. A shard that cannot be loaded at all
+has its files moved aside as *.corrupt before it starts empty, so the next
+snapshot cannot overwrite data that might still be recovered by hand.
+"""
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+import faiss
+import numpy as np
+from pathlib import Path
+from typing import Any, List, Dict, Tuple, Optional, Set
+
+from app.config.config import config
+
+_WAL_HEADER = struct.Struct("<II")  # payload length, crc32
+
+
+class VectorShard:
+    """One tenant's FAISS index and metadata"""
+
+    def __init__(
+        self,
+        shard_path: Path,
+        snapshot_every: Optional[int] = None,
+        snapshot_wal_bytes: Optional[int] = None,
+        fsync: Optional[bool] = None
+    ):
+        """
+        Load a shard: snapshot + WAL replay (an empty shard if nothing was saved yet)
+
+        Args:
+            shard_path: Directory holding snapshot.pkl and wal.log
+                (created on the first write, not on load)
+            snapshot_every: WAL records that trigger a snapshot (default VECTOR_SNAPSHOT_EVERY)
+            snapshot_wal_bytes: WAL size that triggers a snapshot (default VECTOR_SNAPSHOT_WAL_MB)
+            fsync: fsync every WAL append (default VECTOR_WAL_FSYNC)
+        """
+        self.shard_path = shard_path
+        self.snapshot_path = shard_path / "snapshot.pkl"
+        self.wal_path = shard_path / "wal.log"
+        # Pre-WAL layout, converted on load
+        self.index_path = shard_path / "index.faiss"
+        self.pkl_path = shard_path / "index.pkl"
+
+        self.snapshot_every = snapshot_every or config.VECTOR_SNAPSHOT_EVERY
+        self.snapshot_wal_bytes = snapshot_wal_bytes or int(config.VECTOR_SNAPSHOT_WAL_MB * 1024 * 1024)
+        self.fsync = config.VECTOR_WAL_FSYNC if fsync is None else fsync
+
+        self._reset_state()
+
+        self.lock = threading.Lock()
+        self.pins = 0  # callers currently using the shard (FAISSService won't evict it)
+
+        self.load()
+
+    def _reset_state(self) -> None:
+        """Empty shard: no index, metadata or WAL position"""
+        self.index: Optional[faiss.Index] = None
+        self.metadata: Dict[int, Dict] = {}  # FAISS ID -> metadata
+        self.id_mapping: Dict[str, int] = {}  # document_key -> FAISS ID
+        self.reverse_mapping: Dict[int, str] = {}  # FAISS ID -> document_key
+        self.embedding_dim: Optional[int] = None
+        self.next_id = 0
+        self.tombstone_ids: Set[int] = set()  # vectors of updated / deleted documents, awaiting compaction
+
+        self.wal_seq = 0  # last sequence number written (or replayed)
+        self.wal_records = 0  # records in wal.log since the last snapshot
+        self.wal_bytes = 0
+        self.snapshot_at = time.time()
+
+    @staticmethod
+    def exists_at(shard_path: Path) -> bool:
+        """True if a shard was saved in this directory (either layout)"""
+        return any((shard_path / name).exists() for name in ("snapshot.pkl", "wal.log", "index.pkl"))
+
+    @property
+    def size(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    @property
+    def tombstones(self) -> int:
+        return len(self.tombstone_ids)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return self.tombstones / self.size if self.size else 0.0
+
+    def _new_index(self, embedding_dim: int) -> faiss.Index:
+        self.embedding_dim = embedding_dim
+        # Exact L2 search, addressed by our own FAISS IDs so vectors can be removed
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(embedding_dim))
+
+    # ==============================
+    #  WRITES
+    # ==============================
+
+    def _apply_add(self, document_key: str, vector: np.ndarray, metadata: Dict) -> int:
+        if self.index is None:
+            self.index = self._new_index(vector.shape[-1])
+        if document_key in self.id_mapping:
+            self._apply_delete(document_key)
+
+        faiss_id = self.next_id
+        self.index.add_with_ids(vector.reshape(1, -1), np.array([faiss_id], dtype='int64'))
+        self.metadata[faiss_id] = metadata
+        self.id_mapping[document_key] = faiss_id
+        self.reverse_mapping[faiss_id] = document_key
+        self.next_id += 1
+        return faiss_id
+
+    def _apply_delete(self, document_key: str) -> None:
+        faiss_id = self.id_mapping.pop(document_key)
+        self.metadata.pop(faiss_id, None)
+        self.reverse_mapping.pop(faiss_id, None)
+        self.tombstone_ids.add(faiss_id)
+
+    def add_document(
+        self,
+        document_key: str,
+        embedding: np.ndarray,
+        metadata: Dict,
+        persist: bool = True
+    ) -> int:
+        """
+        Add a document to the shard (replacing it, embedding included, if the key exists)
+
+        Args:
+            document_key: Document identifier (unique within the tenant)
+            embedding: Document embedding vector
+            metadata: Document metadata
+            persist: Log the write (False for bulk loads that call save() once at the end)
+
+        Returns:
+            FAISS index ID
+        """
+        vector = np.ascontiguousarray(embedding, dtype='float32').reshape(-1)
+        with self.lock:
+            if self.embedding_dim is not None and vector.shape[0] != self.embedding_dim:
+                raise ValueError(f"Embedding has {vector.shape[0]} dimensions, shard expects {self.embedding_dim}")
+            if persist:
+                # Logged before it is applied: an acknowledged write survives a crash
+                self._append_wal_locked("add", document_key, vector, metadata)
+            faiss_id = self._apply_add(document_key, vector, metadata)
+            if persist:
+                self._snapshot_if_due_locked()
+            return faiss_id
+
+    def update_document(self, document_key: str, embedding: np.ndarray, metadata: Dict) -> int:
+        """
+        Update an existing document: the new embedding replaces the old one
+
+        Args:
+            document_key: Document identifier
+            embedding: New embedding
+            metadata: New metadata
+
+        Returns:
+            New FAISS index ID
+        """
+        if document_key not in self.id_mapping:
+            raise ValueError(f"Document {document_key} not found")
+        return self.add_document(document_key, embedding, metadata)
+
+    def delete_document(self, document_key: str) -> bool:
+        """
+        Delete a document (its vector is removed at the next compaction)
+
+        Args:
+            document_key: Document identifier
+
+        Returns:
+            True if the document existed
+        """
+        with self.lock:
+            if document_key not in self.id_mapping:
+                return False
+            self._append_wal_locked("delete", document_key)
+            self._apply_delete(document_key)
+            self._snapshot_if_due_locked()
+            return True
+
+    def compact(self) -> int:
+        """
+        Remove every tombstoned vector from the index in one pass (then snapshot)
+
+        Returns:
+            Number of vectors removed
+        """
+        with self.lock:
+            if not self.tombstone_ids or self.index is None:
+                return 0
+            ids = np.array(sorted(self.tombstone_ids), dtype='int64')
+            removed = self.index.remove_ids(faiss.IDSelectorBatch(ids))
+            self.tombstone_ids.clear()
+            self._snapshot_locked()
+            return int(removed)
+
+    # ==============================
+    #  SEARCH
+    # ==============================
+
+    def search(
+        self,
+        query_array: np.ndarray,
+        top_k: Optional[int] = 5,
+        score_threshold: Optional[float] = None
+    ) -> List[Tuple[str, float, Dict]]:
+        """
+        Nearest documents in this shard
+
+        Args:
+            query_array: Query embedding, shape (1, dim), float32
+            top_k: Number of results to return (None = every document)
+            score_threshold: Optional score threshold (lower is better for L2)
+
+        Returns:
+            List of (document_key, score, metadata) tuples, nearest first
+        """
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+
+            wanted = self.index.ntotal if top_k is None else top_k
+            # Every vector here belongs to the tenant; only tombstones can take
+            # a slot, so asking for that many extra keeps the result complete
+            search_limit = min(wanted + self.tombstones, self.index.ntotal)
+            distances, indices = self.index.search(query_array, search_limit)
+
+            results = []
+            for dist, idx in zip(distances[0], indices[0]):
+                if idx == -1:  # FAISS returns -1 for empty slots
+                    continue
+                document_key = self.reverse_mapping.get(int(idx))
+                if document_key is None:  # tombstone
+                    continue
+                # Distances come back sorted: nothing further can pass the threshold
+                if score_threshold is not None and dist > score_threshold:
+                    break
+                results.append((document_key, float(dist), self.metadata.get(int(idx), {})))
+                if len(results) >= wanted:
+                    break
+            return results
+
+    def get_all_documents(self) -> List[Tuple[str, Dict]]:
+        """
+        Get all documents in the shard
+
+        Returns:
+            List of (document_key, metadata) tuples
+        """
+        with self.lock:
+            return [
+                (self.reverse_mapping[faiss_id], metadata)
+                for faiss_id, metadata in self.metadata.items()
+                if faiss_id in self.reverse_mapping
+            ]
+
+    # ==============================
+    #  PERSISTENCE
+    # ==============================
+
+    def _append_wal_locked(self, op: str, *args: Any) -> None:
+        self.wal_seq += 1
+        payload = pickle.dumps((self.wal_seq, op) + args, protocol=pickle.HIGHEST_PROTOCOL)
+        record = _WAL_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        self.shard_path.mkdir(parents=True, exist_ok=True)
+        with open(self.wal_path, 'ab') as f:
+            f.write(record)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.wal_records += 1
+        self.wal_bytes += len(record)
+
+    def _snapshot_if_due_locked(self) -> None:
+        if self.wal_records >= self.snapshot_every or self.wal_bytes >= self.snapshot_wal_bytes:
+            self._snapshot_locked()
+
+    def _snapshot_locked(self) -> None:
+        self.shard_path.mkdir(parents=True, exist_ok=True)
+        data_to_save = {
+            'index': faiss.serialize_index(self.index).tobytes() if self.index is not None else None,
+            'metadata': self.metadata,
+            'id_mapping': self.id_mapping,
+            'reverse_mapping': self.reverse_mapping,
+            'next_id': self.next_id,
+            'embedding_dim': self.embedding_dim,
+            'tombstone_ids': self.tombstone_ids,
+            'wal_seq': self.wal_seq
+        }
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data_to_save, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.shard_path)
+
+        # Everything up to wal_seq is in the snapshot now; a crash before this
+        # truncate is harmless because replay skips those records
+        with open(self.wal_path, 'wb'):
+            pass
+        self.wal_records = 0
+        self.wal_bytes = 0
+        self.snapshot_at = time.time()
+
+    def save(self):
+        """Write a snapshot and reset the WAL"""
+        with self.lock:
+            self._snapshot_locked()
+
+    def snapshot_if_dirty(self, max_age: float = 0.0) -> bool:
+        """
+        Snapshot if the WAL holds records and the last snapshot is older than max_age seconds
+
+        Returns:
+            True if a snapshot was written
+        """
+        with self.lock:
+            if self.wal_records == 0 or time.time() - self.snapshot_at < max_age:
+                return False
+            self._snapshot_locked()
+            return True
+
+    def load(self):
+        """Load the latest snapshot and replay the WAL after it"""
+        try:
+            if self.snapshot_path.exists():
+                with open(self.snapshot_path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('index') is not None:
+                    self.index = faiss.deserialize_index(np.frombuffer(data['index'], dtype='uint8'))
+                self._restore(data)
+                self.wal_seq = data.get('wal_seq', 0)
+            elif self.pkl_path.exists():
+                self._load_legacy()
+
+            self._replay_wal()
+
+        except Exception as e:
+            print(f"⚠️ Error loading FAISS shard {self.shard_path}: {e}")
+            # Half-restored state must not be snapshotted over the files
+            self._reset_state()
+            moved = self._quarantine_files()
+            print(f"Starting with empty shard ({', '.join(moved) or 'nothing'} moved aside)")
+
+    def _quarantine_files(self) -> List[str]:
+        """
+        Rename every persistence file of the shard to *.corrupt
+
+        The WAL goes too: its records only make sense on top of the snapshot.
+
+        Returns:
+            Names of the files moved
+        """
+        moved = []
+        for path in (self.snapshot_path, self.wal_path, self.index_path, self.pkl_path):
+            if not path.exists():
+                continue
+            target = path.with_name(path.name + ".corrupt")
+            if target.exists():
+                # Keep an earlier quarantined copy as well
+                target = path.with_name(f"{path.name}.corrupt.{int(time.time())}")
+            os.replace(path, target)
+            moved.append(target.name)
+        return moved
+
+    def _restore(self, data: Dict) -> None:
+        self.metadata = data.get('metadata', {})
+        self.id_mapping = data.get('id_mapping', {})
+        self.reverse_mapping = data.get('reverse_mapping', {})
+        self.next_id = data.get('next_id', 0)
+        self.embedding_dim = data.get('embedding_dim')
+        self.tombstone_ids = set(data.get('tombstone_ids', ()))
+
+    def _replay_wal(self) -> None:
+        if not self.wal_path.exists():
+            return
+        with open(self.wal_path, 'rb') as f:
+            log = f.read()
+
+        offset, replayed = 0, 0
+        while offset + _WAL_HEADER.size <= len(log):
+            length, crc = _WAL_HEADER.unpack_from(log, offset)
+            payload = log[offset + _WAL_HEADER.size:offset + _WAL_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            record = pickle.loads(payload)
+            seq, op, args = record[0], record[1], record[2:]
+            if seq > self.wal_seq:
+                try:
+                    if op == "add":
+                        self._apply_add(*args)
+                    elif op == "delete" and args[0] in self.id_mapping:
+                        self._apply_delete(args[0])
+                    replayed += 1
+                except Exception as e:
+                    print(f"⚠️ FAISS shard {self.shard_path}: skipping WAL record {seq} ({op}): {e}")
+                self.wal_seq = seq
+            offset += _WAL_HEADER.size + length
+            self.wal_records += 1
+
+        if offset < len(log):
+            # Torn write from a crash mid-append: drop it so new records follow valid ones
+            print(f"⚠️ FAISS shard {self.shard_path}: discarding {len(log) - offset} bytes of incomplete WAL")
+            with open(self.wal_path, 'r+b') as f:
+                f.truncate(offset)
+        self.wal_bytes = offset
+        if replayed:
+            print(f"🔁 Replayed {replayed} WAL records for FAISS shard {self.shard_path}")
+
+    def _load_legacy(self) -> None:
+        """Read the pre-WAL index.faiss / index.pkl pair and convert it to a snapshot"""
+        if self.index_path.exists():
+            self.index = faiss.read_index(str(self.index_path))
+        with open(self.pkl_path, 'rb') as f:
+            self._restore(pickle.load(f))
+        if self.index is not None and not isinstance(self.index, faiss.IndexIDMap2):
+            self._convert_positional_index()
+
+        self._snapshot_locked()
+        for path in (self.index_path, self.pkl_path):
+            path.unlink(missing_ok=True)
+
+    def _convert_positional_index(self):
+        """
+        Move a plain IndexFlatL2 shard (ID = position) to IndexIDMap2
+
+        Entries flagged deleted=True by the old soft delete become tombstones.
+        """
+        flat = self.index
+        self.index = self._new_index(flat.d)
+        if flat.ntotal:
+            self.index.add_with_ids(flat.reconstruct_n(0, flat.ntotal), np.arange(flat.ntotal, dtype='int64'))
+
+        for faiss_id in range(flat.ntotal):
+            document_key = self.reverse_mapping.get(faiss_id)
+            metadata = self.metadata.get(faiss_id, {})
+            if document_key is None or metadata.get('deleted', False) or self.id_mapping.get(document_key) != faiss_id:
+                self.metadata.pop(faiss_id, None)
+                self.reverse_mapping.pop(faiss_id, None)
+                if self.id_mapping.get(document_key) == faiss_id:
+                    del self.id_mapping[document_key]
+                self.tombstone_ids.add(faiss_id)
+        self.next_id = max(self.next_id, flat.ntotal)
+        print(f"🔀 Converted FAISS shard {self.shard_path} to ID-mapped storage ({self.tombstones} tombstones)")
+
+    @staticmethod
+    def disk_size_of(shard_path: Path) -> int:
+        """Bytes a shard directory takes on disk (without loading it)"""
+        if not shard_path.is_dir():
+            return 0
+        return sum(path.stat().st_size for path in shard_path.iterdir() if path.is_file())
+
+    def disk_size(self) -> int:
+        return self.disk_size_of(self.shard_path)
+
+    def get_stats(self) -> Dict:
+        """Get shard statistics"""
+        with self.lock:
+            return {
+                'total_documents': self.size,
+                'active_documents': len(self.id_mapping),
+                'tombstones': self.tombstones,
+                'tombstone_ratio': round(self.tombstone_ratio, 4),
+                'embedding_dimension': self.embedding_dim,
+                'wal_records': self.wal_records,
+                'wal_bytes': self.wal_bytes,
+                'seconds_since_snapshot': round(time.time() - self.snapshot_at, 1),
+                'index_size_mb': self.disk_size() / (1024 * 1024)
+            }
+
+
+def _fsync_dir(path: Path) -> None:
+    """Make a rename durable (no-op where directories can't be opened, e.g. Windows)"""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
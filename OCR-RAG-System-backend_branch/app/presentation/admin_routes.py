@@ -0,0 +1,43 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import PlainTextResponse
+from app.config.config import config
+from app.infrastructure.parser.gemini_rate_limiter import get_all_rate_limiters
+from app.infrastructure.parser.rate_limiter_metrics import CONTENT_TYPE, render_prometheus, render_router_metrics
+from app.infrastructure.firebase.document_repository import peek_document_repository, render_cache_metrics
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Guard admin endpoints with the shared ADMIN_METRICS_TOKEN
+
+    Without a configured token the endpoints are open in development and
+    disabled in production.
+    """
+    expected = config.ADMIN_METRICS_TOKEN
+    if not expected:
+        if config.IS_PRODUCTION:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def rate_limiter_metrics(_: None = Depends(require_admin_token)):
+    """
+    Rate limiter metrics in Prometheus text format
+    Queue depth, bucket levels, cooldowns, call outcomes and queue wait
+    histograms for every limiter registered in this worker process, LLM
+    router provider choices / failovers, plus document cache hit/miss counters
+    """
+    for limiter in get_all_rate_limiters().values():
+        await limiter.refresh()  # Shared limiters read SQLite off the event loop
+    body = render_prometheus() + render_router_metrics()
+    repository = peek_document_repository()
+    if repository is not None:
+        body += render_cache_metrics(repository)
+    return PlainTextResponse(body, media_type=CONTENT_TYPE)
@@ -1,15 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from app.use_cases.rag_service import get_rag_service
 from app.presentation.auth_middleware import get_current_user
+from app.config.config import config
 
 router = APIRouter(prefix="/api", tags=["Chat"])
 
 class ChatRequest(BaseModel):
     query: str
 
+
+async def _cancel_on_disconnect(http_request: Request, task: asyncio.Task, poll_interval: float = 0.5) -> bool:
+    """
+    Cancel the chat task if the client goes away, so its queued LLM call is dropped
+
+    Returns:
+        True if the task was cancelled because the client disconnected
+    """
+    while not task.done():
+        if await http_request.is_disconnected():
+            print("🔌 Chat client disconnected, cancelling queued request")
+            task.cancel()
+            return True
+        await asyncio.sleep(poll_interval)
+    return False
+
+
 @router.post("/chat")
 async def chat(request: ChatRequest, 
+               http_request: Request,
                current_user: dict = Depends(get_current_user)
             ):
     """
@@ -25,7 +45,19 @@ async def chat(request: ChatRequest,
 
         # Get RAG service and perform user + company filtered search
         rag_service = get_rag_service()
-        result = await rag_service.chat_async(request.query, user_id, company_id)
+        task = asyncio.create_task(
+            rag_service.chat_async(request.query, user_id, company_id, timeout=config.CHAT_LLM_TIMEOUT)
+        )
+        watcher = asyncio.create_task(_cancel_on_disconnect(http_request, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if watcher.done() and not watcher.cancelled() and watcher.result():
+                # Nobody is waiting for this response any more
+                return Response(status_code=499)
+            raise  # The request itself is being cancelled (e.g. shutdown)
+        finally:
+            watcher.cancel()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
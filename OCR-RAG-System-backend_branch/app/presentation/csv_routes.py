@@ -3,7 +3,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import Response
 from app.utils.firebase_to_csv import FirebaseToCSV
 from app.utils.excel_templates import ExcelTemplateFactory
-from firebase_admin import db
+from app.infrastructure.firebase.document_repository import get_document_repository
 
 from app.presentation.auth_middleware import get_current_user
 
@@ -15,9 +15,8 @@ def generate_csv(doc_id: str, current_user: dict = Depends(get_current_user)):
     user_id = current_user["userId"]
     company_id = current_user["activeCompany"]
 
-    # Updated path with company structure
-    ref = db.reference(f"users/{user_id}/companies/{company_id}/documents/{doc_id}")
-    data = ref.get()
+    # Updated path with company structure (cached read)
+    data = get_document_repository().get_document(user_id, company_id, doc_id)
 
     if not data:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -29,7 +28,10 @@ def generate_csv(doc_id: str, current_user: dict = Depends(get_current_user)):
         "document_key",
         "user_id",
         "created_at",
-        "document_type"
+        "document_type",
+        "created_at_ms",
+        "sort_created",
+        "sort_type_created"
     ]
 
     # Flatten data and generate CSV with excluded fields
@@ -51,9 +53,8 @@ def generate_excel(doc_id: str, current_user: dict = Depends(get_current_user)):
     user_id = current_user["userId"]
     company_id = current_user["activeCompany"]
 
-    # Get document data from Firebase
-    ref = db.reference(f"users/{user_id}/companies/{company_id}/documents/{doc_id}")
-    data = ref.get()
+    # Get document data from Firebase (cached read)
+    data = get_document_repository().get_document(user_id, company_id, doc_id)
 
     if not data:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -65,7 +66,10 @@ def generate_excel(doc_id: str, current_user: dict = Depends(get_current_user)):
         "document_key",
         "user_id",
         "created_at",
-        "document_type"
+        "document_type",
+        "created_at_ms",
+        "sort_created",
+        "sort_type_created"
     ]
 
     # Create a clean copy of data without excluded fields
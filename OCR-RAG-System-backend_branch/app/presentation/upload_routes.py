@@ -6,7 +6,6 @@ from app.infrastructure.parser.gemini_parser_service import GeminiParserService
 from pathlib import Path
 import os
 from datetime import datetime
-from firebase_admin import db
 from app.use_cases.document_indexer import get_document_indexer
 from app.infrastructure.sheets.google_sheets_service import GoogleSheetsService
 from app.infrastructure.sheets.transaction_categorizer import TransactionCategorizer
@@ -148,17 +147,12 @@ async def process_image(
                     print(f"❌ Failed to decrypt access token for user {uid}")
                     return
                 
-                # Fetch from Firebase user and company-specific path
-                doc_ref = db.reference(f"users/{uid}/companies/{company_id}/documents/{document_key}")
-                firebase_data = doc_ref.get()
-                
-                if firebase_data:
-                    # With async save, data is stored directly (not in nested full_data)
-                    sheets_data = firebase_data.copy()
-                    
-                    # Ensure document_key is present
-                    if "document_key" not in sheets_data:
-                        sheets_data["document_key"] = document_key
+                # Build from what was just saved instead of re-reading the document
+                if full_data:
+                    sheets_data = full_data.copy()
+                    sheets_data["document_key"] = document_key
+                    sheets_data["created_at"] = saved_result.get("created_at")
+                    sheets_data["created_at_ms"] = saved_result.get("created_at_ms")
                     
                     # Remove image_url if present
                     sheets_data.pop("image_url", None)
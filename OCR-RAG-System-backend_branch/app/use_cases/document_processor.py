@@ -86,22 +86,78 @@
 
 
 
+import asyncio
 from pathlib import Path
-from app.utils.key_generator import KeyGenerator
-from app.infrastructure.firebase.firebase_service import FirebaseService
+from typing import Optional
+from app.utils.key_generator import KeyGenerator, document_prefix
+from app.infrastructure.firebase.document_repository import get_document_repository
 from app.infrastructure.parser.gemini_parser_service import GeminiParserService
 from app.infrastructure.ocr.tesseract_service import OCRService
+from app.config.config import config
 
 class DocumentProcessor:
     """Main coordinator: OCR -> Gemini Parser -> Save JSON in Firebase"""
 
-    def __init__(self, ocr: OCRService, parser: GeminiParserService):
+    def __init__(self, ocr: OCRService, parser: GeminiParserService, stream_parse: Optional[bool] = None):
         self.ocr = ocr
         self.parser = parser
         self.key_gen = KeyGenerator()
-        self.firebase = FirebaseService() 
+        self.firebase = get_document_repository()
+        self.stream_parse = config.PARSER_STREAM_MODE if stream_parse is None else stream_parse
 
-    async def process_image_async(self, image_path: str, user_id: str, company_id: str, image_url: str = None) -> dict:
+    def _return_key_when_done(self, key_task: asyncio.Task, user_id: str, company_id: str) -> None:
+        """The document will not be saved under this key: hand its number back once allocated"""
+        def give_back(task: asyncio.Task) -> None:
+            # Not cancelled: a cancelled block reservation could still commit in Firebase
+            if not task.cancelled() and task.exception() is None:
+                self.key_gen.return_key(task.result(), user_id, company_id)
+
+        key_task.add_done_callback(give_back)
+
+    async def _parse_streaming_async(self, ocr_text: str, image_url: str, user_id: str, company_id: str):
+        """
+        Parse via the streaming parser
+
+        Key generation starts as soon as the document_type field is streamed,
+        while the model is still generating. If parsing fails, the key's
+        number is handed back instead of being burned.
+
+        Returns:
+            (parsed_data, key_task) - key_task is None if document_type never arrived
+        """
+        key_task: Optional[asyncio.Task] = None
+        streamed_type = None
+        parsed_data = None
+
+        try:
+            async for event in self.parser.parse_stream_async(ocr_text, image_url, tenant=company_id):
+                if event.kind == "field" and event.key == "document_type" and key_task is None:
+                    streamed_type = str(event.value)
+                    key_task = asyncio.create_task(
+                        self.key_gen.generate_key_async(streamed_type, user_id, company_id)
+                    )
+                elif event.kind == "document":
+                    parsed_data = event.value
+        except BaseException:
+            if key_task is not None:
+                self._return_key_when_done(key_task, user_id, company_id)
+            raise
+
+        final_type = str(parsed_data.get("document_type", "other"))
+        if key_task is not None and document_prefix(final_type) != document_prefix(streamed_type):
+            # The repaired document changed type: the early key has the wrong prefix
+            self._return_key_when_done(key_task, user_id, company_id)
+            key_task = None
+
+        return parsed_data, key_task
+
+    async def process_image_async(
+        self,
+        image_path: str,
+        user_id: str,
+        company_id: str,
+        image_url: str = None,
+    ) -> dict:
         """
         Process image or PDF asynchronously: OCR → Parser → Firebase save
 
@@ -135,8 +191,14 @@ class DocumentProcessor:
 
         # 2. Parse with Gemini asynchronously
         print("🤖 Sending to Gemini for parsing...")
+        key_task = None
         try:
-            parsed_data = await self.parser.parse_async(ocr_text, image_url or image_path)
+            if self.stream_parse:
+                parsed_data, key_task = await self._parse_streaming_async(
+                    ocr_text, image_url or image_path, user_id, company_id
+                )
+            else:
+                parsed_data = await self.parser.parse_async(ocr_text, image_url or image_path, tenant=company_id)
             print("✅ Gemini parsing complete")
         except Exception as e:
             print(f"❌ Gemini parsing failed: {type(e).__name__}: {str(e)}")
@@ -144,13 +206,16 @@ class DocumentProcessor:
             traceback.print_exc()
             raise
 
-        # 3. Generate unique document key
+        # 3. Generate unique document key (already started while streaming)
         try:
-            parsed_data["document_key"] = await self.key_gen.generate_key_async(
-                parsed_data.get("document_type", "other"),
-                user_id,
-                company_id
-            )
+            if key_task is not None:
+                parsed_data["document_key"] = await key_task
+            else:
+                parsed_data["document_key"] = await self.key_gen.generate_key_async(
+                    parsed_data.get("document_type", "other"),
+                    user_id,
+                    company_id
+                )
         except Exception as e:
             print(f"⚠️ Key generation failed, falling back to timestamp key: {e}")
             from datetime import datetime
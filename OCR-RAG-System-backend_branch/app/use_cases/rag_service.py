@@ -12,7 +12,9 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 import os
 import re
-from app.infrastructure.parser.gemini_rate_limiter import get_rate_limiter, APIProvider
+from app.infrastructure.parser.gemini_rate_limiter import get_rate_limiter, APIProvider, DeadlineExceededError
+from app.infrastructure.parser.single_flight import single_flight_key
+from app.infrastructure.mock_llm.client_overrides import MOCK_API_KEY, gemini_client_overrides, is_mock_enabled
 import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
 
@@ -30,7 +32,7 @@ class RAGService:
         self.embedding_service = get_embedding_service()
         self.vector_db = get_faiss_service()
         
-        api_key = os.getenv("GEMINI_API_KEY")
+        api_key = os.getenv("GEMINI_API_KEY") or (MOCK_API_KEY if is_mock_enabled() else None)
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
 
@@ -45,11 +47,12 @@ class RAGService:
         self.llm = ChatGoogleGenerativeAI(
             # model="gemini-3-pro-preview",
             model = "gemini-2.5-flash",
+            google_api_key=api_key,
             temperature=1.0, 
             max_tokens=None,
             timeout=None,
             max_retries=2,
-           
+            **gemini_client_overrides(),
         )
 
         
@@ -111,12 +114,8 @@ class RAGService:
 
         if want_all_docs and is_aggregation:
             # Retrieve ALL documents directly, bypassing vector search
-            all_docs = self.vector_db.get_all_documents()
-            # Filter by user_id AND company_id
-            user_docs = [
-                (key, meta) for key, meta in all_docs
-                if meta.get('user_id') == user_id and meta.get('company_id') == company_id
-            ]
+            # Only this user's and company's shard is read
+            user_docs = self.vector_db.get_all_documents(user_id=user_id, company_id=company_id)
             # Format as (key, score, metadata) with dummy score
             results = [(key, 1.0, meta) for key, meta in user_docs]
             # Sort by date if possible, or just return all
@@ -366,18 +365,27 @@ Answer:"""
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
-    async def generate_response_async(self, messages: List) -> str:
+    async def generate_response_async(self, messages: List, timeout: Optional[float] = None) -> str:
         """
         Generate response using Gemini (async version) - High Priority
+
+        Args:
+            messages: List of messages
+            timeout: Seconds the request may wait for the rate limiter before it is shed
         """
         try:
-            # Use High Priority (0) 
+            # Use High Priority (0). The messages include the retrieved context, so
+            # only users who would get the same answer share a coalesced call
             response = await self.rate_limiter.execute_with_retry(
                 self.llm.ainvoke,
                 messages,
-                priority=0
+                priority=0,
+                timeout=timeout,
+                coalesce_key=single_flight_key(self.llm.model, messages)
             )
             return response.content
+        except DeadlineExceededError:
+            return "The assistant is busy right now. Please try again in a minute."
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
@@ -434,7 +442,7 @@ Answer:"""
             ]
         }
     
-    async def chat_async(self, query: str, user_id: str, company_id: str) -> Dict:
+    async def chat_async(self, query: str, user_id: str, company_id: str, timeout: Optional[float] = None) -> Dict:
         """
         Main entry point for RAG chat (async version) with user and company-specific data isolation
 
@@ -442,6 +450,7 @@ Answer:"""
             query: User query
             user_id: User ID for filtering documents (ensures data isolation)
             company_id: Company ID for filtering documents (ensures multi-tenant isolation)
+            timeout: Seconds the LLM call may wait for the rate limiter before it is shed
 
         Returns:
             Dictionary with response and metadata
@@ -469,7 +478,7 @@ Answer:"""
         messages = self.build_prompt(query, context, is_aggregation)
 
         # Generate response asynchronously
-        response = await self.generate_response_async(messages)
+        response = await self.generate_response_async(messages, timeout)
 
         # Return result
         return {
@@ -0,0 +1,114 @@
+"""
+One-off backfill: created_at_ms and document summaries for existing documents
+Documents saved before ingest wrote created_at_ms only have the Nepal-local
+display string. This walks users/*/companies/*/documents, parses created_at
+once, and writes created_at_ms plus document_summaries/{key} in one
+multi-path update per batch (bumping meta/documents_version so cached
+repositories revalidate). Already migrated documents are skipped, so it is
+safe to re-run. Run from the backend root:
+
+    python -m app.utils.backfill_created_at --dry-run
+    python -m app.utils.backfill_created_at --user <uid> --batch-size 200
+"""
+
+import argparse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.infrastructure.firebase.document_index import build_document_summary
+from app.infrastructure.storage.document_store import get_document_store
+from app.utils.timestamps import parse_created_at
+
+
+def _keys(ref) -> List[str]:
+    """Child keys of a node without downloading its contents"""
+    value = ref.get(shallow=True)
+    return list(value.keys()) if isinstance(value, dict) else []
+
+
+def _chunks(items: List[Tuple[str, dict]], size: int) -> Iterable[List[Tuple[str, dict]]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def backfill_company(db, user_id: str, company_id: str, batch_size: int, dry_run: bool) -> Dict[str, int]:
+    """
+    Backfill one company's documents
+
+    Args:
+        db: Document store (see DOCUMENT_STORE)
+        user_id: Firebase UID of the user
+        company_id: Company identifier
+        batch_size: Documents per multi-path update
+        dry_run: Count only, write nothing
+
+    Returns:
+        Counts: migrated, summaries (summary only, timestamp already present), skipped, unparseable
+    """
+    company_path = f"users/{user_id}/companies/{company_id}"
+    company_ref = db.reference(company_path)
+    documents = db.reference(f"{company_path}/documents").get() or {}
+    summary_keys = set(_keys(db.reference(f"{company_path}/document_summaries")))
+
+    counts = {"migrated": 0, "summaries": 0, "skipped": 0, "unparseable": 0}
+    pending: List[Tuple[str, dict]] = []
+
+    for doc_key, doc in documents.items():
+        if not isinstance(doc, dict):
+            continue
+        created_at_ms: Optional[int] = doc.get("created_at_ms")
+        updates = {}
+        if created_at_ms is None:
+            created_at_ms = parse_created_at(doc.get("created_at"))
+            if created_at_ms is None:
+                counts["unparseable"] += 1
+                continue
+            updates[f"documents/{doc_key}/created_at_ms"] = created_at_ms
+            counts["migrated"] += 1
+        elif doc_key in summary_keys:
+            counts["skipped"] += 1
+            continue
+        else:
+            counts["summaries"] += 1
+
+        updates[f"document_summaries/{doc_key}"] = build_document_summary(
+            {**doc, "created_at_ms": created_at_ms}, doc_key, created_at_ms
+        )
+        pending.append((doc_key, updates))
+
+    if dry_run:
+        return counts
+
+    for batch in _chunks(pending, batch_size):
+        updates = {"meta/documents_version": {".sv": {"increment": 1}}}
+        for _, doc_updates in batch:
+            updates.update(doc_updates)
+        company_ref.update(updates)
+
+    return counts
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--user", help="Only this user ID (default: every user)")
+    arg_parser.add_argument("--batch-size", type=int, default=200, help="Documents per multi-path update")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Report what would change, write nothing")
+    args = arg_parser.parse_args()
+
+    db = get_document_store()
+    user_ids = [args.user] if args.user else _keys(db.reference("users"))
+
+    totals = {"migrated": 0, "summaries": 0, "skipped": 0, "unparseable": 0}
+    for user_id in user_ids:
+        for company_id in _keys(db.reference(f"users/{user_id}/companies")):
+            counts = backfill_company(db, user_id, company_id, args.batch_size, args.dry_run)
+            for key, value in counts.items():
+                totals[key] += value
+            if counts["migrated"] or counts["summaries"] or counts["unparseable"]:
+                print(f"📄 {user_id}/{company_id}: {counts}")
+
+    mode = "Dry run" if args.dry_run else "Backfill complete"
+    print(f"✅ {mode}: {totals}")
+
+
+if __name__ == "__main__":
+    main()
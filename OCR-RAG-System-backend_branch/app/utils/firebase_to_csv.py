@@ -1,5 +1,4 @@
-from app.config.settings import init_firebase
-from firebase_admin import db
+from app.infrastructure.storage.document_store import get_document_store
 from dotenv import load_dotenv
 import csv
 import io
@@ -10,7 +9,7 @@ load_dotenv()
 
 class FirebaseToCSV:
     def __init__(self):
-        self.firebase = init_firebase()
+        self.firebase = get_document_store()
 
     # ----------------------------------------------------------------------
     def flatten_for_csv(self, data: Any, parent_key: str = '', sep: str = '_') -> List[Dict[str, Any]]:
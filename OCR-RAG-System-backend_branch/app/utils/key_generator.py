@@ -63,34 +63,156 @@
 
 # ========================================================================================================================================================
 
+import asyncio
+import heapq
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from app.infrastructure.firebase.firebase_service import FirebaseService
+from app.config.config import config
+
+
+def document_prefix(document_type: str) -> str:
+    """Map a document type to its key prefix"""
+    doc = document_type.lower()
+    if "invoice" in doc:
+        return "INV"
+    elif "receipt" in doc:
+        return "RCT"
+    elif "statement" in doc:
+        return "STM"
+    elif "bill" in doc:
+        return "BIL"
+    return "GEN"
+
+
+_KEY_PATTERN = re.compile(r"^([A-Z]+)(\d+)$")
+
+
+@dataclass
+class _KeyBlock:
+    """Numbers reserved in Firebase and not handed out yet: next..last (inclusive) plus returned ones"""
+    next: int = 1
+    last: int = 0
+    returned: List[int] = field(default_factory=list)  # min-heap, handed out again first
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def exhausted(self) -> bool:
+        return self.next > self.last and not self.returned
+
+
+class KeyBlockAllocator:
+    """
+    Hands out document numbers from blocks reserved in one Firebase transaction
+
+    Each (user, company, prefix) counter is advanced by block_size at a time,
+    so only one in block_size documents pays for a contended transaction.
+    Blocks never overlap, which keeps keys unique across worker processes;
+    the trade-off is that concurrent processes interleave their ranges, so
+    numbers are unique but not strictly in upload order. Unused numbers are
+    handed back on shutdown when no one reserved after us, otherwise skipped.
+    """
+
+    def __init__(self, firebase_service: FirebaseService, block_size: int = 50):
+        self.firebase_service = firebase_service
+        self.block_size = max(1, block_size)
+        self.blocks: Dict[Tuple[str, str, str], _KeyBlock] = {}
+        self.reservations = 0
+        self.allocated = 0
+
+    async def next_number_async(self, user_id: str, company_id: str, prefix: str) -> int:
+        block_id = (user_id, company_id, prefix)
+        block = self.blocks.get(block_id)
+        if block is None:
+            block = self.blocks[block_id] = _KeyBlock()
+
+        async with block.lock:
+            if block.returned:
+                self.allocated += 1
+                return heapq.heappop(block.returned)
+            if block.exhausted():
+                block.next, block.last = await self.firebase_service.reserve_document_numbers_async(
+                    user_id, company_id, prefix, self.block_size
+                )
+                self.reservations += 1
+            number = block.next
+            block.next += 1
+            self.allocated += 1
+            return number
+
+    def return_number(self, user_id: str, company_id: str, prefix: str, number: int) -> None:
+        """Take back a number that was never used for a saved document"""
+        block = self.blocks.get((user_id, company_id, prefix))
+        if block is None or number >= block.next or number in block.returned:
+            return  # Block already handed back (shutdown): the number is skipped
+        self.allocated -= 1
+        if number != block.next - 1:
+            heapq.heappush(block.returned, number)
+            return
+        # Newest number: grow the unused tail so release_async can hand it back
+        block.next = number
+        while block.returned and max(block.returned) == block.next - 1:
+            block.returned.remove(block.next - 1)
+            block.next -= 1
+        heapq.heapify(block.returned)
+
+    async def release_async(self) -> None:
+        """Hand back the unused part of every block (call on shutdown)"""
+        returned = 0
+        for (user_id, company_id, prefix), block in list(self.blocks.items()):
+            async with block.lock:
+                # Returned numbers below the block's range cannot be handed back
+                block.returned.clear()
+                if block.exhausted():
+                    continue
+                try:
+                    if await self.firebase_service.return_document_numbers_async(
+                        user_id, company_id, prefix, block.next, block.last
+                    ):
+                        returned += block.last - block.next + 1
+                except Exception as e:
+                    print(f"⚠️ Could not hand back {prefix} numbers {block.next}-{block.last}: {e}")
+                block.next = block.last + 1
+        self.blocks.clear()
+        if returned:
+            print(f"🔢 Handed back {returned} unused document numbers")
+
+
+_allocator: Optional[KeyBlockAllocator] = None
+
+
+def get_key_allocator() -> KeyBlockAllocator:
+    """Process-wide allocator, shared by every KeyGenerator"""
+    global _allocator
+    if _allocator is None:
+        _allocator = KeyBlockAllocator(FirebaseService(), config.DOCUMENT_KEY_BLOCK_SIZE)
+    return _allocator
+
+
+async def release_key_blocks_async() -> None:
+    """Hand back unused numbers of the process-wide allocator, if one was created"""
+    if _allocator is not None:
+        await _allocator.release_async()
+
 
 class KeyGenerator:
-    """Async Key Generator using Firebase counters"""
+    """Async Key Generator using block-allocated Firebase counters"""
     
     def __init__(self):
-        self.firebase_service = FirebaseService()
+        self.allocator = get_key_allocator()
 
     async def generate_key_async(self, document_type: str, user_id: str, company_id: str) -> str:
-        doc = document_type.lower()
-        
-        # Map document type to prefix
-        if "invoice" in doc:
-            prefix = "INV"
-        elif "receipt" in doc:
-            prefix = "RCT"
-        elif "statement" in doc:
-            prefix = "STM"
-        elif "bill" in doc:
-            prefix = "BIL"
-        else:
-            prefix = "GEN"
-
-        # Get next number from Firebase
-        number = await self.firebase_service.get_next_document_number_async(
-            user_id, company_id, prefix
-        )
+        prefix = document_prefix(document_type)
+
+        # Next number from this process's reserved block (a Firebase transaction
+        # only when the block runs out)
+        number = await self.allocator.next_number_async(user_id, company_id, prefix)
 
         # Return key format: INV1, RCT2, etc.
         return f"{prefix}{number}"
 
+    def return_key(self, key: str, user_id: str, company_id: str) -> None:
+        """Give back a key whose document was never saved, so its number is reused"""
+        match = _KEY_PATTERN.match(key)
+        if match:
+            self.allocator.return_number(user_id, company_id, match.group(1), int(match.group(2)))
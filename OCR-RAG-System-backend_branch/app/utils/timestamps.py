@@ -0,0 +1,56 @@
+"""
+Canonical document timestamps
+Documents carry created_at (Nepal-local display string, kept for the UI)
+and created_at_ms (epoch milliseconds, written at ingest). Consumers filter
+and sort on created_at_ms; parse_created_at is only for nodes written before
+that field existed (and for the backfill that adds it).
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+NEPAL_TZ = ZoneInfo("Asia/Kathmandu")
+DISPLAY_FORMAT = "%d %B %Y at %I:%M:%S %p"
+
+
+def now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def format_display(created_at_ms: int) -> str:
+    """'22 November 2025 at 07:30:40 PM' in Nepal time (the stored created_at format)"""
+    return datetime.fromtimestamp(created_at_ms / 1000, NEPAL_TZ).strftime(DISPLAY_FORMAT)
+
+
+def local_date(created_at_ms: int) -> str:
+    """YYYY-MM-DD of the timestamp in Nepal time"""
+    return datetime.fromtimestamp(created_at_ms / 1000, NEPAL_TZ).strftime("%Y-%m-%d")
+
+
+def parse_created_at(created_at_str: Optional[str]) -> Optional[int]:
+    """
+    Epoch milliseconds from a stored created_at string
+
+    Accepts ISO timestamps (naive = UTC) and the Nepal-local display format
+    "02 December 2025 at 02:11:02 PM". Returns None if it can't be parsed.
+    """
+    if not created_at_str:
+        return None
+    try:
+        if 'Z' in created_at_str:
+            created_dt = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
+        else:
+            try:
+                created_dt = datetime.fromisoformat(created_at_str)
+                if created_dt.tzinfo is None:
+                    created_dt = created_dt.replace(tzinfo=timezone.utc)
+            except ValueError:
+                # Fallback for "02 December 2025 at 02:11:02 PM" format
+                clean_str = created_at_str.replace(' at ', ' ')
+                created_dt = datetime.strptime(clean_str, "%d %B %Y %I:%M:%S %p")
+                created_dt = created_dt.replace(tzinfo=NEPAL_TZ)
+    except (ValueError, AttributeError, TypeError):
+        print(f"⚠️ Could not parse date: {created_at_str}")
+        return None
+    return int(created_dt.timestamp() * 1000)
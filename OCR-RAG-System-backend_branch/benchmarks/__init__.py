@@ -0,0 +1 @@
+# Benchmarks and offline load tests (run from the backend root with python -m benchmarks.<name>)
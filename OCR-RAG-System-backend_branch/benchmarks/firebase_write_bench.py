@@ -0,0 +1,173 @@
+"""
+Firebase round trips per ingested document, before and after write batching
+
+Runs the Firebase side of ingest (key allocation, save, the Sheets sync
+reads) against a local document store (memory or sqlite) wrapped so that
+every call sleeps one simulated round-trip time and is counted. No network
+or credentials needed. Run from the backend root:
+
+    python -m benchmarks.firebase_write_bench --documents 200 --rtt 0.04 --concurrency 8
+    python -m benchmarks.firebase_write_bench --store sqlite --rtt 0
+
+"before" replays the old sequence: a counter transaction per document, a
+separate write per node (document, summary, version stamp), then the sync
+reads the tokens and re-reads the document. "after" goes through the real
+FirebaseService / KeyBlockAllocator: one multi-path update per document,
+amortized counter blocks, and the sync works from the saved payload.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from app.infrastructure.firebase.document_index import build_document_summary
+from app.infrastructure.firebase.firebase_service import FirebaseService
+from app.infrastructure.storage.document_store import DocumentStore, create_document_store
+from app.utils.key_generator import KeyBlockAllocator
+from app.utils.timestamps import format_display, now_ms
+
+
+class LatencyStore(DocumentStore):
+    """Local store stand-in for the RTDB: every call sleeps one round trip and is counted"""
+
+    name = "latency"
+
+    def __init__(self, inner: DocumentStore, rtt: float):
+        self.inner = inner
+        self.rtt = rtt
+        self.round_trips = 0
+        self.lock = threading.Lock()
+
+    def reference(self, path: str = "/") -> "LatencyReference":
+        return LatencyReference(self, self.inner.reference(path))
+
+    def round_trip(self, count: int = 1) -> None:
+        with self.lock:
+            self.round_trips += count
+        time.sleep(self.rtt * count)
+
+
+class LatencyReference:
+    def __init__(self, store: LatencyStore, inner: Any):
+        self.store = store
+        self.inner = inner
+
+    def get(self, shallow: bool = False) -> Any:
+        self.store.round_trip()
+        return self.inner.get(shallow=shallow)
+
+    def set(self, value: Any) -> None:
+        self.store.round_trip()
+        self.inner.set(value)
+
+    def update(self, values: Dict[str, Any]) -> None:
+        self.store.round_trip()
+        self.inner.update(values)
+
+    def delete(self) -> None:
+        self.store.round_trip()
+        self.inner.delete()
+
+    def transaction(self, func: Callable[[Any], Any]) -> Any:
+        # The Admin SDK reads (with an ETag) and then writes conditionally
+        self.store.round_trip(2)
+        return self.inner.transaction(func)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[int(fraction * (len(ordered) - 1))] * 1000, 2)
+
+
+async def in_thread(func: Callable, *args) -> Any:
+    return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+async def ingest_before(rtdb: LatencyStore, index: int, user_id: str, company_id: str) -> None:
+    root = f"users/{user_id}/companies/{company_id}"
+    number = await in_thread(
+        rtdb.reference(f"{root}/counters/RCT").transaction, lambda current: (current or 0) + 1
+    )
+    doc_key = f"RCT{number}"
+    created_at_ms = now_ms()
+    payload = {"document_key": doc_key, "document_type": "receipt", "created_at": format_display(created_at_ms),
+               "created_at_ms": created_at_ms, "total_amount": index}
+    await in_thread(rtdb.reference(f"{root}/documents/{doc_key}").set, payload)
+    await in_thread(rtdb.reference(f"{root}/document_summaries/{doc_key}").set,
+                    build_document_summary(payload, doc_key, created_at_ms))
+    await in_thread(rtdb.reference(root).update, {"meta/documents_version": {".sv": {"increment": 1}}})
+    # sync_to_sheets
+    await in_thread(rtdb.reference(f"{root}/google_tokens").get)
+    await in_thread(rtdb.reference(f"{root}/documents/{doc_key}").get)
+
+
+async def ingest_after(service: FirebaseService, allocator: KeyBlockAllocator, index: int,
+                       user_id: str, company_id: str) -> None:
+    number = await allocator.next_number_async(user_id, company_id, "RCT")
+    doc_key = f"RCT{number}"
+    await service.save_async({"document_key": doc_key, "document_type": "receipt", "total_amount": index},
+                             user_id, company_id)
+    # sync_to_sheets builds its row from the save result; only the tokens are read
+    await service.get_google_tokens_async(user_id, company_id)
+
+
+async def run(mode: str, store: DocumentStore, documents: int, rtt: float, concurrency: int,
+              block_size: int) -> Dict[str, Any]:
+    rtdb = LatencyStore(store, rtt)
+    service = FirebaseService(db=rtdb)
+    allocator = KeyBlockAllocator(service, block_size)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "before":
+                await ingest_before(rtdb, index, "bench-user", "bench-company")
+            else:
+                await ingest_after(service, allocator, index, "bench-user", "bench-company")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(documents)))
+    elapsed = time.perf_counter() - started
+
+    company = store.reference("users/bench-user/companies/bench-company").get()
+    return {
+        "round_trips": rtdb.round_trips,
+        "round_trips_per_document": round(rtdb.round_trips / documents, 3),
+        "latency_ms": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)},
+        "documents_per_second": round(documents / elapsed, 2),
+        "stored_documents": len(company["documents"]),
+        "stored_summaries": len(company["document_summaries"]),
+    }
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--documents", type=int, default=200)
+    arg_parser.add_argument("--rtt", type=float, default=0.04, help="Simulated seconds per round trip")
+    arg_parser.add_argument("--concurrency", type=int, default=8, help="Documents ingested at once")
+    arg_parser.add_argument("--block-size", type=int, default=50, help="Counter block size for 'after'")
+    arg_parser.add_argument("--store", default="memory", choices=["memory", "sqlite"],
+                            help="Local backend behind the simulated latency")
+    args = arg_parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("before", "after"):
+            store = create_document_store(args.store, os.path.join(tmp, f"{mode}.db"))
+            report[mode] = asyncio.run(
+                run(mode, store, args.documents, args.rtt, args.concurrency, args.block_size)
+            )
+            store.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+End-to-end parser throughput against the mock LLM server
+
+Start the mock server first, then run from the backend root:
+    uvicorn app.infrastructure.mock_llm.mock_llm_server:app --port 8090
+    LLM_MOCK_URL=http://127.0.0.1:8090 python -m benchmarks.mock_llm_load --documents 50
+
+Reports parse latency percentiles, throughput and the rate limiter / router
+status after the run. No real Gemini/Groq quota is used.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.config.config import config
+from app.infrastructure.parser.gemini_parser_service import GeminiParserService
+
+SAMPLE_TEXTS = [
+    "STARBUCKS STORE #123\nLatte 2 x 15.00\nMuffin 15.50\nTOTAL 45.50\n2025-11-22",
+    "INVOICE #42\nBill to: John Doe\nProduct A 2 x 500.00\nTotal due 1500.00",
+    "FIRST BANK account statement\nAccount 0012345678\n01/11 Opening balance 1000.00",
+]
+
+
+async def run(documents: int, concurrency: int, model: str) -> None:
+    if not config.LLM_MOCK_URL:
+        raise SystemExit("Set LLM_MOCK_URL to the mock server (refusing to spend real quota)")
+
+    parser = GeminiParserService(model_name=model)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await parser.parse_async(SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)])
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                failures += 1
+                print(f"❌ Document {i} failed: {type(e).__name__}: {e}")
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(documents)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    report = {
+        "documents": documents,
+        "failures": failures,
+        "wall_seconds": round(wall, 2),
+        "docs_per_minute": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+        "latency_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        "router": parser.router.get_status(),
+    }
+    print(json.dumps(report, indent=2, default=str))
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--documents", type=int, default=30)
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    arg_parser.add_argument("--model", default="llama-3.3-70b-versatile")
+    args = arg_parser.parse_args()
+    asyncio.run(run(args.documents, args.concurrency, args.model))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Offline RateLimiter simulator (virtual time, no API calls)
+
+Replays an arrival trace against a RateLimiter on an event loop whose clock
+is virtual: asyncio timers fire instantly in simulated time, so an hour of
+traffic replays in seconds. The "provider" is a fake that takes a fixed
+service time and answers 429 ("try again in Xs") when its real quota
+(requests in a sliding 60s window) is exceeded. Use it to compare preset
+configs, adaptive mode or scheduling changes. Run from the backend root:
+
+    python -m benchmarks.rate_limiter_sim --provider gemini_free --quota-rpm 10 \\
+        --arrival-rate 0.2 --duration 600
+    python -m benchmarks.rate_limiter_sim --trace recorded.jsonl --rpm 12 --burst 2
+
+A trace is JSON lines, one request each (only "t" is required):
+    {"t": 12.5, "priority": 0, "tenant": "companyA", "llm_tokens": 1800,
+     "service_time": 3.0, "timeout": 60}
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import random
+import selectors
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+from app.infrastructure.parser.gemini_rate_limiter import (
+    APIProvider,
+    DeadlineExceededError,
+    RateLimitConfig,
+    RateLimiter,
+)
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Selector that never blocks: waiting for a timer just moves the clock"""
+
+    loop: "VirtualTimeLoop"
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is None:
+            # Nothing scheduled and nothing ready: the simulation would hang forever
+            raise RuntimeError("Simulation stalled: no pending timers or ready callbacks")
+        if timeout > 0:
+            self.loop.now += timeout
+        return super().select(0)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is simulated (starts at 0, jumps to the next timer)"""
+
+    def __init__(self, resolution: float = 1e-6):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.now = 0.0
+        self.resolution = resolution
+
+    def time(self) -> float:
+        return self.now
+
+    def call_later(self, delay, callback, *args, context=None):
+        # Float residue in the buckets yields delays like 1e-16 that vanish when
+        # added to now; on a real clock time moves on anyway, here it would spin
+        if delay > 0:
+            delay = max(delay, self.resolution)
+        return super().call_later(delay, callback, *args, context=context)
+
+
+@dataclass
+class Arrival:
+    t: float
+    priority: int = 10
+    tenant: Optional[str] = None
+    llm_tokens: Optional[float] = None
+    service_time: Optional[float] = None
+    timeout: Optional[float] = None
+
+
+@dataclass
+class Outcome:
+    arrival: Arrival
+    status: str  # ok | shed | failed
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+
+class FakeProvider:
+    """Provider with a real RPM quota over a sliding 60s window"""
+
+    def __init__(self, loop: VirtualTimeLoop, quota_rpm: float, service_time: float):
+        self.loop = loop
+        self.quota_rpm = quota_rpm
+        self.service_time = service_time
+        self.window: Deque[float] = collections.deque()
+        self.calls = 0
+        self.rejections = 0
+
+    async def call(self, service_time: Optional[float]) -> Dict[str, Any]:
+        now = self.loop.time()
+        while self.window and self.window[0] <= now - 60.0:
+            self.window.popleft()
+        self.calls += 1
+        if len(self.window) >= self.quota_rpm:
+            self.rejections += 1
+            retry_after = self.window[0] + 60.0 - now
+            raise Exception(f"429 Resource exhausted. Please try again in {retry_after:.1f}s")
+        self.window.append(now)
+        await asyncio.sleep(self.service_time if service_time is None else service_time)
+        return {"started": now}
+
+
+def synthetic_trace(
+    duration: float,
+    arrival_rate: float,
+    high_priority_share: float,
+    tenants: int,
+    burst_at: Optional[float],
+    burst_size: int,
+) -> List[Arrival]:
+    """Poisson arrivals plus an optional batch upload from one tenant"""
+    arrivals: List[Arrival] = []
+    t = 0.0
+    while arrival_rate > 0:
+        t += random.expovariate(arrival_rate)
+        if t >= duration:
+            break
+        priority = 0 if random.random() < high_priority_share else 10
+        arrivals.append(Arrival(t=t, priority=priority, tenant=f"tenant{random.randrange(tenants)}"))
+    if burst_at is not None:
+        arrivals.extend(Arrival(t=burst_at, priority=10, tenant="batch") for _ in range(burst_size))
+    return sorted(arrivals, key=lambda a: a.t)
+
+
+def load_trace(path: str) -> List[Arrival]:
+    with open(path, "r") as f:
+        arrivals = [Arrival(**json.loads(line)) for line in f if line.strip()]
+    return sorted(arrivals, key=lambda a: a.t)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[int(fraction * (len(ordered) - 1))], 3)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+async def simulate(
+    loop: VirtualTimeLoop,
+    arrivals: List[Arrival],
+    config: RateLimitConfig,
+    provider: APIProvider,
+    quota_rpm: float,
+    service_time: float,
+) -> Dict[str, Any]:
+    limiter = RateLimiter(provider, config, name="simulated", clock=loop.time)
+    if limiter.adaptive is not None:
+        limiter.adaptive.state_path = None  # never touch the real learned-rate file
+    fake = FakeProvider(loop, quota_rpm, service_time)
+    outcomes: List[Outcome] = []
+
+    async def one(arrival: Arrival) -> None:
+        await asyncio.sleep(max(0.0, arrival.t - loop.time()))
+        outcome = Outcome(arrival=arrival, status="ok")
+        outcomes.append(outcome)
+
+        async def call() -> Dict[str, Any]:
+            outcome.started = loop.time()
+            return await fake.call(arrival.service_time)
+
+        try:
+            await limiter.execute_with_retry(
+                call,
+                priority=arrival.priority,
+                llm_tokens=arrival.llm_tokens,
+                tenant=arrival.tenant,
+                timeout=arrival.timeout,
+            )
+        except DeadlineExceededError:
+            outcome.status = "shed"
+        except Exception:
+            outcome.status = "failed"
+        outcome.finished = loop.time()
+
+    await asyncio.gather(*(one(a) for a in arrivals))
+
+    by_priority: Dict[int, List[Outcome]] = collections.defaultdict(list)
+    for outcome in outcomes:
+        by_priority[outcome.arrival.priority].append(outcome)
+
+    makespan = max((o.finished for o in outcomes if o.finished is not None), default=0.0)
+    ok = [o for o in outcomes if o.status == "ok"]
+    return {
+        "requests": len(outcomes),
+        "ok": len(ok),
+        "shed": sum(1 for o in outcomes if o.status == "shed"),
+        "failed": sum(1 for o in outcomes if o.status == "failed"),
+        "simulated_seconds": round(makespan, 3),
+        "throughput_rpm": round(len(ok) / makespan * 60, 3) if makespan else None,
+        "provider_calls": fake.calls,
+        "provider_429s": fake.rejections,
+        "latency_seconds": {
+            f"P{priority}": summarize([o.finished - o.arrival.t for o in group if o.status == "ok"])
+            for priority, group in sorted(by_priority.items())
+        },
+        "limiter": {
+            key: value
+            for key, value in limiter.get_status().items()
+            if key in ("effective_rpm", "concurrency_limit", "adaptive", "shed_requests", "tenants")
+        },
+        "average_wait": round(limiter.stats.wait_sum / limiter.stats.wait_count, 3)
+        if limiter.stats.wait_count else 0.0,
+    }
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--provider", default=APIProvider.GEMINI_FREE.value,
+                            choices=[p.value for p in APIProvider], help="Preset to start from")
+    arg_parser.add_argument("--rpm", type=float, help="Override the preset refill rate (requests/minute)")
+    arg_parser.add_argument("--burst", type=int, help="Override the preset bucket size")
+    arg_parser.add_argument("--max-retries", type=int, help="Override the preset retry count")
+    arg_parser.add_argument("--adaptive", action="store_true", help="Enable AIMD rate learning")
+    arg_parser.add_argument("--quota-rpm", type=float, default=10.0, help="Fake provider's real quota")
+    arg_parser.add_argument("--service-time", type=float, default=2.0, help="Seconds per fake API call")
+    arg_parser.add_argument("--trace", help="JSON lines arrival trace (otherwise synthetic)")
+    arg_parser.add_argument("--duration", type=float, default=600.0, help="Synthetic trace length (s)")
+    arg_parser.add_argument("--arrival-rate", type=float, default=0.15, help="Synthetic arrivals per second")
+    arg_parser.add_argument("--high-priority-share", type=float, default=0.2)
+    arg_parser.add_argument("--tenants", type=int, default=3)
+    arg_parser.add_argument("--burst-at", type=float, help="Add a batch upload at this time (s)")
+    arg_parser.add_argument("--burst-size", type=int, default=50)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    logging.getLogger("app").setLevel(logging.WARNING)
+    random.seed(args.seed)
+
+    provider = APIProvider(args.provider)
+    config = RateLimitConfig.get_preset(provider)
+    if args.rpm is not None:
+        config.refill_rate = args.rpm / 60.0
+    if args.burst is not None:
+        config.max_tokens = args.burst
+    if args.max_retries is not None:
+        config.max_retries = args.max_retries
+    config.adaptive = args.adaptive
+
+    if args.trace:
+        arrivals = load_trace(args.trace)
+    else:
+        arrivals = synthetic_trace(
+            args.duration, args.arrival_rate, args.high_priority_share,
+            args.tenants, args.burst_at, args.burst_size,
+        )
+
+    loop = VirtualTimeLoop()
+    try:
+        report = loop.run_until_complete(
+            simulate(loop, arrivals, config, provider, args.quota_rpm, args.service_time)
+        )
+    finally:
+        loop.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
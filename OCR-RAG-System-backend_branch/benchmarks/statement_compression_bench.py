@@ -0,0 +1,167 @@
+"""
+Bank statement storage: plain RTDB tree vs compressed transactions blob
+
+For statements of several sizes, reports what one document read costs:
+bytes on the wire, RTDB nodes (leaves) materialized, codec CPU time, the
+measured read time from a local SQLite document store (one row per leaf,
+like the RTDB tree) and the estimated read latency at a given link speed.
+Run from the backend root:
+
+    python -m benchmarks.statement_compression_bench --sizes 50,200,500,1000
+    python -m benchmarks.statement_compression_bench --sample exported_statements.json
+
+--sample takes real statements (a JSON object, a list of them, or a
+{key: document} export of users/.../documents); otherwise statements are
+generated with realistic transaction rows.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.infrastructure.firebase.payload_codec import (
+    ZSTD_AVAILABLE,
+    decode_document,
+    encode_document,
+)
+from app.infrastructure.storage.document_store import denormalize, normalize
+from app.infrastructure.storage.sqlite_store import SQLiteDocumentStore
+
+MERCHANTS = ["DARAZ ONLINE", "BHAT-BHATENI SUPERMARKET", "NEA ELECTRICITY", "NTC TOPUP", "ESEWA LOAD",
+             "KHALTI WALLET", "SALARY CREDIT", "ATM WDL KATHMANDU", "FONEPAY QR", "NIC ASIA TRANSFER"]
+
+
+def synthetic_statement(transactions: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    balance = 250000.0
+    rows = []
+    for i in range(transactions):
+        debit = round(rng.uniform(50, 25000), 2) if rng.random() < 0.7 else None
+        credit = None if debit else round(rng.uniform(500, 90000), 2)
+        balance += (credit or 0) - (debit or 0)
+        rows.append({
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "description": f"{rng.choice(MERCHANTS)} REF{rng.randint(10**9, 10**10 - 1)}",
+            "reference": f"TXN{rng.randint(10**7, 10**8 - 1)}",
+            "debit": debit,
+            "credit": credit,
+            "balance": round(balance, 2),
+        })
+    return {
+        "document_type": "bank statement",
+        "account_number": "0123456789012",
+        "account_holder": "Sample Traders Pvt. Ltd.",
+        "bank_name": "Sample Bank Ltd.",
+        "statement_period": "2025-01-01 to 2025-12-31",
+        "total_amount": round(balance, 2),
+        "transactions": rows,
+    }
+
+
+def load_samples(path: str) -> List[Tuple[str, Dict[str, Any]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "transactions" in data:
+        data = [data]
+    if isinstance(data, dict):
+        data = list(data.values())
+    return [
+        (f"sample[{i}] ({len(doc.get('transactions') or [])} tx)", doc)
+        for i, doc in enumerate(data)
+        if isinstance(doc, dict)
+    ]
+
+
+def leaf_count(value: Any) -> int:
+    if isinstance(value, dict):
+        return sum(leaf_count(child) for child in value.values())
+    if isinstance(value, list):
+        return sum(leaf_count(child) for child in value)
+    return 0 if value is None else 1
+
+
+def wire_bytes(document: Dict[str, Any]) -> int:
+    return len(json.dumps(document, separators=(",", ":")).encode("utf-8"))
+
+
+def timed(func, repeat: int) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def measure(label: str, document: Dict[str, Any], codecs: List[str], store: SQLiteDocumentStore,
+            min_bytes: int, rtt_ms: float, mbps: float, repeat: int) -> Dict[str, Any]:
+    def latency(nbytes: int, cpu_ms: float) -> float:
+        return round(rtt_ms + nbytes * 8 / (mbps * 1000) + cpu_ms, 2)
+
+    ref = store.reference(f"bench/{label.replace(' ', '_').replace('/', '_')}")
+    ref.set(document)
+    plain, read_ms = timed(ref.get, repeat)
+    plain_bytes = wire_bytes(document)
+    report = {
+        "plain": {
+            "bytes": plain_bytes,
+            "nodes": leaf_count(document),
+            "sqlite_read_ms": round(read_ms, 3),
+            "estimated_read_ms": latency(plain_bytes, 0.0),
+        }
+    }
+
+    for codec in codecs:
+        stored, encode_ms = timed(lambda: encode_document(document, codec, min_bytes), repeat)
+        ref.set(stored)
+        fetched, read_ms = timed(ref.get, repeat)
+        decoded, decode_ms = timed(lambda: decode_document(fetched), repeat)
+        # The tree drops null leaves, the blob keeps them: compare what callers read
+        assert denormalize(normalize(decoded)) == plain, f"{codec} round trip changed the document"
+        stored_bytes = wire_bytes(stored)
+        report[codec] = {
+            "bytes": stored_bytes,
+            "nodes": leaf_count(stored),
+            "ratio": round(plain_bytes / stored_bytes, 2),
+            "encode_ms": round(encode_ms, 3),
+            "decode_ms": round(decode_ms, 3),
+            "sqlite_read_ms": round(read_ms + decode_ms, 3),
+            "estimated_read_ms": latency(stored_bytes, decode_ms),
+        }
+    return report
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", default="50,200,500,1000", help="Synthetic transaction counts")
+    arg_parser.add_argument("--sample", help="JSON file with real statements (replaces --sizes)")
+    arg_parser.add_argument("--min-bytes", type=int, default=8192, help="DOCUMENT_COMPRESS_MIN_BYTES")
+    arg_parser.add_argument("--rtt-ms", type=float, default=60.0, help="Round trip to the database")
+    arg_parser.add_argument("--mbps", type=float, default=20.0, help="Link speed for the latency estimate")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    if args.sample:
+        documents = load_samples(args.sample)
+    else:
+        documents = [
+            (f"{size} tx", synthetic_statement(size, seed=size))
+            for size in (int(s) for s in args.sizes.split(",") if s.strip())
+        ]
+    codecs = ["gzip"] + (["zstd"] if ZSTD_AVAILABLE else [])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteDocumentStore(os.path.join(tmp, "bench.db"))
+        report = {
+            label: measure(label, document, codecs, store, args.min_bytes, args.rtt_ms, args.mbps, args.repeat)
+            for label, document in documents
+        }
+    if not ZSTD_AVAILABLE:
+        report["note"] = "zstandard not installed: zstd skipped"
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
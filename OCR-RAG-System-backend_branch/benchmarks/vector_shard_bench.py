@@ -0,0 +1,138 @@
+"""
+Tenant search on one global FAISS index vs per-tenant shards
+
+Builds the pre-sharding layout (one global index.faiss / index.pkl) with a
+skewed tenant mix (a few large companies, many small ones) of random
+384-dim vectors, then:
+
+- "before" replays the old search: top_k * 3 nearest from the whole index,
+  then filtered by user / company
+- "after" lets FAISSService migrate the same files into tenant shards and
+  searches through it
+
+and reports result completeness (results returned / results that exist)
+and query latency for small and large tenants. Run from the backend root:
+
+    python -m benchmarks.vector_shard_bench --large 3 --large-docs 5000 --small 200 --small-docs 10
+"""
+
+import argparse
+import json
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from app.infrastructure.vector_db.faiss_service import FAISSService
+
+DIM = 384
+
+
+def build_global_index(path: Path, tenants: List[Tuple[str, str, int]], seed: int) -> None:
+    """Write the old global layout: one flat index, metadata keyed by position"""
+    rng = np.random.default_rng(seed)
+    index = faiss.IndexFlatL2(DIM)
+    metadata, reverse_mapping, id_mapping = {}, {}, {}
+    for user_id, company_id, count in tenants:
+        index.add(rng.standard_normal((count, DIM)).astype("float32"))
+        for n in range(count):
+            faiss_id = len(reverse_mapping)
+            key = f"RCT{n + 1}"
+            metadata[faiss_id] = {"user_id": user_id, "company_id": company_id, "document_key": key}
+            reverse_mapping[faiss_id] = key
+            id_mapping[key] = faiss_id
+    path.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(path / "index.faiss"))
+    with open(path / "index.pkl", "wb") as f:
+        pickle.dump({"metadata": metadata, "id_mapping": id_mapping, "reverse_mapping": reverse_mapping,
+                     "next_id": len(reverse_mapping), "embedding_dim": DIM}, f)
+
+
+def legacy_search(index: faiss.Index, metadata: Dict[int, Dict], query: np.ndarray, top_k: int,
+                  user_id: str, company_id: str) -> int:
+    """The pre-sharding FAISSService.search: over-fetch top_k * 3, then filter"""
+    distances, indices = index.search(query, min(top_k * 3, index.ntotal))
+    found = 0
+    for idx in indices[0]:
+        meta = metadata.get(int(idx), {})
+        if idx != -1 and meta.get("user_id") == user_id and meta.get("company_id") == company_id:
+            found += 1
+            if found >= top_k:
+                break
+    return found
+
+
+def summarize(samples: List[Tuple[int, int, float]]) -> Dict[str, float]:
+    returned = sum(s[0] for s in samples)
+    expected = sum(s[1] for s in samples)
+    latencies = sorted(s[2] for s in samples)
+    return {
+        "completeness": round(returned / expected, 4) if expected else 1.0,
+        "empty_results": sum(1 for s in samples if s[0] == 0 and s[1] > 0),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+    }
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--large", type=int, default=3, help="Large tenants")
+    arg_parser.add_argument("--large-docs", type=int, default=5000)
+    arg_parser.add_argument("--small", type=int, default=200, help="Small tenants")
+    arg_parser.add_argument("--small-docs", type=int, default=10)
+    arg_parser.add_argument("--top-k", type=int, default=5)
+    arg_parser.add_argument("--queries", type=int, default=200, help="Queries per tenant group")
+    arg_parser.add_argument("--cache", type=int, default=64, help="VECTOR_SHARD_CACHE_SIZE")
+    arg_parser.add_argument("--seed", type=int, default=7)
+    args = arg_parser.parse_args()
+
+    tenants = [(f"user{i}", f"bigco{i}", args.large_docs) for i in range(args.large)]
+    tenants += [(f"user{i % 50}", f"smallco{i}", args.small_docs) for i in range(args.small)]
+    groups = {
+        "large_tenants": [t for t in tenants if t[2] == args.large_docs and t[1].startswith("bigco")],
+        "small_tenants": [t for t in tenants if t[1].startswith("smallco")],
+    }
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.standard_normal((args.queries, DIM)).astype("float32")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "vector_db"
+        build_global_index(path, tenants, args.seed)
+
+        index = faiss.read_index(str(path / "index.faiss"))
+        with open(path / "index.pkl", "rb") as f:
+            metadata = pickle.load(f)["metadata"]
+        before = {}
+        for name, group in groups.items():
+            samples = []
+            for n, query in enumerate(queries):
+                user_id, company_id, count = group[n % len(group)]
+                started = time.perf_counter()
+                found = legacy_search(index, metadata, query.reshape(1, -1), args.top_k, user_id, company_id)
+                samples.append((found, min(args.top_k, count), time.perf_counter() - started))
+            before[name] = summarize(samples)
+
+        started = time.perf_counter()
+        service = FAISSService(str(path), max_loaded_shards=args.cache)
+        migration_s = time.perf_counter() - started
+        after = {}
+        for name, group in groups.items():
+            samples = []
+            for n, query in enumerate(queries):
+                user_id, company_id, count = group[n % len(group)]
+                started = time.perf_counter()
+                found = len(service.search(query, top_k=args.top_k, user_id=user_id, company_id=company_id))
+                samples.append((found, min(args.top_k, count), time.perf_counter() - started))
+            after[name] = summarize(samples)
+        after["migration_seconds"] = round(migration_s, 2)
+        after["stats"] = service.get_stats()
+
+    print(json.dumps({"vectors": index.ntotal, "before": before, "after": after}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,21 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
-from app.presentation.upload_routes import router as upload_router
+from app.presentation.upload_routes import router as upload_router, parser_service
 from app.presentation.csv_routes import router as csv_router
 from app.presentation.search_routes import router as search_router
 from app.presentation.chat_routes import router as chat_router
 from app.presentation.sheet_routes import router as sheet_router
+from app.presentation.admin_routes import router as admin_router
 
 
 
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config.config import config
+from app.utils.key_generator import release_key_blocks_async
+from app.infrastructure.firebase.rtdb_rest_client import start_rtdb_rest_client, stop_rtdb_rest_client
+from app.infrastructure.vector_db.faiss_service import start_vector_maintenance, stop_vector_maintenance
 
 config.print_config()
 
@@ -23,6 +27,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # /search-documents pagination
 )
 
 # Include your API routes FIRST (before mounting static files)
@@ -31,6 +36,7 @@ app.include_router(upload_router)
 app.include_router(csv_router)
 app.include_router(search_router)
 app.include_router(chat_router)
+app.include_router(admin_router)
 
 # Mount media folder to serve uploaded images
 app.mount("/media", StaticFiles(directory="media"), name="media")
@@ -38,6 +44,22 @@ app.mount("/media", StaticFiles(directory="media"), name="media")
 # Mount static folder to serve HTML, CSS, JS files (LAST to avoid conflicts)
 app.mount("/static", StaticFiles(directory="static", html=True), name="static")
 
+@app.on_event("startup")
+async def start_firebase_client():
+    # Async RTDB client on the server loop: Firebase calls from routes stop holding threads
+    await start_rtdb_rest_client()
+    # Background FAISS maintenance: compacts vectors left behind by updates and deletes, snapshots the WALs
+    await start_vector_maintenance()
+
+@app.on_event("shutdown")
+async def release_document_numbers():
+    # Queued micro-batches will not be answered: cancel them instead of leaving their tasks behind
+    await parser_service.aclose()
+    # Give unused reserved document numbers back so keys stay dense across restarts
+    await release_key_blocks_async()
+    await stop_rtdb_rest_client()
+    await stop_vector_maintenance()
+
 @app.get("/")
 def home():
     return {"message": "This is a home page", "status": "Server is running!", "timestamp": "2025-12-15"}
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup
+Tests run from the backend root (python -m pytest) so `app` imports resolve
+the same way they do under uvicorn.
+"""
+import os
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
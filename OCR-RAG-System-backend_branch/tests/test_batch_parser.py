@@ -0,0 +1,129 @@
+"""
+ParseBatcher: size- and time-triggered flushes
+"""
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from app.infrastructure.parser.batch_parser import ParseBatcher  # noqa: E402
+
+
+class FakeParser:
+    def __init__(self):
+        self.batches = []
+        self.tenants = []
+        self.singles = []
+
+    async def _invoke_async(self, prompt, context, tenant=None):
+        doc_ids = re.findall(r"=== DOCUMENT (\w+) ===", context)
+        self.batches.append(doc_ids)
+        self.tenants.append(tenant)
+        slots = [{"doc_id": doc_id, "result": {"document_type": "receipt"}} for doc_id in doc_ids]
+        return SimpleNamespace(content=json.dumps(slots))
+
+    async def _parse_single_async(self, text, tenant=None):
+        self.singles.append(text)
+        return {"document_type": "receipt", "text": text}
+
+
+def make_batcher(max_batch_size=2, max_wait=0.3):
+    parser = FakeParser()
+    batcher = ParseBatcher(parser, max_batch_size=max_batch_size, max_wait=max_wait)
+    batcher._build_prompt = lambda: None
+    return batcher, parser
+
+
+def test_full_batch_flushes_at_once_and_cancels_timer():
+    async def scenario():
+        batcher, parser = make_batcher()
+        first = asyncio.create_task(batcher.submit("a"))
+        await asyncio.sleep(0)
+        timer = batcher.flush_tasks[None]
+
+        await asyncio.wait_for(asyncio.gather(first, batcher.submit("b")), timeout=0.2)
+        assert parser.batches == [["d1", "d2"]]
+        await asyncio.sleep(0)
+        assert timer.cancelled()
+        assert batcher.flush_tasks == {}
+        assert batcher.tasks == set()  # Finished batches are dropped from the set
+
+    asyncio.run(scenario())
+
+
+def test_document_after_size_flush_waits_its_own_max_wait():
+    async def scenario():
+        batcher, parser = make_batcher(max_wait=0.3)
+        await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+
+        await asyncio.sleep(0.2)
+        started = time.monotonic()
+        result = await batcher.submit("c")
+        waited = time.monotonic() - started
+        assert waited >= 0.25  # Not flushed early by the timer of the previous batch
+        assert result["text"] == "c"  # Alone in its batch: parsed individually
+        assert parser.singles == ["c"]
+
+    asyncio.run(scenario())
+
+
+def test_batches_never_mix_tenants():
+    async def scenario():
+        batcher, parser = make_batcher(max_batch_size=2, max_wait=0.1)
+        results = await asyncio.gather(
+            batcher.submit("a1", "companyA"),
+            batcher.submit("b1", "companyB"),
+            batcher.submit("a2", "companyA"),
+            batcher.submit("b2", "companyB"),
+        )
+        assert all(result["document_type"] == "receipt" for result in results)
+        assert sorted(zip(parser.tenants, parser.batches)) == [
+            ("companyA", ["d1", "d3"]),
+            ("companyB", ["d2", "d4"]),
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_timer_flushes_only_its_tenant():
+    async def scenario():
+        batcher, parser = make_batcher(max_batch_size=3, max_wait=0.1)
+        early = asyncio.gather(batcher.submit("a1", "companyA"), batcher.submit("a2", "companyA"))
+        await asyncio.sleep(0.05)
+        late = asyncio.create_task(batcher.submit("b1", "companyB"))
+        await early
+        assert parser.tenants == ["companyA"]
+        assert not late.done()  # companyB's document keeps its own max_wait
+        await late
+        assert parser.singles == ["b1"]
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_queued_and_running_batches():
+    async def scenario():
+        batcher, parser = make_batcher(max_batch_size=2, max_wait=10)
+        started = asyncio.Event()
+
+        async def hanging_invoke(prompt, context, tenant=None):
+            started.set()
+            await asyncio.sleep(10)
+
+        parser._invoke_async = hanging_invoke
+        running = asyncio.gather(batcher.submit("a1", "A"), batcher.submit("a2", "A"), return_exceptions=True)
+        queued = asyncio.create_task(batcher.submit("b1", "B"))
+        await started.wait()
+
+        await asyncio.wait_for(batcher.close(), timeout=1)
+        results = await asyncio.wait_for(running, timeout=1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(queued, timeout=1)
+        assert batcher.tasks == set() and batcher.flush_tasks == {} and batcher.pending == {}
+
+    asyncio.run(scenario())
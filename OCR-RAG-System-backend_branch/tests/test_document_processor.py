@@ -0,0 +1,69 @@
+"""
+DocumentProcessor streaming mode: early document keys are not burned on failure
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_google_genai")
+
+from app.infrastructure.parser.document_schema import DocumentParseError  # noqa: E402
+from app.infrastructure.parser.streaming_json import StreamEvent  # noqa: E402
+from app.use_cases.document_processor import DocumentProcessor  # noqa: E402
+from app.utils.key_generator import KeyBlockAllocator, KeyGenerator  # noqa: E402
+from tests.test_key_generator import CounterStore  # noqa: E402
+
+
+class StreamingParser:
+    def __init__(self, events, error=None):
+        self.events = events
+        self.error = error
+
+    async def parse_stream_async(self, text, image_url=None, tenant=None):
+        for event in self.events:
+            yield event
+            await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+
+
+def make_processor(parser):
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    processor.parser = parser
+    processor.key_gen = KeyGenerator.__new__(KeyGenerator)
+    processor.key_gen.allocator = KeyBlockAllocator(CounterStore(), block_size=5)
+    return processor
+
+
+def test_parse_error_returns_the_early_key():
+    parser = StreamingParser(
+        [StreamEvent(kind="field", key="document_type", value="receipt")],
+        error=DocumentParseError("unusable output"),
+    )
+    processor = make_processor(parser)
+
+    async def scenario():
+        with pytest.raises(DocumentParseError):
+            await processor._parse_streaming_async("text", "img", "u", "c")
+        await asyncio.sleep(0.01)  # Let the key task finish and hand its number back
+        return await processor.key_gen.generate_key_async("receipt", "u", "c")
+
+    assert asyncio.run(scenario()) == "RCT1"
+
+
+def test_changed_type_returns_the_early_key():
+    parser = StreamingParser([
+        StreamEvent(kind="field", key="document_type", value="receipt"),
+        StreamEvent(kind="document", value={"document_type": "invoice"}),
+    ])
+    processor = make_processor(parser)
+
+    async def scenario():
+        parsed, key_task = await processor._parse_streaming_async("text", "img", "u", "c")
+        await asyncio.sleep(0.01)
+        return parsed, key_task, await processor.key_gen.generate_key_async("receipt", "u", "c")
+
+    parsed, key_task, next_receipt = asyncio.run(scenario())
+    assert parsed["document_type"] == "invoice"
+    assert key_task is None  # process_image_async generates an INV key instead
+    assert next_receipt == "RCT1"
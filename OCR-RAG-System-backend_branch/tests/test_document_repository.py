@@ -0,0 +1,125 @@
+"""
+DocumentRepository: indexed search paging, legacy fallback and multi-path saves
+"""
+import asyncio
+
+import pytest
+
+from app.infrastructure.firebase import firebase_service as firebase_module
+from app.infrastructure.firebase.document_repository import DocumentRepository
+from app.infrastructure.firebase.firebase_service import FirebaseService
+from app.infrastructure.firebase.write_batch import WriteBatch
+from app.infrastructure.storage.memory_store import MemoryDocumentStore
+
+USER, COMPANY = "u1", "c1"
+SCOPE = f"users/{USER}/companies/{COMPANY}"
+
+
+@pytest.fixture
+def store():
+    return MemoryDocumentStore()
+
+
+@pytest.fixture
+def repository(store):
+    return DocumentRepository(FirebaseService(db=store), ttl=0.0)
+
+
+def save(repository, key, document_type="receipt", batch=None, **fields):
+    data = {"document_key": key, "document_type": document_type, "total_amount": 10, **fields}
+    return asyncio.run(repository.save_async(data, USER, COMPANY, batch=batch))
+
+
+def all_pages(repository, **filters):
+    keys, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = repository.search_documents(USER, COMPANY, cursor=cursor, **filters)
+        keys += [key for key, _ in rows]
+        pages += 1
+        if cursor is None:
+            return keys, pages
+
+
+def test_paging_when_documents_share_a_millisecond(repository, monkeypatch):
+    monkeypatch.setattr(firebase_module, "now_ms", lambda: 1_700_000_000_000)
+    for n in range(7):
+        save(repository, f"RCT{n}")
+
+    keys, pages = all_pages(repository, limit=3)
+    assert sorted(keys) == sorted(f"RCT{n}" for n in range(7))
+    assert len(keys) == 7  # No row repeated or skipped at page boundaries
+    assert pages == 3
+
+
+def test_type_filter_pages_through_type_index(repository, monkeypatch):
+    clock = iter(range(1_700_000_000_000, 1_700_000_000_100))
+    monkeypatch.setattr(firebase_module, "now_ms", lambda: next(clock))
+    for n in range(4):
+        save(repository, f"RCT{n}")
+        save(repository, f"INV{n}", document_type="invoice")
+
+    keys, _ = all_pages(repository, doc_type="invoice", limit=3)
+    assert keys == ["INV3", "INV2", "INV1", "INV0"]  # Newest first
+
+
+def test_document_without_summary_falls_back_to_full_scan(repository, store):
+    save(repository, "RCT1")
+    assert [key for key, _ in repository.search_documents(USER, COMPANY)[0]] == ["RCT1"]
+    assert (USER, COMPANY) in repository.indexed_scopes
+
+    # Another writer stores a document without its summary (and bumps the version)
+    store.reference(f"{SCOPE}").update({
+        "documents/RCT2": {"document_key": "RCT2", "document_type": "receipt", "created_at_ms": 1},
+        "meta/documents_version": {".sv": {"increment": 1}},
+    })
+    keys = [key for key, _ in repository.search_documents(USER, COMPANY)[0]]
+    assert sorted(keys) == ["RCT1", "RCT2"]
+    assert (USER, COMPANY) not in repository.indexed_scopes
+
+
+def test_indexed_check_is_reused_while_version_unchanged(repository, store):
+    save(repository, "RCT1")
+    repository.search_documents(USER, COMPANY)
+    reads = []
+    original = store.reference
+
+    def counting_reference(path="/"):
+        reads.append(path)
+        return original(path)
+
+    store.reference = counting_reference
+    repository._is_indexed(USER, COMPANY)
+    assert reads == [f"{SCOPE}/meta/documents_version"]  # No shallow key listings
+
+
+def test_save_commits_document_summary_and_extra_writes_together(repository, store):
+    batch = repository.firebase_service.batch(USER, COMPANY)
+    batch.set("sheets_queue/RCT1", {"status": "pending"})
+    save(repository, "RCT1", batch=batch)
+
+    scope = store.reference(SCOPE).get()
+    assert scope["documents"]["RCT1"]["document_type"] == "receipt"
+    assert "RCT1" in scope["document_summaries"]
+    assert scope["sheets_queue"]["RCT1"] == {"status": "pending"}
+    assert scope["meta"]["documents_version"] == 1
+    assert batch.commits == 1
+
+
+def test_batch_rejects_overlapping_paths(store):
+    batch = WriteBatch(store, SCOPE)
+    batch.set("documents/RCT1", {"a": 1})
+    with pytest.raises(ValueError):
+        batch.set("documents/RCT1/a", 2)
+    assert batch.commit() == 1
+    assert WriteBatch(store, SCOPE).commit() == 0  # Empty batch: no round trip
+
+
+def test_search_all_follows_every_page(repository, monkeypatch):
+    clock = iter(range(1_700_000_000_000, 1_700_000_000_100))
+    monkeypatch.setattr(firebase_module, "now_ms", lambda: next(clock))
+    for n in range(5):
+        save(repository, f"RCT{n}")
+        save(repository, f"INV{n}", document_type="invoice")
+
+    documents = asyncio.run(repository.search_all_documents_async(USER, COMPANY, page_size=2, doc_type="receipt"))
+    assert [key for key, _ in documents] == [f"RCT{n}" for n in reversed(range(5))]
@@ -0,0 +1,27 @@
+from app.infrastructure.parser.document_schema import to_number, validate_document
+
+
+def test_to_number_currency_prefixes():
+    assert to_number("Rs. 100") == "100"
+    assert to_number("Rs.1,500.50") == "1500.50"
+    assert to_number("$45") == "45"
+    assert to_number("NPR 1,234") == "1234"
+    assert to_number("-12.5") == "-12.5"
+
+
+def test_to_number_passthrough_and_empty():
+    assert to_number(12) == 12
+    assert to_number(None) is None
+    assert to_number("") is None
+    assert to_number("Rs.") is None
+
+
+def test_validate_document_keeps_npr_amounts():
+    document, errors = validate_document({
+        "document_type": "receipt",
+        "total_amount": "Rs.1,500",
+        "items": [{"name": "Tea", "price": "Rs. 45", "quantity": "2"}],
+    })
+    assert errors == []
+    assert document["total_amount"] == 1500
+    assert document["items"][0]["price"] == 45
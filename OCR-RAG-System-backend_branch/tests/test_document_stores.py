@@ -0,0 +1,100 @@
+"""
+Offline document stores: MemoryDocumentStore and SQLiteDocumentStore must agree
+"""
+import pytest
+
+from app.infrastructure.storage.memory_store import MemoryDocumentStore
+from app.infrastructure.storage.sqlite_store import SQLiteDocumentStore
+
+BASE = "users/u1/companies/c1"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryDocumentStore()
+        return
+    sqlite_store = SQLiteDocumentStore(str(tmp_path / "documents.db"))
+    yield sqlite_store
+    sqlite_store.close()
+
+
+def exercise(store):
+    """Every operation the repository uses; returns what each one observed"""
+    root = store.reference(BASE)
+    seen = {}
+
+    root.update({
+        "documents/RCT1": {"document_type": "receipt", "total_amount": 10.5, "items": [{"name": "Tea"}, {"name": "Milk"}]},
+        "documents/INV1": {"document_type": "invoice", "total_amount": 200},
+        "document_summaries/RCT1": {"sort_created": "001|RCT1"},
+        "document_summaries/INV1": {"sort_created": "002|INV1"},
+        "document_summaries/RCT2": {"sort_created": "003|RCT2"},
+        "version": {".sv": {"increment": 1}},
+    })
+    root.update({"version": {".sv": {"increment": 2}}})
+    seen["version"] = root.child("version").get()
+
+    seen["document"] = root.child("documents/RCT1").get()
+    seen["list"] = root.child("documents/RCT1/items").get()
+    seen["list_item"] = root.child("documents/RCT1/items/1/name").get()
+    seen["shallow"] = root.child("documents").get(shallow=True)
+    seen["shallow_leaf"] = root.child("version").get(shallow=True)
+    seen["missing"] = root.child("documents/NOPE").get()
+
+    query = root.child("document_summaries").order_by_child("sort_created")
+    seen["first_two"] = list(query.limit_to_first(2).get())
+    seen["range_last"] = list(
+        root.child("document_summaries").order_by_child("sort_created").start_at("002").end_at("003~").limit_to_last(1).get()
+    )
+
+    seen["transaction"] = root.child("counters/RCT").transaction(lambda current: (current or 0) + 5)
+    seen["transaction_again"] = root.child("counters/RCT").transaction(lambda current: current + 1)
+    seen["aborted"] = root.child("counters/INV").transaction(lambda current: None)
+
+    root.child("documents/INV1").delete()
+    root.update({"document_summaries/INV1": None})
+    seen["after_delete"] = root.child("documents").get(shallow=True)
+    seen["summaries_after_delete"] = sorted(root.child("document_summaries").get())
+
+    root.child("documents/RCT1/items").set(["a", "b", "c"])
+    seen["set_list"] = root.child("documents/RCT1/items").get()
+    return seen
+
+
+def test_store_operations(store):
+    seen = exercise(store)
+    assert seen["version"] == 3
+    assert seen["document"]["items"] == [{"name": "Tea"}, {"name": "Milk"}]
+    assert seen["list_item"] == "Milk"
+    assert seen["shallow"] == {"RCT1": True, "INV1": True}
+    assert seen["shallow_leaf"] == 3
+    assert seen["missing"] is None
+    assert seen["first_two"] == ["RCT1", "INV1"]
+    assert seen["range_last"] == ["RCT2"]
+    assert (seen["transaction"], seen["transaction_again"]) == (5, 6)
+    assert seen["after_delete"] == {"RCT1": True}
+    assert seen["summaries_after_delete"] == ["RCT1", "RCT2"]
+    assert seen["set_list"] == ["a", "b", "c"]
+
+
+def test_backends_agree(tmp_path):
+    sqlite_store = SQLiteDocumentStore(str(tmp_path / "documents.db"))
+    try:
+        assert exercise(sqlite_store) == exercise(MemoryDocumentStore())
+    finally:
+        sqlite_store.close()
+
+
+def test_sqlite_store_persists(tmp_path):
+    path = str(tmp_path / "documents.db")
+    first = SQLiteDocumentStore(path)
+    first.reference(BASE).update({"documents/RCT1": {"total_amount": 1}, "version": {".sv": {"increment": 1}}})
+    first.close()
+
+    second = SQLiteDocumentStore(path)
+    try:
+        assert second.reference(f"{BASE}/documents/RCT1/total_amount").get() == 1
+        assert second.reference(f"{BASE}/version").get() == 1
+    finally:
+        second.close()
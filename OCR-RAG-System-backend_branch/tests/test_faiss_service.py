@@ -0,0 +1,120 @@
+"""
+FAISSService: per-tenant shards, loading and the shard cache
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from app.infrastructure.vector_db import faiss_service as faiss_module
+from app.infrastructure.vector_db.faiss_service import FAISSService
+from app.infrastructure.vector_db.vector_shard import VectorShard
+
+DIM = 4
+
+
+def vec(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(DIM, dtype='float32')
+
+
+def meta(user_id: str, company_id: str, **extra) -> dict:
+    return {"user_id": user_id, "company_id": company_id, **extra}
+
+
+@pytest.fixture
+def service(tmp_path):
+    return FAISSService(vector_db_path=str(tmp_path / "vector_db"), max_loaded_shards=4)
+
+
+def test_slow_shard_load_does_not_block_other_tenants(service, monkeypatch):
+    release = threading.Event()
+    started = threading.Event()
+
+    class SlowShard(VectorShard):
+        def load(self):
+            if self.shard_path.parent.name == "slow":
+                started.set()
+                release.wait(5)
+            super().load()
+
+    monkeypatch.setattr(faiss_module, "VectorShard", SlowShard)
+    seen = []
+
+    def open_slow():
+        with service._shard("slow", "co") as shard:
+            seen.append(shard)
+
+    first = threading.Thread(target=open_slow)
+    second = threading.Thread(target=open_slow)
+    first.start()
+    assert started.wait(5)
+    second.start()
+
+    # Another tenant is served while the slow shard is still being read
+    done = threading.Event()
+
+    def open_fast():
+        service.add_document("INV1", vec(1), meta("fast", "co"))
+        done.set()
+
+    threading.Thread(target=open_fast).start()
+    assert done.wait(2)
+    assert second.is_alive()  # Waiting on the same tenant's load, not loading it twice
+
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert len(seen) == 2 and seen[0] is seen[1]
+    assert service.shard_loads == 2
+    assert service.loading == {}
+
+
+def test_failed_load_lets_the_next_caller_retry(service, monkeypatch):
+    calls = []
+
+    class FlakyShard(VectorShard):
+        def load(self):
+            calls.append(self.shard_path)
+            if len(calls) == 1:
+                raise OSError("disk went away")
+            super().load()
+
+    monkeypatch.setattr(faiss_module, "VectorShard", FlakyShard)
+    with pytest.raises(OSError):
+        with service._shard("u", "c"):
+            pass
+    assert service.loading == {}
+
+    with service._shard("u", "c") as shard:
+        assert shard.pins == 1
+    assert len(calls) == 2
+
+
+def test_update_replaces_the_embedding(service):
+    service.add_document("INV1", vec(1), meta("u", "c", v=1))
+    service.update_document("INV1", vec(2), meta("u", "c", v=2))
+
+    key, score, metadata = service.search(vec(2), top_k=1, user_id="u", company_id="c")[0]
+    assert (key, metadata["v"]) == ("INV1", 2)
+    assert score == pytest.approx(0.0, abs=1e-6)
+    assert len(service.search(vec(1), top_k=5, user_id="u", company_id="c")) == 1  # Old vector not returned
+
+
+def test_background_compaction_after_tombstone_ratio(service):
+    service.compaction_ratio = 0.5
+    for n in range(4):
+        service.add_document(f"INV{n}", vec(n), meta("u", "c"))
+    service.delete_document("INV0", "u", "c")
+    assert service.compaction_pending == set()  # 1 of 4 vectors stale
+
+    service.delete_document("INV1", "u", "c")
+    assert service.compaction_pending == {("u", "c")}
+    stats = service.get_stats("u", "c")
+    assert stats["tombstones"] == 2
+    assert stats["active_documents"] == 2
+
+    assert service.compact() == {"shards": 1, "vectors_removed": 2}
+    stats = service.get_stats("u", "c")
+    assert (stats["total_documents"], stats["tombstones"]) == (2, 0)
+    assert service.get_stats()["vectors_compacted"] == 2
+    assert sorted(key for key, _ in service.get_all_documents("u", "c")) == ["INV2", "INV3"]
@@ -0,0 +1,96 @@
+"""
+KeyBlockAllocator: block reservation, returned numbers and handing blocks back
+"""
+import asyncio
+
+from app.utils.key_generator import KeyBlockAllocator, KeyGenerator
+
+
+class CounterStore:
+    """In-memory counters with the reserve/return contract of FirebaseService"""
+
+    def __init__(self):
+        self.counters = {}
+        self.transactions = 0
+
+    async def reserve_document_numbers_async(self, user_id, company_id, doc_prefix, count):
+        self.transactions += 1
+        key = (user_id, company_id, doc_prefix)
+        last = self.counters.get(key, 0) + count
+        self.counters[key] = last
+        return last - count + 1, last
+
+    async def return_document_numbers_async(self, user_id, company_id, doc_prefix, first_unused, last):
+        self.transactions += 1
+        key = (user_id, company_id, doc_prefix)
+        if self.counters.get(key) == last:
+            self.counters[key] = first_unused - 1
+            return True
+        return False
+
+
+def make_generator(block_size=5):
+    store = CounterStore()
+    generator = KeyGenerator.__new__(KeyGenerator)
+    generator.allocator = KeyBlockAllocator(store, block_size=block_size)
+    return generator, store
+
+
+def test_one_transaction_per_block():
+    generator, store = make_generator(block_size=3)
+
+    async def scenario():
+        return [await generator.generate_key_async("receipt", "u", "c") for _ in range(4)]
+
+    assert asyncio.run(scenario()) == ["RCT1", "RCT2", "RCT3", "RCT4"]
+    assert store.transactions == 2
+
+
+def test_concurrent_keys_are_unique():
+    generator, store = make_generator(block_size=4)
+
+    async def scenario():
+        return await asyncio.gather(*(generator.generate_key_async("invoice", "u", "c") for _ in range(10)))
+
+    keys = asyncio.run(scenario())
+    assert sorted(keys, key=lambda k: int(k[3:])) == [f"INV{n}" for n in range(1, 11)]
+
+
+def test_returned_key_is_reused():
+    generator, _ = make_generator()
+
+    async def scenario():
+        first = await generator.generate_key_async("bill", "u", "c")
+        second = await generator.generate_key_async("bill", "u", "c")
+        generator.return_key(first, "u", "c")  # Not the newest: reused from the returned heap
+        reused = await generator.generate_key_async("bill", "u", "c")
+        generator.return_key(second, "u", "c")  # Newest: the block's unused tail grows
+        return reused, await generator.generate_key_async("bill", "u", "c")
+
+    assert asyncio.run(scenario()) == ("BIL1", "BIL2")
+
+
+def test_release_hands_back_unused_block():
+    generator, store = make_generator(block_size=10)
+
+    async def scenario():
+        await generator.generate_key_async("statement", "u", "c")
+        key = await generator.generate_key_async("statement", "u", "c")
+        generator.return_key(key, "u", "c")
+        await generator.allocator.release_async()
+
+    asyncio.run(scenario())
+    # Only STM1 was used: the counter goes back to 1
+    assert store.counters[("u", "c", "STM")] == 1
+
+
+def test_release_skips_block_when_someone_reserved_after():
+    generator, store = make_generator(block_size=10)
+
+    async def scenario():
+        await generator.generate_key_async("receipt", "u", "c")
+        await store.reserve_document_numbers_async("u", "c", "RCT", 10)  # Another worker
+        await generator.allocator.release_async()
+
+    asyncio.run(scenario())
+    assert store.counters[("u", "c", "RCT")] == 20
@@ -0,0 +1,101 @@
+"""
+LLMRouter: provider ranking, failover and the routing metrics
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.config.config import config as app_config
+from app.infrastructure.parser.gemini_rate_limiter import RateLimitConfig, RateLimiter
+from app.infrastructure.parser.llm_router import LLMRouter, ProviderRoute
+from app.infrastructure.parser.rate_limiter_metrics import render_router_metrics
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "RATE_LIMITER_STATE_PATH", str(tmp_path / "rate_limits.json"))
+
+
+def make_route(name: str) -> ProviderRoute:
+    config = RateLimitConfig(
+        max_tokens=10, refill_rate=100.0, cooldown_after_429=30.0,
+        max_retries=0, initial_backoff=0.01, max_backoff=0.01,
+    )
+    return ProviderRoute(name=name, llm=None, rate_limiter=RateLimiter(config=config, name=name), model_name=f"{name}-model")
+
+
+def test_rank_puts_cooling_provider_last():
+    groq, gemini = make_route("groq"), make_route("gemini")
+    router = LLMRouter([groq, gemini])
+    assert [r.name for r in router._rank()] == ["groq", "gemini"]
+
+    groq.rate_limiter.last_429_time = time.monotonic()
+    assert [r.name for r in router._rank()] == ["gemini", "groq"]
+
+
+def test_snapshot_does_not_bank_refill():
+    route = make_route("groq")
+    limiter = route.rate_limiter
+    limiter.tokens = 0.0
+    limiter.last_refill = time.monotonic() - 0.05
+    snapshot = limiter.snapshot()
+    assert snapshot.available_tokens > 0
+    assert limiter.tokens == 0.0  # Projected only
+    assert not snapshot.in_cooldown
+
+
+def test_failover_on_rate_limit_is_counted_and_exported():
+    groq, gemini = make_route("groq"), make_route("gemini")
+    router = LLMRouter([groq, gemini], timeout=None)
+
+    async def call(route):
+        if route.name == "groq":
+            raise Exception("429 Too Many Requests")
+        return route.name
+
+    assert asyncio.run(router.invoke(call)) == "gemini"
+
+    status = router.get_status()
+    assert status["decisions"] == {"groq": 1, "gemini": 1}
+    assert status["fallbacks"] == {"groq": 0, "gemini": 1}
+    assert status["failovers"] == 1
+    assert status["ranking"][-1] == "groq"  # Cooling down after the 429
+
+    body = render_router_metrics({"processing": router})
+    assert 'llm_router_choices_total{router="processing",provider="groq"} 1.0' in body
+    assert 'llm_router_fallbacks_total{router="processing",provider="gemini"} 1.0' in body
+    assert 'llm_router_exhausted_total{router="processing"} 0.0' in body
+
+
+def test_non_failover_error_is_raised():
+    router = LLMRouter([make_route("groq"), make_route("gemini")], timeout=None)
+
+    async def call(route):
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(router.invoke(call))
+    assert router.get_status()["fallbacks"] == {"groq": 0, "gemini": 0}
+
+
+def test_stream_holds_a_slot_while_streaming():
+    route = make_route("groq")
+    router = LLMRouter([route], timeout=None)
+    seen = []
+
+    async def call(r):
+        for chunk in ("a", "b"):
+            seen.append(r.rate_limiter.in_flight)
+            yield chunk
+
+    async def consume():
+        return [chunk async for chunk in router.stream(call)]
+
+    assert asyncio.run(consume()) == ["a", "b"]
+    assert seen == [1, 1]
+    assert route.rate_limiter.in_flight == 0
+
+
+def test_no_routers_renders_nothing():
+    assert render_router_metrics({}) == ""
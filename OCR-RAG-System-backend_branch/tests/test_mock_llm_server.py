@@ -0,0 +1,86 @@
+"""
+Mock LLM server: canned parser output, streaming and fault injection
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.infrastructure.mock_llm import mock_llm_server
+from app.infrastructure.parser.document_schema import validate_document
+from app.infrastructure.parser.gemini_rate_limiter import RateLimitConfig, RateLimiter
+from app.infrastructure.parser.streaming_json import IncrementalJSONParser
+
+PARSER_PROMPT = "You are a document analysis assistant.\nINVOICE #12 from ABC Company"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(mock_llm_server.settings, "latency", "fixed:0")
+    monkeypatch.setattr(mock_llm_server.settings, "rate_429", 0.0)
+    monkeypatch.setattr(mock_llm_server.settings, "timeout_rate", 0.0)
+    monkeypatch.setattr(mock_llm_server.settings, "rpm", 0)
+    with TestClient(mock_llm_server.app) as test_client:
+        test_client.post("/mock/reset")
+        yield test_client
+
+
+def groq_body(stream=False):
+    return {"model": "mock-llama", "stream": stream, "messages": [{"role": "user", "content": PARSER_PROMPT}]}
+
+
+def test_groq_completion_is_schema_valid(client):
+    response = client.post("/openai/v1/chat/completions", json=groq_body())
+    assert response.status_code == 200
+    body = response.json()
+    document, errors = validate_document(json.loads(body["choices"][0]["message"]["content"]))
+    assert errors == []
+    assert document["document_type"] == "invoice"
+    assert body["usage"]["total_tokens"] > 0
+
+
+def test_groq_stream_feeds_the_incremental_parser(client, monkeypatch):
+    monkeypatch.setattr(mock_llm_server.settings, "stream_chunk_chars", 7)
+    parser = IncrementalJSONParser()
+    events = []
+    with client.stream("POST", "/openai/v1/chat/completions", json=groq_body(stream=True)) as response:
+        for line in response.iter_lines():
+            if not line.startswith("data: ") or line == "data: [DONE]":
+                continue
+            delta = json.loads(line[len("data: "):])["choices"][0]["delta"]
+            events.extend(parser.feed(delta.get("content", "")))
+
+    assert not parser.truncated
+    assert parser.result()["document_type"] == "invoice"
+    assert [e.index for e in events if e.kind == "item"] == [0, 1]
+
+
+def test_rpm_limit_returns_parsable_429(client, monkeypatch):
+    monkeypatch.setattr(mock_llm_server.settings, "rpm", 1)
+    monkeypatch.setattr(mock_llm_server.settings, "retry_after", 7)
+    assert client.post("/openai/v1/chat/completions", json=groq_body()).status_code == 200
+
+    limited = client.post("/openai/v1/chat/completions", json=groq_body())
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "7"
+
+    limiter = RateLimiter(config=RateLimitConfig(
+        max_tokens=1, refill_rate=1.0, cooldown_after_429=1.0,
+        max_retries=0, initial_backoff=0.01, max_backoff=0.01,
+    ))
+    assert limiter._parse_retry_after(limited.json()["error"]["message"]) == pytest.approx(8.0)  # 7 s + buffer
+    assert client.get("/mock/stats").json()["stats"]["rpm_429"] == 1
+
+
+def test_gemini_generate_and_unknown_action(client):
+    body = {"contents": [{"parts": [{"text": PARSER_PROMPT}]}]}
+    response = client.post("/v1beta/models/gemini-mock:generateContent", json=body)
+    assert response.status_code == 200
+    reply = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+    assert json.loads(reply)["document_type"] == "invoice"
+
+    assert client.post("/v1beta/models/gemini-mock:countTokens", json=body).status_code == 404
+
+
+def test_config_rejects_unknown_setting(client):
+    assert client.post("/mock/config", json={"nope": 1}).status_code == 400
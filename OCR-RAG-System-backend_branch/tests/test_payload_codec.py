@@ -0,0 +1,98 @@
+"""
+Compressed storage of large document arrays
+"""
+import asyncio
+
+import pytest
+
+from app.config.config import config as app_config
+from app.infrastructure.firebase import payload_codec
+from app.infrastructure.firebase.document_repository import DocumentRepository
+from app.infrastructure.firebase.firebase_service import FirebaseService
+from app.infrastructure.firebase.payload_codec import decode_document, decode_documents, encode_document
+from app.infrastructure.storage.memory_store import MemoryDocumentStore
+
+
+def statement(rows: int) -> dict:
+    return {
+        "document_type": "bank statement",
+        "account_number": "0012345678",
+        "transactions": [
+            {"date": "2025-11-01", "description": f"Payment {n} – Bhat-Bhateni", "debit": n * 1.5, "credit": 0}
+            for n in range(rows)
+        ],
+        "tags": ["monthly"],
+        "notes": [],
+    }
+
+
+def test_gzip_round_trip():
+    document = statement(200)
+    stored = encode_document(document, "gzip", min_bytes=1024)
+
+    blob = stored["transactions"]
+    assert blob["_codec"] == "gzip"
+    assert blob["count"] == 200
+    assert len(blob["data"]) < blob["raw_bytes"]
+    assert isinstance(document["transactions"], list)  # Input not modified
+    assert decode_document(stored) == document
+    assert decode_documents({"STM1": stored, "STM2": document}) == {"STM1": document, "STM2": document}
+
+
+def test_small_and_empty_arrays_stay_plain():
+    document = statement(200)
+    stored = encode_document(document, "gzip", min_bytes=1024)
+    assert stored["tags"] == ["monthly"]
+    assert stored["notes"] == []
+    assert encode_document(statement(2), "gzip", min_bytes=1024) == statement(2)
+
+
+def test_compression_off_and_old_documents_pass_through():
+    document = statement(200)
+    assert encode_document(document, "off", min_bytes=0) is document
+    assert encode_document(document, None, min_bytes=0) is document
+    # Stored before compression existed: decoded as is
+    assert decode_document(document) is document
+    assert decode_document(None) is None
+    assert decode_documents(None) is None
+
+
+def test_zstd_falls_back_to_gzip_when_missing(monkeypatch):
+    monkeypatch.setattr(payload_codec, "ZSTD_AVAILABLE", False)
+    assert payload_codec.resolve_codec("zstd") == "gzip"
+
+    stored = encode_document(statement(200), "zstd", min_bytes=1024)
+    assert stored["transactions"]["_codec"] == "gzip"
+    assert decode_document(stored) == statement(200)
+
+
+def test_reading_zstd_without_zstandard_raises(monkeypatch):
+    monkeypatch.setattr(payload_codec, "ZSTD_AVAILABLE", False)
+    stored = {
+        "document_type": "bank statement",
+        "transactions": {"_codec": "zstd", "count": 1, "raw_bytes": 10, "data": "KLUv/QBYSQAAW10="},
+    }
+    with pytest.raises(RuntimeError, match="zstandard"):
+        decode_document(stored)
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    stored = encode_document(statement(200), "zstd", min_bytes=1024)
+    assert stored["transactions"]["_codec"] == "zstd"
+    assert decode_document(stored) == statement(200)
+
+
+def test_saved_document_is_compressed_and_read_back_plain(monkeypatch):
+    monkeypatch.setattr(app_config, "DOCUMENT_COMPRESSION", "gzip")
+    monkeypatch.setattr(app_config, "DOCUMENT_COMPRESS_MIN_BYTES", 1024)
+    store = MemoryDocumentStore()
+    repository = DocumentRepository(FirebaseService(db=store), ttl=0.0)
+
+    document = {"document_key": "STM1", **statement(200)}
+    asyncio.run(repository.save_async(document, "u1", "c1"))
+
+    raw = store.reference("users/u1/companies/c1/documents/STM1").get()
+    assert raw["transactions"]["_codec"] == "gzip"
+    assert raw["tags"] == ["monthly"]
+    assert repository.get_document("u1", "c1", "STM1")["transactions"] == document["transactions"]
@@ -0,0 +1,53 @@
+"""
+Prometheus exposition of the rate limiters
+"""
+import pytest
+
+from app.config.config import config as app_config
+from app.infrastructure.parser.gemini_rate_limiter import RateLimitConfig, RateLimiter
+from app.infrastructure.parser.rate_limiter_metrics import render_prometheus
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "RATE_LIMITER_STATE_PATH", str(tmp_path / "rate_limits.json"))
+
+
+def make_limiter() -> RateLimiter:
+    config = RateLimitConfig(
+        max_tokens=10, refill_rate=1.0, cooldown_after_429=1.0,
+        max_retries=0, initial_backoff=0.01, max_backoff=0.01,
+    )
+    limiter = RateLimiter(config=config, name="test")
+    for n in range(5):
+        for _ in range(n + 1):  # company4 is the busiest
+            limiter.stats.record_tenant_wait(f"company{n}", 0.5 * n)
+    return limiter
+
+
+def tenant_lines(body: str, metric: str):
+    return [line for line in body.splitlines() if line.startswith(metric + "{")]
+
+
+def test_tenant_series_capped_to_top_n_plus_other():
+    body = render_prometheus({"test": make_limiter()}, top_tenants=2)
+    lines = tenant_lines(body, "rate_limiter_tenant_requests_total")
+    assert len(lines) == 3
+    assert any('tenant="company4"' in line and line.endswith(" 5.0") for line in lines)
+    assert any('tenant="company3"' in line and line.endswith(" 4.0") for line in lines)
+    # company0..2: 1 + 2 + 3 requests, longest wait 1.0 s
+    assert any('tenant="other"' in line and line.endswith(" 6.0") for line in lines)
+    other_max = [line for line in tenant_lines(body, "rate_limiter_tenant_wait_seconds_max") if 'tenant="other"' in line]
+    assert other_max[0].endswith(" 1.0")
+
+
+def test_tenant_series_default_from_config(monkeypatch):
+    monkeypatch.setattr(app_config, "RATE_LIMITER_METRICS_TOP_TENANTS", 0)
+    body = render_prometheus({"test": make_limiter()})
+    assert "tenant=" not in body
+    assert "rate_limiter_wait_seconds_count" in body  # Limiter-wide histogram still covers every tenant
+
+    monkeypatch.setattr(app_config, "RATE_LIMITER_METRICS_TOP_TENANTS", 10)
+    body = render_prometheus({"test": make_limiter()})
+    assert len(tenant_lines(body, "rate_limiter_tenant_requests_total")) == 5
+    assert 'tenant="other"' not in body
@@ -0,0 +1,234 @@
+"""
+RTDBRestClient against an in-memory RTDB REST endpoint (httpx.MockTransport)
+"""
+import asyncio
+import hashlib
+import json
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+import httpx
+import pytest
+
+from app.infrastructure.firebase.rtdb_rest_client import RTDBRestClient, RTDBRestError
+from app.infrastructure.storage.document_store import order_children, split_path
+
+DATABASE_URL = "https://test-db.firebaseio.com"
+
+
+class FakeRTDB:
+    """Enough of the REST API for the client: shallow reads, queries, PATCH, ETags"""
+
+    def __init__(self, data=None):
+        self.data = data or {}
+        self.requests = []
+        self.before_put = None  # hook to simulate a concurrent writer
+
+    def _parts(self, request: httpx.Request):
+        path = request.url.path[:-len(".json")]
+        return [unquote(part) for part in split_path(path)]
+
+    def read(self, parts):
+        node = self.data
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def write(self, parts, value):
+        node = self.data
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+    @staticmethod
+    def etag(value):
+        return hashlib.md5(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        parts = self._parts(request)
+        params = request.url.params
+
+        if request.headers.get("authorization") == "Bearer expired":
+            return httpx.Response(401, json={"error": "Auth token is expired"})
+        if parts[:1] == ["locked"]:
+            return httpx.Response(403, json={"error": "Permission denied"})
+
+        if request.method == "GET":
+            value = self.read(parts)
+            if params.get("shallow") == "true" and isinstance(value, dict):
+                value = {key: True for key in value}
+            if "orderBy" in params:
+                rows = order_children(
+                    value, split_path(json.loads(params["orderBy"])),
+                    json.loads(params["startAt"]) if "startAt" in params else None,
+                    json.loads(params["endAt"]) if "endAt" in params else None,
+                    int(params["limitToFirst"]) if "limitToFirst" in params else None,
+                    int(params["limitToLast"]) if "limitToLast" in params else None,
+                )
+                # A JSON object carries no order: hand the rows back reversed
+                value = dict(sorted(rows.items(), reverse=True))
+            headers = {"ETag": self.etag(value)} if request.headers.get("x-firebase-etag") else {}
+            return httpx.Response(200, json=value, headers=headers)
+
+        body = json.loads(request.content) if request.content else None
+        if request.method == "PUT":
+            if self.before_put is not None:
+                self.before_put()
+            if_match = request.headers.get("if-match")
+            current = self.read(parts)
+            if if_match is not None and if_match != self.etag(current):
+                return httpx.Response(412, json=current, headers={"ETag": self.etag(current)})
+            self.write(parts, body)
+            return httpx.Response(204 if params.get("print") == "silent" else 200, json=body)
+        if request.method == "PATCH":
+            for child, value in body.items():
+                self.write(parts + split_path(child), value)
+            return httpx.Response(204)
+        if request.method == "DELETE":
+            self.write(parts, None)
+            return httpx.Response(204)
+        return httpx.Response(405, json={"error": "Method not allowed"})
+
+
+def run(fake: FakeRTDB, scenario, credentials=None):
+    async def main():
+        client = RTDBRestClient(DATABASE_URL, credentials=credentials, transport=httpx.MockTransport(fake.handle))
+        try:
+            return await scenario(client)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def test_get_and_shallow_get():
+    fake = FakeRTDB({"users": {"u1": {"companies": {"c 1": {"documents": {"RCT1": {"total": 5}, "RCT2": {}}}}}}})
+
+    async def scenario(client):
+        document = await client.get("users/u1/companies/c 1/documents/RCT1")
+        keys = await client.get("users/u1/companies/c 1/documents", shallow=True)
+        missing = await client.get("users/u2")
+        return document, keys, missing
+
+    document, keys, missing = run(fake, scenario)
+    assert document == {"total": 5}
+    assert keys == {"RCT1": True, "RCT2": True}
+    assert missing is None
+    assert fake.requests[0].url.raw_path == b"/users/u1/companies/c%201/documents/RCT1.json"
+
+
+def test_query_restores_order():
+    summaries = {f"K{n}": {"sort_created": f"{n:03d}|K{n}"} for n in range(6)}
+    fake = FakeRTDB({"summaries": summaries})
+
+    async def scenario(client):
+        return await client.query("summaries", "sort_created", start_at="001", end_at="004~", limit_to_last=3)
+
+    rows = run(fake, scenario)
+    assert list(rows) == ["K2", "K3", "K4"]
+    params = fake.requests[0].url.params
+    assert params["orderBy"] == '"sort_created"'
+    assert params["limitToLast"] == "3"
+
+
+def test_update_set_and_delete():
+    fake = FakeRTDB({"scope": {"documents": {"OLD": {"x": 1}}}})
+
+    async def scenario(client):
+        await client.update("scope", {"documents/NEW": {"x": 2}, "version": 7, "documents/OLD": None})
+        await client.set("scope/meta", {"ok": True})
+        await client.delete("scope/version")
+        return await client.get("scope")
+
+    assert run(fake, scenario) == {"documents": {"NEW": {"x": 2}}, "meta": {"ok": True}}
+    patch = fake.requests[0]
+    assert patch.method == "PATCH" and patch.url.params["print"] == "silent"
+
+
+def test_transaction_retries_after_412():
+    fake = FakeRTDB({"counters": {"RCT": 1}})
+    seen = []
+
+    def concurrent_writer():
+        fake.before_put = None
+        fake.data["counters"]["RCT"] = 5  # Another process wins the first round
+
+    fake.before_put = concurrent_writer
+
+    def increment(current):
+        seen.append(current)
+        return (current or 0) + 1
+
+    async def scenario(client):
+        return await client.transaction("counters/RCT", increment)
+
+    assert run(fake, scenario) == 6
+    assert seen == [1, 5]  # Retried with the value carried by the 412
+    assert fake.data["counters"]["RCT"] == 6
+    assert [r.method for r in fake.requests] == ["GET", "PUT", "PUT"]
+
+
+def test_transaction_gives_up_after_max_retries():
+    fake = FakeRTDB({"counters": {"RCT": 0}})
+
+    def always_conflict():
+        fake.data["counters"]["RCT"] += 10
+
+    fake.before_put = always_conflict
+
+    async def scenario(client):
+        return await client.transaction("counters/RCT", lambda current: current + 1, max_retries=3)
+
+    with pytest.raises(RTDBRestError) as error:
+        run(fake, scenario)
+    assert error.value.status_code == 412
+
+
+def test_error_response_raises_with_server_message():
+    fake = FakeRTDB()
+
+    async def scenario(client):
+        await client.get("locked/data")
+
+    with pytest.raises(RTDBRestError) as error:
+        run(fake, scenario)
+    assert error.value.status_code == 403
+    assert "Permission denied" in str(error.value)
+
+
+def test_valid_token_is_sent_without_refresh():
+    fake = FakeRTDB({"a": 1})
+    credentials = SimpleNamespace(valid=True, token="good")
+
+    async def scenario(client):
+        return await client.get("a")
+
+    assert run(fake, scenario, credentials) == 1
+    assert fake.requests[0].headers["authorization"] == "Bearer good"
+
+
+def test_expired_token_is_refreshed_once():
+    pytest.importorskip("google.auth")
+    fake = FakeRTDB({"a": 1})
+
+    class Credentials:
+        valid, token, refreshes = False, "expired", 0
+
+        def refresh(self, request):
+            self.refreshes += 1
+            self.valid, self.token = True, "fresh"
+
+    credentials = Credentials()
+
+    async def scenario(client):
+        return await asyncio.gather(*(client.get("a") for _ in range(5)))
+
+    assert run(fake, scenario, credentials) == [1] * 5
+    assert credentials.refreshes == 1
+    assert {r.headers["authorization"] for r in fake.requests} == {"Bearer fresh"}
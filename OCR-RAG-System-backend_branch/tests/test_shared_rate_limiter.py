@@ -0,0 +1,135 @@
+"""
+SharedRateLimiter: one SQLite bucket across processes, no blocking I/O on the loop
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.config.config import config as app_config
+from app.infrastructure.parser.gemini_rate_limiter import DeadlineExceededError, RateLimitConfig
+from app.infrastructure.parser.shared_rate_limiter import WAITER_ORDER, SharedRateLimiter
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "RATE_LIMITER_STATE_PATH", str(tmp_path / "rate_limits.json"))
+    monkeypatch.setattr(app_config, "RATE_LIMITER_TENANT_WEIGHTS", {})
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "rate_limiter.db")
+
+
+def make_limiter(db_path, max_tokens=2, refill_rate=0.01, max_tpm=None) -> SharedRateLimiter:
+    config = RateLimitConfig(
+        max_tokens=max_tokens, refill_rate=refill_rate, cooldown_after_429=1.0,
+        max_retries=0, initial_backoff=0.01, max_backoff=0.01, max_tpm=max_tpm,
+    )
+    return SharedRateLimiter("test", config=config, db_path=db_path, min_wait_interval=0.01)
+
+
+def test_workers_share_one_bucket(db_path):
+    async def scenario():
+        first, second = make_limiter(db_path), make_limiter(db_path)
+        await first.acquire()
+        await first.acquire()
+        # The second "worker" sees the bucket the first one emptied
+        with pytest.raises(DeadlineExceededError):
+            await second.acquire(timeout=0.1)
+        await asyncio.sleep(0.05)  # Let the background row removal finish
+        await second.refresh()
+        assert second.pending_requests() == 0
+
+    asyncio.run(scenario())
+
+
+def test_fair_tags_interleave_tenants(db_path):
+    limiter = make_limiter(db_path)
+    limiter._try_acquire("hold1", 10, 1.0, 0.0, "big", True)
+    limiter._try_acquire("hold2", 10, 1.0, 0.0, "big", True)  # Bucket now empty
+    for n in range(3):
+        limiter._try_acquire(f"big{n}", 10, 1.0, 0.0, "big", True)
+    limiter._try_acquire("small0", 10, 1.0, 0.0, "small", True)
+
+    conn = sqlite3.connect(db_path)
+    order = [row[0] for row in conn.execute(f"SELECT id FROM waiters WHERE bucket = 'test' {WAITER_ORDER}")]
+    conn.close()
+    assert order.index("small0") <= 1
+
+
+def test_status_reads_no_sqlite_on_the_loop(db_path):
+    async def scenario():
+        limiter = make_limiter(db_path)
+        await limiter.acquire()
+
+        def no_connect():
+            raise AssertionError("SQLite opened on the event loop")
+
+        limiter._connect = no_connect
+        status = limiter.get_status()
+        assert status["backend"] == "sqlite"
+        assert status["queue_depth"] == 0
+        assert 0.0 <= limiter.snapshot().available_tokens <= 2.0
+        assert limiter.pending_requests() == 0
+
+    asyncio.run(scenario())
+
+
+def test_settle_updates_shared_tpm_in_background(db_path):
+    async def scenario():
+        limiter = make_limiter(db_path, max_tpm=10_000)
+        await limiter.acquire(llm_tokens=1_000)
+        limiter._settle_llm_tokens(1_000, 400)  # Returns at once; the UPDATE runs in the executor
+        await asyncio.sleep(0.1)
+        await limiter.refresh()
+        assert limiter.tpm_tokens == pytest.approx(9_600, abs=100)  # Plus ~0.1 s of refill
+
+    asyncio.run(scenario())
+
+
+def test_slot_waits_for_release_without_polling(db_path):
+    async def scenario():
+        limiter = make_limiter(db_path, max_tokens=10, refill_rate=100.0)
+        limiter.concurrency_limit = 1
+        steps = []
+        original_step = limiter._step
+
+        async def counting_step(*args):
+            steps.append(args)
+            return await original_step(*args)
+
+        limiter._step = counting_step
+
+        first = limiter.slot()
+        await first.__aenter__()
+        assert limiter.in_flight == 1
+
+        second = limiter.slot()
+        waiting = asyncio.create_task(second.__aenter__())
+        await asyncio.sleep(0.2)
+        assert not waiting.done()
+        assert len(steps) == 1  # Only the first grant touched SQLite while the second waited
+
+        await first.__aexit__(None, None, None)
+        await asyncio.wait_for(waiting, timeout=1)
+        assert limiter.in_flight == 1
+        await second.__aexit__(None, None, None)
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_deadline_while_waiting_for_slot(db_path):
+    async def scenario():
+        limiter = make_limiter(db_path, max_tokens=10, refill_rate=100.0)
+        limiter.concurrency_limit = 1
+        async with limiter.slot():
+            with pytest.raises(DeadlineExceededError):
+                async with limiter.slot(timeout=0.05):
+                    pass
+            assert limiter.in_flight == 1
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+"""
+IncrementalJSONParser: fields and array rows emitted as soon as they are complete
+"""
+import json
+
+from app.infrastructure.parser.streaming_json import IncrementalJSONParser
+
+DOCUMENT = {
+    "document_type": "bank_statement",
+    "account_holder": "Sita {\"Sharma\"}, Ltd.",
+    "transactions": [
+        {"date": "2024-01-01", "description": "Tea, snacks [cafe]", "amount": 45.5},
+        {"date": "2024-01-02", "description": "Rent", "amount": 15000},
+    ],
+    "total_amount": 15045.5,
+    "notes": None,
+}
+
+
+def feed_all(parser: IncrementalJSONParser, text: str, chunk_size: int):
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[start:start + chunk_size]))
+    return events
+
+
+def test_chunking_does_not_change_the_result():
+    text = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    for chunk_size in (1, 7, len(text)):
+        parser = IncrementalJSONParser()
+        events = feed_all(parser, text, chunk_size)
+        assert not parser.truncated
+        assert parser.result() == DOCUMENT
+        assert parser.errors == []
+        assert [e.key for e in events if e.kind == "field"] == list(DOCUMENT)
+        assert [e.index for e in events if e.kind == "item"] == [0, 1]
+
+
+def test_rows_arrive_before_the_array_closes():
+    text = json.dumps(DOCUMENT)
+    first_row_end = text.index("}", text.index("transactions")) + 1
+
+    parser = IncrementalJSONParser()
+    events = parser.feed(text[:first_row_end + 1])  # Up to the comma after the first row
+    assert [(e.kind, e.key) for e in events] == [
+        ("field", "document_type"),
+        ("field", "account_holder"),
+        ("item", "transactions"),
+    ]
+    assert events[-1].value == DOCUMENT["transactions"][0]
+
+
+def test_truncated_output_keeps_completed_rows():
+    text = json.dumps(DOCUMENT)
+    cut = text.index("Rent")  # Model stopped in the middle of the second row
+
+    parser = IncrementalJSONParser()
+    parser.feed(text[:cut])
+    assert parser.truncated
+    assert parser.result() == {
+        "document_type": "bank_statement",
+        "account_holder": DOCUMENT["account_holder"],
+        "transactions": DOCUMENT["transactions"][:1],
+    }
+
+
+def test_malformed_value_is_reported_not_raised():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"document_type": "receipt", "total_amount": 12.3.4, "vendor": "Bhat-Bhateni"}')
+    assert [e.key for e in events] == ["document_type", "vendor"]
+    assert len(parser.errors) == 1 and "total_amount" in parser.errors[0]
+    assert not parser.truncated
@@ -0,0 +1,114 @@
+"""
+VectorShard persistence: snapshot + write-ahead log recovery
+"""
+import numpy as np
+
+from app.infrastructure.vector_db.vector_shard import VectorShard
+
+DIM = 4
+
+
+def vec(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(DIM, dtype='float32')
+
+
+def make_shard(path, snapshot_every=1000) -> VectorShard:
+    return VectorShard(path, snapshot_every=snapshot_every, fsync=False)
+
+
+def keys(shard: VectorShard):
+    return sorted(key for key, _ in shard.get_all_documents())
+
+
+def test_wal_replayed_after_restart(tmp_path):
+    shard = make_shard(tmp_path)
+    shard.add_document("INV1", vec(1), {"n": 1})
+    shard.add_document("INV2", vec(2), {"n": 2})
+    shard.delete_document("INV1")
+    assert not (tmp_path / "snapshot.pkl").exists()  # Writes only appended to the log
+
+    reloaded = make_shard(tmp_path)
+    assert keys(reloaded) == ["INV2"]
+    assert reloaded.tombstones == 1
+    assert reloaded.wal_records == 3
+
+
+def test_torn_wal_tail_is_cut_off(tmp_path):
+    shard = make_shard(tmp_path)
+    shard.add_document("INV1", vec(1), {"n": 1})
+    shard.add_document("INV2", vec(2), {"n": 2})
+    valid_size = (tmp_path / "wal.log").stat().st_size
+    with open(tmp_path / "wal.log", "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34")  # Crash halfway through the next header + payload
+
+    reloaded = make_shard(tmp_path)
+    assert keys(reloaded) == ["INV1", "INV2"]
+    assert (tmp_path / "wal.log").stat().st_size == valid_size
+
+    # New records follow the valid ones and are replayed too
+    reloaded.add_document("INV3", vec(3), {"n": 3})
+    assert keys(make_shard(tmp_path)) == ["INV1", "INV2", "INV3"]
+
+
+def test_crash_between_snapshot_rename_and_wal_truncate(tmp_path):
+    shard = make_shard(tmp_path)
+    shard.add_document("INV1", vec(1), {"n": 1})
+    shard.add_document("INV1", vec(11), {"n": 11})  # Update: one tombstone
+    shard.add_document("INV2", vec(2), {"n": 2})
+    stale_log = (tmp_path / "wal.log").read_bytes()
+    shard.save()
+    # The snapshot was renamed into place but the log was never reset
+    (tmp_path / "wal.log").write_bytes(stale_log)
+
+    reloaded = make_shard(tmp_path)
+    assert keys(reloaded) == ["INV1", "INV2"]
+    assert reloaded.size == 3  # Nothing replayed twice
+    assert reloaded.tombstones == 1
+    assert dict(reloaded.get_all_documents())["INV1"] == {"n": 11}
+
+    reloaded.add_document("INV3", vec(3), {"n": 3})
+    assert make_shard(tmp_path).size == 4
+
+
+def test_corrupt_snapshot_is_moved_aside(tmp_path):
+    shard = make_shard(tmp_path)
+    shard.add_document("INV1", vec(1), {"n": 1})
+    shard.save()
+    shard.add_document("INV2", vec(2), {"n": 2})
+    (tmp_path / "snapshot.pkl").write_bytes(b"not a pickle")
+
+    reloaded = make_shard(tmp_path)
+    assert reloaded.size == 0
+    assert reloaded.wal_seq == 0
+    assert (tmp_path / "snapshot.pkl.corrupt").read_bytes() == b"not a pickle"
+    assert (tmp_path / "wal.log.corrupt").exists()
+
+    # Writing to the fresh shard leaves the quarantined files alone
+    reloaded.add_document("INV3", vec(3), {"n": 3})
+    reloaded.save()
+    assert (tmp_path / "snapshot.pkl.corrupt").read_bytes() == b"not a pickle"
+    assert keys(make_shard(tmp_path)) == ["INV3"]
+
+
+def test_compaction_removes_tombstones_and_survives_restart(tmp_path):
+    shard = make_shard(tmp_path)
+    for n in range(4):
+        shard.add_document(f"INV{n}", vec(n), {"n": n})
+    shard.add_document("INV0", vec(10), {"n": 10})
+    shard.delete_document("INV1")
+    assert shard.tombstones == 2
+    assert shard.get_stats()["tombstone_ratio"] == round(2 / 5, 4)
+
+    # Tombstones never take a result slot
+    hits = shard.search(vec(1).reshape(1, -1), top_k=3)
+    assert "INV1" not in [key for key, _, _ in hits]
+    assert len(hits) == 3
+
+    assert shard.compact() == 2
+    assert shard.size == 3
+    assert shard.tombstones == 0
+
+    reloaded = make_shard(tmp_path)
+    assert keys(reloaded) == ["INV0", "INV2", "INV3"]
+    assert reloaded.size == 3
+    assert reloaded.search(vec(10).reshape(1, -1), top_k=1)[0][0] == "INV0"